@@ -0,0 +1,82 @@
+"""
+Compare the approximate IVF index against the exact search on synthetic paraphrase banks.
+For every `n_probe` value the script reports the mean query latency, the share of queries
+for which the best label matches the exact search, and the recall of the exact top-5 labels.
+
+    python benchmarks/ann_recall.py --samples 100000 --labels 500 --dim 384
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from df_extended_conditions.models.local.cosine_matchers.index import ExactIndex, IVFIndex
+
+
+def make_data(n_samples: int, n_labels: int, dim: int, n_queries: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_labels, dim))
+    label_ids = np.sort(rng.integers(0, n_labels, size=n_samples))
+    label_ids[:n_labels] = np.arange(n_labels)
+    label_ids.sort()
+    matrix = normalize(centers[label_ids] + rng.normal(scale=1.5, size=(n_samples, dim))).astype(np.float32)
+    query_labels = rng.integers(0, n_labels, size=n_queries)
+    queries = normalize(centers[query_labels] + rng.normal(scale=1.5, size=(n_queries, dim))).astype(np.float32)
+    return matrix, label_ids, queries
+
+
+def run_queries(index, queries: np.ndarray):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append(index.search(query.reshape(1, -1)))
+    elapsed = (time.perf_counter() - start) / len(queries)
+    return np.vstack(results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--labels", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--partitions", type=int, default=None)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    matrix, label_ids, queries = make_data(args.samples, args.labels, args.dim, args.queries, args.seed)
+
+    exact = ExactIndex()
+    exact.build(matrix, label_ids, args.labels)
+    exact_scores, exact_latency = run_queries(exact, queries)
+    exact_top = np.argsort(-exact_scores, axis=1)[:, :5]
+    print(f"exact: {exact_latency * 1000:.3f} ms/query")
+
+    for n_probe in args.probes:
+        ivf = IVFIndex(n_partitions=args.partitions, n_probe=n_probe, seed=args.seed)
+        start = time.perf_counter()
+        ivf.build(matrix, label_ids, args.labels)
+        build_time = time.perf_counter() - start
+        ivf_scores, ivf_latency = run_queries(ivf, queries)
+        ivf_scores = np.nan_to_num(ivf_scores, nan=-np.inf)
+        top1 = np.mean(np.argmax(ivf_scores, axis=1) == exact_top[:, 0])
+        top5 = np.mean(
+            [
+                np.isclose(ivf_scores[idx, exact_top[idx]], exact_scores[idx, exact_top[idx]], atol=1e-5).mean()
+                for idx in range(len(queries))
+            ]
+        )
+        print(
+            f"ivf n_probe={n_probe:<3} partitions={ivf.centroids.shape[0]:<4} build: {build_time:.2f} s, "
+            f"{ivf_latency * 1000:.3f} ms/query, top-1 agreement: {top1:.3f}, top-5 recall: {top5:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measure the per-turn latency of GensimMatcher against the size of the dataset.
+The baseline embeds every reference sample with `get_mean_vector` and compares the pairs
+one by one on each turn, which is how the matcher worked before the reference matrix
+and the token table were introduced. A Word2Vec model is trained on a synthetic corpus,
+so the script does not download anything.
+
+    python benchmarks/gensim_latency.py --sizes 100 1000 10000
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+from gensim.models import Word2Vec
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from df_extended_conditions.dataset import Dataset, DatasetItem
+from df_extended_conditions.models import GensimMatcher
+
+
+def make_dataset(rng: np.random.Generator, vocabulary: list, n_samples: int, n_labels: int) -> Dataset:
+    samples = [" ".join(rng.choice(vocabulary, size=rng.integers(3, 12))) for _ in range(n_samples)]
+    items = [DatasetItem(label=f"label_{idx}", samples=samples[idx::n_labels]) for idx in range(n_labels)]
+    return Dataset(items=items)
+
+
+def baseline_predict(matcher: GensimMatcher, request: str) -> dict:
+    embed = lambda text: matcher.model.wv.get_mean_vector(matcher.tokenizer(text)).reshape(1, -1)  # noqa: E731
+    request_embedding = embed(request)
+    result = dict()
+    for label_name, dataset_item in matcher.dataset.items.items():
+        scores = [cosine_similarity(request_embedding, embed(item))[0][0] for item in dataset_item.samples]
+        result[label_name] = np.max(np.array(scores))
+    return result
+
+
+def measure(function, requests: list) -> float:
+    start = time.perf_counter()
+    for request in requests:
+        function(request)
+    return (time.perf_counter() - start) / len(requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--labels", type=int, default=50)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vocabulary = [f"w{idx}" for idx in range(args.vocabulary)]
+    corpus = [list(rng.choice(vocabulary, size=10)) for _ in range(args.vocabulary * 2)]
+    model = Word2Vec(corpus, vector_size=args.dim, min_count=1, epochs=1, seed=args.seed)
+    requests = [" ".join(rng.choice(vocabulary + ["oov"], size=8)) for _ in range(args.requests)]
+
+    for size in args.sizes:
+        matcher = GensimMatcher(model=model, dataset=make_dataset(rng, vocabulary, size, args.labels))
+        start = time.perf_counter()
+        matcher.predict(requests[0])  # builds the token table and the reference matrix
+        build_time = time.perf_counter() - start
+        latency = measure(matcher.predict, requests)
+        baseline_latency = measure(lambda request: baseline_predict(matcher, request), requests[:2])
+        print(
+            f"samples={size:<6} build: {build_time * 1000:8.1f} ms, per turn: {latency * 1000:7.3f} ms, "
+            f"baseline per turn: {baseline_latency * 1000:9.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare the accuracy and the per-turn latency of the Hugging Face models with and without
+dynamic int8 quantization on CPU. The requests are the samples of the example dataset.
+For HFClassifier, the script reports how often the quantized model predicts the same top label
+and the largest difference of the probabilities. For HFMatcher, it reports the leave-one-out accuracy:
+each sample is labelled with the label of the closest other sample.
+
+    python benchmarks/hf_quantization.py --model obsei-ai/sell-buy-intent-classifier-bert-mini
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from df_extended_conditions.dataset import Dataset
+from df_extended_conditions.models import HFClassifier, HFMatcher
+
+
+def measure(function, requests: list, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for request in requests:
+            function(request)
+    return (time.perf_counter() - start) / (len(requests) * repeats)
+
+
+def leave_one_out_accuracy(matcher: HFMatcher, samples: list, labels: list) -> float:
+    embeddings = matcher.transform_batch(samples)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarity = embeddings @ embeddings.T
+    np.fill_diagonal(similarity, -np.inf)
+    predicted = [labels[idx] for idx in similarity.argmax(axis=1)]
+    return float(np.mean([prediction == label for prediction, label in zip(predicted, labels)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="obsei-ai/sell-buy-intent-classifier-bert-mini")
+    parser.add_argument(
+        "--dataset", default=str(Path(__file__).absolute().parent.parent / "examples/data/example.json")
+    )
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    if args.threads is not None:
+        torch.set_num_threads(args.threads)
+
+    dataset = Dataset.parse_json(args.dataset)
+    samples = [sample for item in dataset.items.values() for sample in item.samples]
+    labels = [label for label, item in dataset.items.items() for _ in item.samples]
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    device = torch.device("cpu")
+
+    classifiers, matchers = dict(), dict()
+    for quantize in (None, "dynamic-int8"):
+        model = AutoModelForSequenceClassification.from_pretrained(args.model)
+        classifiers[quantize] = HFClassifier(
+            model=model, tokenizer=tokenizer, device=device, namespace_key="classifier", quantize=quantize
+        )
+        matchers[quantize] = HFMatcher(
+            model=classifiers[quantize].model,
+            tokenizer=tokenizer,
+            device=device,
+            namespace_key="matcher",
+            dataset=dataset,
+        )
+        matchers[quantize].embedding_cache = None  # measure the forward passes
+
+    reference = [classifiers[None].predict(sample) for sample in samples]
+    quantized = [classifiers["dynamic-int8"].predict(sample) for sample in samples]
+    agreement = np.mean([max(ref, key=ref.get) == max(res, key=res.get) for ref, res in zip(reference, quantized)])
+    max_diff = max(abs(ref[label] - res[label]) for ref, res in zip(reference, quantized) for label in ref)
+    print(f"HFClassifier: top label agreement {agreement:.3f}, max probability difference {max_diff:.4f}")
+
+    for quantize in (None, "dynamic-int8"):
+        name = quantize or "fp32"
+        classifier_latency = measure(classifiers[quantize].predict, samples, args.repeats)
+        matcher_latency = measure(matchers[quantize].transform, samples, args.repeats)
+        accuracy = leave_one_out_accuracy(matchers[quantize], samples, labels)
+        print(
+            f"{name:<12} classifier per turn: {classifier_latency * 1000:7.2f} ms, "
+            f"matcher per turn: {matcher_latency * 1000:7.2f} ms, matcher leave-one-out accuracy: {accuracy:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
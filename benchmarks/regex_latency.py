@@ -0,0 +1,84 @@
+"""
+Measure the per-turn latency of RegexModel against the number of regex samples.
+The baseline calls `re.search` for every sample of every label, which is how the model
+worked before the samples were compiled into one alternation per label.
+The model is measured with and without the literal prefilter.
+The samples are synthetic phrases with optional parts and character classes.
+
+    python benchmarks/regex_latency.py --sizes 100 1000 4000 16000
+"""
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from df_extended_conditions.dataset import Dataset, DatasetItem
+from df_extended_conditions.models import RegexModel
+
+
+def make_dataset(rng: np.random.Generator, vocabulary: list, n_samples: int, n_labels: int) -> Dataset:
+    def make_sample() -> str:
+        words = list(rng.choice(vocabulary, size=rng.integers(1, 4)))
+        if rng.random() < 0.3:
+            words[-1] = f"{words[-1]}s?"
+        if rng.random() < 0.2:
+            words.append(r"\w+")
+        return r"\s+".join(words)
+
+    samples = [make_sample() for _ in range(n_samples)]
+    items = [DatasetItem(label=f"label_{idx}", samples=samples[idx::n_labels]) for idx in range(n_labels)]
+    return Dataset(items=items)
+
+
+def baseline_predict(dataset: Dataset, request: str, flags: int) -> dict:
+    result = {}
+    for label, dataset_item in dataset.items.items():
+        if any([re.search(item, request, flags=flags) for item in dataset_item.samples]):
+            result[label] = 1.0
+    return result
+
+
+def measure(function, requests: list) -> float:
+    start = time.perf_counter()
+    for request in requests:
+        function(request)
+    return (time.perf_counter() - start) / len(requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 4000, 16000])
+    parser.add_argument("--labels", type=int, default=100)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vocabulary = [f"w{idx}" for idx in range(args.vocabulary)]
+    requests = [" ".join(rng.choice(vocabulary, size=12)) for _ in range(args.requests)]
+    flags = re.IGNORECASE
+
+    for size in args.sizes:
+        dataset = make_dataset(rng, vocabulary, size, min(args.labels, size))
+        results = []
+        for prefilter in [False, True]:
+            model = RegexModel(dataset, prefilter=prefilter)
+            start = time.perf_counter()
+            model.compile(flags)
+            build_time = time.perf_counter() - start
+            for request in requests[:10]:
+                assert model(request, flags=flags) == baseline_predict(dataset, request, flags)
+            latency = measure(lambda request: model(request, flags=flags), requests)
+            results.append(f"prefilter={prefilter}: {build_time * 1000:7.1f} ms to compile, {latency * 1000:6.3f} ms")
+        baseline_latency = measure(lambda request: baseline_predict(dataset, request, flags), requests[:5])
+        print(f"samples={size:<6} {', '.join(results)}, baseline: {baseline_latency * 1000:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
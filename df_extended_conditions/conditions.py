@@ -4,19 +4,21 @@ Conditions
 
 This module provides condition functions for label processing.
 """
-from typing import Callable, Optional, List
+from typing import Callable, Optional, List, Tuple, Union
 from functools import singledispatch
 
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+from sklearn.preprocessing import normalize
 from df_engine.core import Context, Actor
 
 from .dataset import DatasetItem
 from .utils import LABEL_KEY
+from .label_scores import LabelScores
 from .models.base_model import BaseModel
 
 
 @singledispatch
-def has_cls_label(label, namespace: Optional[str] = None, threshold: float = 0.9):
+def has_cls_label(label, namespace: Optional[str] = None, threshold: float = 0.9, mode: Union[str, int] = "any"):
     """
     Use this condition, when you need to check, whether the probability
     of a particular label for the last user utterance surpasses the threshold.
@@ -31,12 +33,43 @@ def has_cls_label(label, namespace: Optional[str] = None, threshold: float = 0.9
     threshold: float = 0.9
         The minimal label probability that triggers a positive response
         from the function.
+    mode: Union[str, int] = "any"
+        Only applies to collections of labels. With "any", the condition is satisfied if any of the labels
+        is detected, with "all" - if all of them are detected. Pass an integer `n` to require
+        at least `n` detected labels.
+
+    The returned condition exposes the labels it reads in the `label_requirements` attribute,
+    a dict that maps the namespace (None for any namespace) to a set of label names.
+    It is used by :py:class:`~df_extended_conditions.gating.ScriptGate` to skip the models
+    whose annotations cannot be consumed at the current node.
     """
     raise NotImplementedError
 
 
+def _flatten_labels(label) -> Tuple[str, ...]:
+    if isinstance(label, str):
+        return (label,)
+    if isinstance(label, DatasetItem):
+        return (label.label,)
+    if isinstance(label, (list, tuple)):
+        return tuple(name for item in label for name in _flatten_labels(item))
+    raise NotImplementedError
+
+
+def _get_required_count(mode: Union[str, int], label_count: int) -> int:
+    if mode == "any":
+        return 1
+    if mode == "all":
+        return label_count
+    if isinstance(mode, int) and not isinstance(mode, bool) and mode >= 0:
+        return mode
+    raise ValueError(f"Unknown mode: {mode}. Use 'any', 'all', or a non-negative integer.")
+
+
 @has_cls_label.register(str)
-def _(label, namespace: Optional[str] = None, threshold: float = 0.9):
+def _(label, namespace: Optional[str] = None, threshold: float = 0.9, mode: Union[str, int] = "any"):
+    _get_required_count(mode, 1)  # the mode is validated, but does not apply to a single label
+
     def has_cls_label_innner(ctx: Context, actor: Actor) -> bool:
         if LABEL_KEY not in ctx.framework_states:
             return False
@@ -46,11 +79,16 @@ def _(label, namespace: Optional[str] = None, threshold: float = 0.9):
         comparison_array = [item >= threshold for item in scores]
         return any(comparison_array)
 
+    has_cls_label_innner.label_requirements = {namespace: frozenset((label,))}
     return has_cls_label_innner
 
 
 @has_cls_label.register(DatasetItem)
-def _(label, namespace: Optional[str] = None, threshold: float = 0.9) -> Callable[[Context, Actor], bool]:
+def _(
+    label, namespace: Optional[str] = None, threshold: float = 0.9, mode: Union[str, int] = "any"
+) -> Callable[[Context, Actor], bool]:
+    _get_required_count(mode, 1)  # the mode is validated, but does not apply to a single label
+
     def has_cls_label_innner(ctx: Context, actor: Actor) -> bool:
         if LABEL_KEY not in ctx.framework_states:
             return False
@@ -60,20 +98,43 @@ def _(label, namespace: Optional[str] = None, threshold: float = 0.9) -> Callabl
         comparison_array = [item >= threshold for item in scores]
         return any(comparison_array)
 
+    has_cls_label_innner.label_requirements = {namespace: frozenset((label.label,))}
     return has_cls_label_innner
 
 
 @has_cls_label.register(list)
-def _(label, namespace: Optional[str] = None, threshold: float = 0.9):
+@has_cls_label.register(tuple)
+def _(label, namespace: Optional[str] = None, threshold: float = 0.9, mode: Union[str, int] = "any"):
+    label_names = _flatten_labels(label)  # resolved once, not on every evaluation
+    required = _get_required_count(mode, len(label_names))
+
     def has_cls_label_innner(ctx: Context, actor: Actor) -> bool:
         if LABEL_KEY not in ctx.framework_states:
             return False
-        scores = [has_cls_label(item, namespace, threshold)(ctx, actor) for item in label]
-        for score in scores:
-            if score >= threshold:
+        if namespace is not None:
+            namespaces = (ctx.framework_states[LABEL_KEY].get(namespace, {}),)
+        else:
+            namespaces = tuple(ctx.framework_states[LABEL_KEY].values())
+        if namespaces and all(isinstance(scores, LabelScores) for scores in namespaces):
+            detected = np.zeros(len(label_names), dtype=bool)
+            for scores in namespaces:
+                detected |= scores.take(scores.index.resolve(label_names)) >= threshold
+            return np.count_nonzero(detected) >= required
+        matched = 0
+        remaining = len(label_names)
+        for name in label_names:
+            if matched >= required:
                 return True
-        return False
-
+            if matched + remaining < required:
+                return False
+            remaining -= 1
+            for scores in namespaces:
+                if scores.get(name, 0) >= threshold:
+                    matched += 1
+                    break
+        return matched >= required
+
+    has_cls_label_innner.label_requirements = {namespace: frozenset(label_names)}
     return has_cls_label_innner
 
 
@@ -86,33 +147,48 @@ def has_match(
     """
     Use this condition, if you need to check whether the last utterance is close to some
     pre-defined phrases. N.B.: Note that the model you will use should be already fit by the time
-    you pass it to the function.
+    you pass it to the function. The examples are embedded on the first evaluation
+    and embedded anew only after the model is refit. The condition calls the model directly,
+    so it does not depend on the annotations in the context.
 
     Parameters
     -----------
     model: BaseModel
         df_extended_conditions' model. Use one of the models from the `cosine_matchers` subpackage.
     positive_examples: Optional[List[str]]
-        A list of phrases that an utterance should be close to.
+        A list of phrases that an utterance should be close to. Should not be empty.
     negative_examples: Optional[List[str]] = None
         A list of phrases that an utterance should be distant from.
     threshold: float = 0.9
         The minimal cosine similarity to positive examples that triggers
         a positive response from the function.
     """
+    if not positive_examples:
+        raise ValueError("At least one positive example is required.")
     if negative_examples is None:
         negative_examples = []
 
+    # example embeddings are computed once per model state and reused on every evaluation;
+    # the key and the embeddings are replaced together, so a concurrent evaluation never sees a mix of them
+    cache: List[Optional[Tuple[Tuple[str, int], np.ndarray, Optional[np.ndarray]]]] = [None]
+
+    def embed_examples(examples: List[str]) -> Optional[np.ndarray]:
+        if len(examples) == 0:
+            return None
+        return normalize(np.vstack([model.transform(item) for item in examples]))
+
     def has_match_inner(ctx: Context, actor: Actor) -> bool:
         if not isinstance(ctx.last_request, str):
             return False
-        input_vector = model.transform(ctx.last_request)
-        positive_vectors = [model.transform(item) for item in positive_examples]
-        negative_vectors = [model.transform(item) for item in negative_examples]
-        positive_sims = [cosine_similarity(input_vector, item)[0][0] for item in positive_vectors]
-        negative_sims = [cosine_similarity(input_vector, item)[0][0] for item in negative_vectors]
-        max_pos_sim = max(positive_sims)
-        max_neg_sim = 0 if len(negative_sims) == 0 else max(negative_sims)
+        key = (model.identity, model.version)
+        cached = cache[0]
+        if cached is None or cached[0] != key:
+            cached = (key, embed_examples(positive_examples), embed_examples(negative_examples))
+            cache[0] = cached
+        _, positive, negative = cached
+        input_vector = normalize(model.transform(ctx.last_request))
+        max_pos_sim = np.max(positive @ input_vector.T)
+        max_neg_sim = 0 if negative is None else np.max(negative @ input_vector.T)
         return max_pos_sim > threshold > max_neg_sim
 
     return has_match_inner
@@ -0,0 +1,214 @@
+"""
+Gating
+*******
+
+This module provides :py:class:`~ScriptGate` that runs annotating models
+only when the transitions of the current node can consume their output.
+The gate walks the script once and collects the labels that the :py:func:`~has_cls_label`
+conditions of each node read, along with the conditions of the `GLOBAL` and `LOCAL` sections.
+On each turn, a gated model is skipped, unless the node that the transitions are evaluated from
+needs its namespace or one of its labels.
+
+The conditions are inspected through the `label_requirements` attribute, including the conditions
+nested in combinators like `cnd.all` or `cnd.negation`. Set this attribute on custom conditions
+that read the annotations directly, otherwise the gate assumes that they do not use the annotations.
+The :py:func:`~has_match` conditions call their models directly and do not require any annotations.
+
+Models that fill several namespaces, like :py:class:`~SharedBackboneModel`, are run,
+if any of their namespaces is needed.
+"""
+import asyncio
+from typing import Callable, Dict, FrozenSet, Optional, Set, Tuple, Union
+from collections import defaultdict
+
+from df_engine.core import Context, Actor
+from df_engine.core.keywords import GLOBAL, LOCAL, TRANSITIONS, PRE_TRANSITIONS_PROCESSING
+
+from .utils import LABEL_KEY
+from .models.base_model import BaseModel
+from .models.lazy import LazyModel
+from .models.shared_backbone import SharedBackboneModel
+
+Annotator = Union[BaseModel, SharedBackboneModel]
+
+Requirements = Dict[Optional[str], FrozenSet[str]]
+
+
+def _merge(target: Dict[Optional[str], Set[str]], requirements: Requirements) -> None:
+    for namespace, labels in requirements.items():
+        target[namespace].update(labels)
+
+
+def get_condition_requirements(condition: Callable) -> Requirements:
+    """
+    Collect the annotations that a condition reads, looking into the conditions it is composed of.
+
+    Parameters
+    -----------
+    condition: Callable
+        Transition condition.
+    """
+    result: Dict[Optional[str], Set[str]] = defaultdict(set)
+    stack, seen = [condition], set()
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, BaseModel):
+            continue
+        seen.add(id(item))
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+            continue
+        if not callable(item):
+            continue
+        _merge(result, getattr(item, "label_requirements", {}))
+        for cell in getattr(item, "__closure__", None) or ():
+            try:
+                stack.append(cell.cell_contents)
+            except ValueError:  # empty cell
+                continue
+    return {namespace: frozenset(labels) for namespace, labels in result.items()}
+
+
+def _get_model_labels(model: Annotator) -> Optional[FrozenSet[str]]:
+    """
+    Get the labels that a model can predict. Returns None, if they cannot be determined.
+    """
+    if isinstance(model, LazyModel):
+        # the attribute lookups of a proxy load the wrapped model, so only the dataset passed to the loader is used
+        if model.loaded:
+            return _get_model_labels(model.model)
+        dataset = (getattr(model.loader, "keywords", None) or dict()).get("dataset")
+        return frozenset(dataset.items.keys()) if dataset is not None else None
+    submodels = getattr(model, "models", None)
+    if submodels is not None:  # e.g. cascades and shared backbones
+        labels = [_get_model_labels(submodel) for submodel in submodels]
+        return None if any(item is None for item in labels) else frozenset().union(*labels)
+    dataset = getattr(model, "dataset", None)
+    if dataset is not None:
+        return frozenset(dataset.items.keys())
+    wrapped = getattr(model, "model", None)
+    if isinstance(wrapped, (BaseModel, SharedBackboneModel)):  # e.g. cached and executor models
+        return _get_model_labels(wrapped)
+    dataset = getattr(wrapped, "dataset", None)
+    if dataset is not None:
+        return frozenset(dataset.items.keys())
+    id2label = getattr(getattr(wrapped, "config", None), "id2label", None)
+    if id2label:
+        return frozenset(id2label.values())
+    pipeline = getattr(model, "_pipeline", None)
+    classes = getattr(getattr(pipeline, "_final_estimator", None), "classes_", None)
+    if classes is not None:
+        return frozenset(classes)
+    return None
+
+
+class ScriptGate:
+    """
+    Decides, whether an annotating model should run on the current turn.
+
+    Parameters
+    -----------
+    script: dict
+        Dialog script in the format accepted by :py:class:`~Actor`. The conditions are collected
+        from the raw script, since the actor wraps them into handlers that cannot be inspected.
+    start_label: Tuple[str, str]
+        The start label of the actor. Transitions are evaluated from this node on the first turn.
+    """
+
+    def __init__(self, script: dict, start_label: Tuple[str, str]) -> None:
+        self.script = script
+        self.start_label = tuple(start_label[:2])
+        self.global_requirements = self._get_node_requirements(script.get(GLOBAL, {}))
+        self.requirements: Dict[Tuple[str, str], Requirements] = dict()
+        for flow_label, flow in script.items():
+            if flow_label == GLOBAL:
+                continue
+            local_requirements = self._get_node_requirements(flow.get(LOCAL, {}))
+            for node_label, node in flow.items():
+                if node_label == LOCAL:
+                    continue
+                node_requirements = defaultdict(set)
+                for requirements in (self.global_requirements, local_requirements, self._get_node_requirements(node)):
+                    _merge(node_requirements, requirements)
+                self.requirements[(flow_label, node_label)] = {
+                    namespace: frozenset(labels) for namespace, labels in node_requirements.items()
+                }
+
+    @staticmethod
+    def _get_node_requirements(node: dict) -> Requirements:
+        result: Dict[Optional[str], Set[str]] = defaultdict(set)
+        for condition in node.get(TRANSITIONS, {}).values():
+            _merge(result, get_condition_requirements(condition))
+        return {namespace: frozenset(labels) for namespace, labels in result.items()}
+
+    def get_requirements(self, ctx: Context) -> Requirements:
+        """
+        Get the annotations that the transitions of the current node can read.
+        """
+        label = tuple(ctx.last_label[:2]) if ctx.last_label else self.start_label
+        return self.requirements.get(label, self.global_requirements)
+
+    def is_needed(self, model: Annotator, ctx: Context) -> bool:
+        """
+        Check, whether the annotations of a model can be used at the current node.
+        """
+        requirements = self.get_requirements(ctx)
+        if not requirements.keys().isdisjoint(model.namespaces):
+            return True
+        if None not in requirements:
+            return False
+        model_labels = _get_model_labels(model)
+        return model_labels is None or not model_labels.isdisjoint(requirements[None])
+
+    def wrap(self, model: Annotator) -> Callable:
+        """
+        Wrap a model into a processing function that only runs the model when it is needed.
+        When the model is skipped, its namespaces are set to empty dicts, so that the annotations
+        from the previous turns are not used. Both synchronous and asynchronous models are supported.
+        """
+
+        def skip(ctx: Context) -> Context:
+            labels = ctx.framework_states.setdefault(LABEL_KEY, dict())
+            for namespace in model.namespaces:
+                labels[namespace] = dict()
+            return ctx
+
+        if asyncio.iscoroutinefunction(model.__call__):
+
+            async def gated_model(ctx: Context, actor: Actor):
+                if not self.is_needed(model, ctx):
+                    return skip(ctx)
+                return await model(ctx, actor)
+
+        else:
+
+            def gated_model(ctx: Context, actor: Actor):
+                if not self.is_needed(model, ctx):
+                    return skip(ctx)
+                return model(ctx, actor)
+
+        gated_model.__name__ = f"gated_{model.namespace_key}"
+        gated_model.model = model
+        return gated_model
+
+    def wrap_script(self) -> dict:
+        """
+        Get a copy of the script, in which the models from the `PRE_TRANSITIONS_PROCESSING` sections are gated.
+        """
+
+        def wrap_node(node: dict) -> dict:
+            node = dict(node)
+            if PRE_TRANSITIONS_PROCESSING in node:
+                node[PRE_TRANSITIONS_PROCESSING] = {
+                    name: self.wrap(item) if isinstance(item, (BaseModel, SharedBackboneModel)) else item
+                    for name, item in node[PRE_TRANSITIONS_PROCESSING].items()
+                }
+            return node
+
+        result = dict()
+        for flow_label, flow in self.script.items():
+            if flow_label == GLOBAL:
+                result[flow_label] = wrap_node(flow)
+            else:
+                result[flow_label] = {node_label: wrap_node(node) for node_label, node in flow.items()}
+        return result
@@ -0,0 +1,146 @@
+"""
+Label Scores
+*************
+
+This module provides a compact representation of the label scores that models
+save to the `framework_states` field of the context. :py:class:`~LabelScores` keeps the scores
+of a namespace in a single float32 array and resolves the label names with a :py:class:`~LabelIndex`
+that is owned by the model and shared by all of its predictions.
+The scores are exposed as a read-only mapping, so the conditions that expect a dict keep working,
+while the conditions aware of the representation can index the array directly.
+"""
+from typing import Dict, Iterator, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .dataset import Dataset
+
+
+class LabelIndex(Sequence):
+    """
+    Immutable table that maps label names to positions in the score arrays.
+
+    Parameters
+    -----------
+    labels: Sequence[str]
+        Label names in the order of the score arrays.
+    """
+
+    def __init__(self, labels: Sequence[str]) -> None:
+        self.labels: Tuple[str, ...] = tuple(labels)
+        self.positions: Dict[str, int] = {label: idx for idx, label in enumerate(self.labels)}
+        self._resolved: Dict[Tuple[str, ...], np.ndarray] = dict()
+
+    @classmethod
+    def from_dataset(cls, dataset: Dataset) -> "LabelIndex":
+        """
+        Build the table from a dataset, placing each item at its categorical code.
+        """
+        items = sorted(dataset.items.values(), key=lambda item: item._categorical_code)
+        return cls([item.label for item in items])
+
+    def __copy__(self) -> "LabelIndex":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "LabelIndex":
+        # the table is immutable and shared by the predictions, e.g. in the copies of the context
+        return self
+
+    def __getitem__(self, idx: int) -> str:
+        return self.labels[idx]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __contains__(self, label: object) -> bool:
+        return label in self.positions
+
+    def index_of(self, label: str) -> Optional[int]:
+        """
+        Get the position of a label. Returns None, if the label is not in the table.
+        """
+        return self.positions.get(label)
+
+    def resolve(self, labels: Tuple[str, ...]) -> np.ndarray:
+        """
+        Get the positions of several labels as an integer array, with -1 for unknown labels.
+        The results are memoized, so conditions can resolve their labels on every evaluation.
+        """
+        positions = self._resolved.get(labels)
+        if positions is None:
+            positions = np.array([self.positions.get(label, -1) for label in labels], dtype=np.intp)
+            self._resolved[labels] = positions
+        return positions
+
+
+class LabelScores(Mapping):
+    """
+    Read-only mapping view over a float32 array of label scores.
+    Labels scored with `nan` are treated as missing, which is how the models
+    mark the labels they have dropped or not reached. The values are returned as float32 scalars,
+    so that comparing them to a threshold gives the same result as comparing the array.
+    Unlike dicts, the objects of this class are not JSON-serializable; use :py:meth:`~to_dict`
+    before saving the context to a JSON-based storage.
+
+    Parameters
+    -----------
+    index: LabelIndex
+        Table of label positions shared by the predictions of a model.
+    scores: np.ndarray
+        Scores of all the labels in the table.
+    """
+
+    __slots__ = ("index", "scores")
+
+    def __init__(self, index: LabelIndex, scores: np.ndarray) -> None:
+        scores = np.asarray(scores, dtype=np.float32).ravel()
+        if scores.shape[0] != len(index):
+            raise ValueError(f"Expected {len(index)} scores, got {scores.shape[0]}.")
+        scores.setflags(write=False)
+        self.index = index
+        self.scores = scores
+
+    def __copy__(self) -> "LabelScores":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "LabelScores":
+        # the scores are read-only, so the deep copies of the context can share them
+        return self
+
+    def __getitem__(self, label: str) -> np.float32:
+        idx = self.index.positions.get(label)
+        if idx is None or np.isnan(self.scores[idx]):
+            raise KeyError(label)
+        return self.scores[idx]
+
+    def get(self, label: str, default=None):
+        idx = self.index.positions.get(label)
+        if idx is None:
+            return default
+        value = self.scores[idx]
+        return default if np.isnan(value) else value
+
+    def __contains__(self, label: object) -> bool:
+        idx = self.index.positions.get(label)
+        return idx is not None and not np.isnan(self.scores[idx])
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.index.labels[idx] for idx in np.flatnonzero(~np.isnan(self.scores)))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(~np.isnan(self.scores)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()})"
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Get the scores at the given positions, with `nan` for the negative positions.
+        """
+        result = np.full(positions.shape, np.nan, dtype=np.float32)
+        known = positions >= 0
+        result[known] = self.scores[positions[known]]
+        return result
+
+    def to_dict(self) -> Dict[str, float]:
+        return {label: float(self.scores[self.index.positions[label]]) for label in self}
@@ -7,3 +7,11 @@ from .local.cosine_matchers.sklearn import SklearnMatcher
 from .remote_api.google_dialogflow_model import GoogleDialogFlowModel, AsyncGoogleDialogFlowModel
 from .remote_api.rasa_model import AsyncRasaModel, RasaModel
 from .remote_api.hf_api_model import AsyncHFAPIModel, HFAPIModel
+from .cascade import CascadeModel, AsyncCascadeModel
+from .prediction_cache import CachedModel, AsyncCachedModel
+from .batching import MicroBatchingModel
+from .local.classifiers.onnx import ORTClassifier
+from .local.cosine_matchers.onnx import ORTMatcher
+from .executor import ExecutorModel
+from .shared_backbone import SharedBackboneModel
+from .lazy import LazyModel
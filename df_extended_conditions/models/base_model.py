@@ -5,13 +5,18 @@ Base Model
 This module defines an abstract interface for label-scoring models, :py:class:`~BaseModel`.
 When defining custom label-scoring models, always inherit from this class.
 """
+import uuid
 from copy import copy
 from abc import ABC, abstractmethod
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
+import numpy as np
 from df_engine.core import Context, Actor
 
 from ..dataset import Dataset
 from ..utils import LABEL_KEY
+from ..label_scores import LabelIndex, LabelScores
+from .embedding_cache import DEFAULT_EMBEDDING_CACHE, EmbeddingCache
 
 
 class BaseModel(ABC):
@@ -24,31 +29,189 @@ class BaseModel(ABC):
     -----------
     namespace_key: str
         Name of the namespace in framework states that the model will be using.
+    top_k: Optional[int] = None
+        If set, only the labels with the `top_k` highest scores are kept in the prediction.
+        Applies to the models that score a fixed collection of labels: classifiers and matchers.
+    min_score: Optional[float] = None
+        If set, the labels scored below this value are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the prediction is returned as :py:class:`~LabelScores`: a float32 array of the scores
+        with a label table shared by all the predictions of the model, instead of a dict.
+        Applies to the same models as `top_k`.
+
+    Attributes
+    -----------
+    version: int
+        Counter of the model states. It is incremented each time the model is refit,
+        so that the representations computed by an older state can be told apart.
+    embedding_cache: Optional[EmbeddingCache]
+        Cache for the request representations. Shared by all the models per default.
+        Assign a separate :py:class:`~EmbeddingCache` to the model to isolate it,
+        or set to None to disable caching.
 
     """
 
-    def __init__(self, namespace_key: str = "default") -> None:
+    version: int = 0
+    embedding_cache: Optional[EmbeddingCache] = DEFAULT_EMBEDDING_CACHE
+    top_k: Optional[int] = None
+    min_score: Optional[float] = None
+    compact_scores: bool = False
+
+    def __init__(
+        self,
+        namespace_key: str = "default",
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
+    ) -> None:
         self.namespace_key = namespace_key
+        self.top_k = top_k
+        self.min_score = min_score
+        self.compact_scores = compact_scores
 
     def __deepcopy__(self, *args, **kwargs):
         return copy(self)
 
+    @property
+    def namespaces(self) -> Tuple[str, ...]:
+        """
+        The namespaces in framework states that the model fills.
+        """
+        return (self.namespace_key,)
+
+    @property
+    def identity(self) -> str:
+        """
+        Unique identifier of the model instance.
+        """
+        if "_identity" not in self.__dict__:
+            self._identity = uuid.uuid4().hex
+        return self._identity
+
+    def _get_label_index(self, labels: Sequence[str]) -> LabelIndex:
+        """
+        Get the label table of the model. The table is rebuilt only when the model is refit.
+        """
+        cached = self.__dict__.get("_label_index")
+        if cached is None or cached[0] != self.version or len(cached[1]) != len(labels):
+            cached = (self.version, labels if isinstance(labels, LabelIndex) else LabelIndex(labels))
+            self._label_index = cached
+        return cached[1]
+
+    def _select_labels(self, labels: Sequence[str], scores: np.ndarray) -> Union[dict, LabelScores]:
+        """
+        Build the prediction from the scores of all labels, applying `top_k` and `min_score`.
+        The labels scored with `nan` are omitted.
+        """
+        scores = np.asarray(scores).ravel()
+        if self.min_score is not None:
+            indices = np.flatnonzero(scores >= self.min_score)
+        else:
+            indices = np.flatnonzero(~np.isnan(scores))
+        if self.top_k is not None and self.top_k < len(indices):
+            indices = indices[np.argpartition(-scores[indices], self.top_k - 1)[: self.top_k]]
+        if self.compact_scores:
+            label_index = labels if isinstance(labels, LabelIndex) else self._get_label_index(labels)
+            compact = np.full(len(label_index), np.nan, dtype=np.float32)
+            compact[indices] = scores[indices]
+            return LabelScores(label_index, compact)
+        return {labels[idx]: float(scores[idx]) for idx in indices}
+
+    def _mask_scores(self, scores: np.ndarray) -> np.ndarray:
+        """
+        Apply `top_k` and `min_score` to each row of a score matrix. The dropped scores are replaced with `nan`.
+        """
+        scores = np.array(scores, dtype=np.float32)
+        if self.min_score is not None:
+            scores[~(scores >= self.min_score)] = np.nan
+        if self.top_k is not None and self.top_k < scores.shape[1]:
+            ranked = np.where(np.isnan(scores), -np.inf, scores)
+            dropped = np.argpartition(-ranked, self.top_k - 1, axis=1)[:, self.top_k :]
+            np.put_along_axis(scores, dropped, np.nan, axis=1)
+        return scores
+
+    @staticmethod
+    def _stack_predictions(
+        predictions: Iterable[Mapping[str, float]], labels: Optional[Sequence[str]] = None
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Convert the predictions to a score matrix. The labels absent from a prediction are scored with `nan`.
+        Defaults to the labels of all predictions in the order of appearance.
+        """
+        predictions = list(predictions)
+        if labels is None:
+            labels = dict.fromkeys(label for prediction in predictions for label in prediction)
+        labels = list(labels)
+        columns = {label: idx for idx, label in enumerate(labels)}
+        scores = np.full((len(predictions), len(labels)), np.nan, dtype=np.float32)
+        for row, prediction in enumerate(predictions):
+            for label, score in prediction.items():
+                scores[row, columns[label]] = score
+        return labels, scores
+
     @abstractmethod
-    def predict(self, request: str) -> dict:
+    def predict(self, request: str) -> Union[dict, LabelScores]:
         """
         Predict the probability of one or several classes.
         """
         raise NotImplementedError
 
+    def predict_batch(self, requests: List[str]) -> List[Union[dict, LabelScores]]:
+        """
+        Get the predictions for several requests.
+        The default implementation calls `predict` for each request. The models that can score
+        several requests at once, e.g. with a single matrix product or forward pass, override this method.
+        """
+        return [self.predict(request) for request in requests]
+
+    def predict_batch_array(self, requests: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Get the scores of several requests as a float32 matrix with a row per request and a column per label.
+        Returns the labels of the columns and the matrix. The scores omitted from the predictions,
+        e.g. the ones dropped by `top_k` or `min_score`, are `nan`.
+        """
+        return self._stack_predictions(self.predict_batch(requests))
+
     def transform(self, request: str):
         """
         Get a representation of the input data.
         """
         raise NotImplementedError
 
+    def transform_batch(self, requests: List[str]) -> np.ndarray:
+        """
+        Get the representations of several requests as a single array, one row per request.
+        The default implementation calls `transform` for each request.
+        """
+        if not requests:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack([np.asarray(self.transform(request)).reshape(1, -1) for request in requests])
+
+    def warmup(self, samples: Sequence[str]) -> None:
+        """
+        Run the model on representative requests before serving, so that the first user
+        does not pay for the one-time costs: loading a lazy model, allocating the buffers of the framework,
+        or embedding the reference examples of a matcher.
+
+        Parameters
+        -----------
+        samples: Sequence[str]
+            Requests similar to the expected ones, preferably of typical lengths.
+        """
+        for sample in samples:
+            self.predict(sample)
+
     def fit(self, dataset: Dataset) -> None:
         """
         Reinitialize the inner model with the given data.
+        Implementations are expected to increment the `version` attribute.
+        """
+        raise NotImplementedError
+
+    def fingerprint(self) -> str:
+        """
+        Get a hash of the model state that stays the same across processes.
+        Models with equal fingerprints are expected to produce equal outputs.
         """
         raise NotImplementedError
 
@@ -58,7 +221,7 @@ class BaseModel(ABC):
         Creates the missing namespaces, if necessary.
         Suited for use with `df_runner` add-on.
         """
-        labels: dict = self.predict(ctx.last_request) if ctx.last_request else dict()
+        labels: Union[dict, LabelScores] = self.predict(ctx.last_request) if ctx.last_request else dict()
 
         if LABEL_KEY not in ctx.framework_states:
             ctx.framework_states[LABEL_KEY] = dict()
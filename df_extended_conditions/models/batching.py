@@ -0,0 +1,110 @@
+"""
+Micro-batching
+***************
+
+This module provides :py:class:`~MicroBatchingModel` that merges the requests of concurrent dialog turns
+into batches. Transformer models process a batch of requests in about the same time as a single request,
+so under load the turns that arrive within a few milliseconds of each other are scored
+in one forward pass instead of queueing for the model one by one.
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple, Union
+
+from .base_model import BaseModel
+from .remote_api.async_mixin import AsyncMixin
+from ..label_scores import LabelScores
+
+
+class MicroBatchingModel(AsyncMixin):
+    """
+    MicroBatchingModel collects the requests of concurrent contexts and scores them with
+    the `predict_batch` method of the wrapped model, e.g. :py:class:`~BaseHFModel`.
+    A batch is scored, as soon as it has `max_batch_size` requests, or when `max_delay` seconds
+    have passed since its first request. The batches are scored in an executor,
+    so the event loop keeps serving the other turns and collecting the next batch.
+    The wrapper is asynchronous and is meant to be used with `df_runner` or other async pipelines.
+
+    Parameters
+    -----------
+    model: BaseModel
+        The model to wrap. The models that do not override `predict_batch` score the batch request by request.
+    namespace_key: Optional[str] = None
+        Name of the namespace in framework states. Defaults to the namespace of the wrapped model.
+    max_batch_size: int = 32
+        Maximum number of requests in a batch.
+    max_delay: float = 0.005
+        Maximum time in seconds that a request waits for the other requests of its batch.
+    executor: Optional[Executor] = None
+        Executor that runs the batches. Defaults to a single thread, so that the batches
+        do not compete with each other for the CPU.
+    """
+
+    def __init__(
+        self,
+        model: BaseModel,
+        namespace_key: Optional[str] = None,
+        max_batch_size: int = 32,
+        max_delay: float = 0.005,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        super().__init__(namespace_key=namespace_key or model.namespace_key)
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size should be positive.")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.executor = executor
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def version(self) -> int:
+        return self.model.version
+
+    def fingerprint(self) -> str:
+        return self.model.fingerprint()
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="micro_batching")
+        return self.executor
+
+    async def predict(self, request: str) -> Union[dict, LabelScores]:
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            # the pending requests of a closed loop cannot be resolved
+            self._loop, self._pending, self._timer = loop, [], None
+        future = loop.create_future()
+        self._pending.append((request, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        requests = [request for request, _ in batch]
+        try:
+            loop = asyncio.get_event_loop()
+            results = await loop.run_in_executor(self._get_executor(), self.model.predict_batch, requests)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # the caller could have been cancelled
+                future.set_result(result)
@@ -0,0 +1,125 @@
+"""
+Cascade Model
+**************
+
+This module provides :py:class:`~CascadeModel` that chains several label-scoring models,
+ordered from the cheapest to the most expensive one. The models are evaluated one by one,
+and the cascade stops as soon as a model is confident enough in its best label,
+so that the expensive models only run on the requests that the cheap ones cannot handle.
+"""
+import json
+import hashlib
+from typing import List, Optional, Tuple, Union
+
+from df_engine.core import Context, Actor
+
+from .base_model import BaseModel
+from .remote_api.async_mixin import AsyncMixin
+from ..label_scores import LabelScores
+from ..utils import LABEL_KEY, CASCADE_KEY
+
+
+class CascadeModel(BaseModel):
+    """
+    CascadeModel evaluates a chain of models and returns the prediction of the first confident stage.
+    If none of the stages is confident, the prediction of the last stage is returned.
+    All the predictions are written to the namespace of the cascade, and the index of the stage
+    that answered is saved to `ctx.framework_states[CASCADE_KEY][namespace_key]`.
+
+    Parameters
+    -----------
+    models: List[BaseModel]
+        Models ordered from the cheapest to the most expensive one.
+    namespace_key: str
+        Name of the namespace in framework states that the model will be using.
+    threshold: Optional[float] = 0.9
+        A stage is confident, if the score of its best label reaches this value.
+    margin: Optional[float] = None
+        A stage is confident, if its best label is scored higher than the second one at least by this value.
+        A single predicted label is compared to zero. If both `threshold` and `margin` are set,
+        a stage is confident when either of the conditions holds.
+    """
+
+    def __init__(
+        self,
+        models: List[BaseModel],
+        namespace_key: str = "cascade",
+        threshold: Optional[float] = 0.9,
+        margin: Optional[float] = None,
+    ) -> None:
+        super().__init__(namespace_key=namespace_key)
+        if len(models) == 0:
+            raise ValueError("At least one model is required.")
+        if threshold is None and margin is None:
+            raise ValueError("Either threshold or margin should be set.")
+        self.models = models
+        self.threshold = threshold
+        self.margin = margin
+
+    def is_confident(self, labels: Union[dict, LabelScores]) -> bool:
+        """
+        Check, whether a prediction is confident enough to stop the cascade.
+        """
+        if len(labels) == 0:
+            return False
+        scores = sorted(labels.values(), reverse=True)
+        if self.threshold is not None and scores[0] >= self.threshold:
+            return True
+        if self.margin is not None:
+            return scores[0] - (scores[1] if len(scores) > 1 else 0) >= self.margin
+        return False
+
+    def fingerprint(self) -> str:
+        content = json.dumps([[model.fingerprint() for model in self.models], self.threshold, self.margin])
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def predict_with_stage(self, request: str) -> Tuple[Union[dict, LabelScores], int]:
+        """
+        Get the prediction along with the index of the stage that produced it.
+        """
+        for stage, model in enumerate(self.models):
+            labels = model.predict(request)
+            if self.is_confident(labels):
+                break
+        return labels, stage
+
+    def predict(self, request: str) -> Union[dict, LabelScores]:
+        return self.predict_with_stage(request)[0]
+
+    def _save_prediction(self, ctx: Context, labels: Union[dict, LabelScores], stage: Optional[int]) -> Context:
+        ctx.framework_states.setdefault(LABEL_KEY, dict())[self.namespace_key] = labels
+        ctx.framework_states.setdefault(CASCADE_KEY, dict())[self.namespace_key] = stage
+        return ctx
+
+    def __call__(self, ctx: Context, actor: Actor):
+        """
+        Saves the retrieved labels and the index of the stage that answered. The stage is None,
+        if the last request is empty.
+        """
+        if not ctx.last_request:
+            return self._save_prediction(ctx, dict(), None)
+        return self._save_prediction(ctx, *self.predict_with_stage(ctx.last_request))
+
+
+class AsyncCascadeModel(AsyncMixin, CascadeModel):
+    """
+    Asynchronous version of :py:class:`~CascadeModel`. The stages can be either synchronous models
+    or asynchronous models, like :py:class:`~AsyncRasaModel`.
+    """
+
+    async def predict_with_stage(self, request: str) -> Tuple[Union[dict, LabelScores], int]:
+        for stage, model in enumerate(self.models):
+            labels = model.predict(request)
+            if isinstance(model, AsyncMixin):
+                labels = await labels
+            if self.is_confident(labels):
+                break
+        return labels, stage
+
+    async def predict(self, request: str) -> Union[dict, LabelScores]:
+        return (await self.predict_with_stage(request))[0]
+
+    async def __call__(self, ctx: Context, actor: Actor):
+        if not ctx.last_request:
+            return self._save_prediction(ctx, dict(), None)
+        return self._save_prediction(ctx, *(await self.predict_with_stage(ctx.last_request)))
@@ -0,0 +1,132 @@
+"""
+Embedding Cache
+****************
+
+This module provides a bounded LRU cache for utterance representations.
+The same request is usually embedded several times during a turn: by the annotator
+in the pre-transition processing, and then by every :py:func:`~has_match` condition.
+Decorate the `transform` method of a model with :py:func:`~cached_embedding`
+to store the results in the cache assigned to the model.
+By default, all the models share :py:data:`~DEFAULT_EMBEDDING_CACHE`.
+"""
+import sys
+import threading
+from functools import wraps
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+try:
+    from scipy.sparse import issparse
+except ImportError:
+    issparse = lambda value: False  # noqa: E731
+
+
+def _get_size(value: Any) -> int:
+    if issparse(value):
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    return getattr(value, "nbytes", sys.getsizeof(value))
+
+
+def _freeze(value: Any) -> Any:
+    """
+    Make the cached arrays read-only, so that the callers cannot corrupt the cache.
+    """
+    array = value.data if issparse(value) else value
+    if hasattr(array, "setflags"):
+        array.setflags(write=False)
+    return value
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache with limits on the number of entries and on their total size.
+
+    Parameters
+    -----------
+    max_entries: Optional[int] = 10000
+        Maximum number of cached representations. No limit, if set to None.
+    max_bytes: Optional[int] = 128 * 2 ** 20
+        Maximum total size of the cached representations in bytes. No limit, if set to None.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 10000, max_bytes: Optional[int] = 128 * 2**20) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = _get_size(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (_freeze(value), size)
+            self._bytes += size
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        """
+        Cache usage counters: hits, misses, evictions, the number of entries and their total size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+            }
+
+
+DEFAULT_EMBEDDING_CACHE = EmbeddingCache()
+
+
+def cached_embedding(method: Callable[[Any, str], Any]) -> Callable[[Any, str], Any]:
+    """
+    Cache the representations produced by a model method in the `embedding_cache` of the model.
+    The results are keyed on the model identity, the model version, the method name and the request,
+    so refitting a model invalidates its entries. Caching is skipped, if `embedding_cache` is None.
+    """
+
+    @wraps(method)
+    def wrapper(self, request: str):
+        cache: Optional[EmbeddingCache] = self.embedding_cache
+        if cache is None or not isinstance(request, str):
+            return method(self, request)
+        key = (self.identity, self.version, method.__name__, request)
+        result = cache.get(key)
+        if result is None:
+            result = method(self, request)
+            cache.put(key, result)
+        return result
+
+    return wrapper
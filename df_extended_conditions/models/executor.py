@@ -0,0 +1,177 @@
+"""
+Executor Model
+***************
+
+This module provides :py:class:`~ExecutorModel` that runs the predictions of a synchronous model
+in an executor. The local models, like :py:class:`~HFClassifier` or :py:class:`~GensimMatcher`,
+are CPU-bound, so calling them from an async pipeline blocks the event loop for all the other sessions.
+The wrapper moves the computations to a thread or process pool, limits the number of requests
+that are being computed or waiting, and gives up on the requests that take too long.
+"""
+
+import sys
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Union
+
+from .base_model import BaseModel
+from .remote_api.async_mixin import AsyncMixin
+from ..label_scores import LabelScores
+
+logger = logging.getLogger(__name__)
+
+# mp_context, initializer and initargs of ProcessPoolExecutor appeared in Python 3.7
+_POOL_INITIALIZER_SUPPORTED = sys.version_info >= (3, 7)
+# the models of the current worker process, keyed by identity
+_WORKER_MODELS: Dict[str, BaseModel] = dict()
+
+
+def _init_worker(model: BaseModel) -> None:
+    _WORKER_MODELS[model.identity] = model
+
+
+def _predict_in_worker(identity: str, request: str) -> Union[dict, LabelScores]:
+    return _WORKER_MODELS[identity].predict(request)
+
+
+class ExecutorModel(AsyncMixin):
+    """
+    ExecutorModel wraps a synchronous model and runs its predictions in an executor,
+    so that the model can be used in async pipelines, e.g. with `df_runner`, without blocking the event loop.
+
+    At most `max_concurrency` requests are computed at once; the other requests wait for a free slot.
+    If `max_queue_size` requests are already waiting, the new requests are rejected.
+    A request that is rejected or takes more than `timeout` seconds is logged,
+    and empty labels are saved for it. Note, that the executor cannot interrupt a computation,
+    so a timed out request keeps its slot until the model returns.
+
+    Parameters
+    -----------
+    model: BaseModel
+        The model to wrap.
+    namespace_key: Optional[str] = None
+        Name of the namespace in framework states. Defaults to the namespace of the wrapped model.
+    executor: Union[str, Executor] = "thread"
+        "thread" or "process" to create a pool of the given kind, or an existing executor.
+        With the process pool, the model is pickled and sent to each worker process once,
+        so the model should be picklable, and its class should be importable in the workers, e.g. defined
+        at module level. Models that release the GIL during inference, like the PyTorch-based ones,
+        work well with threads.
+    max_workers: int = 1
+        Number of workers in the created pool.
+    max_concurrency: Optional[int] = None
+        Maximum number of requests computed at once. Defaults to `max_workers`.
+    max_queue_size: Optional[int] = None
+        Maximum number of requests waiting for a free slot. No limit, if set to None.
+    timeout: Optional[float] = None
+        Time limit for a request in seconds, including the waiting time. No limit, if set to None.
+    start_method: str = "spawn"
+        Start method of the created process pool, see :py:func:`multiprocessing.get_context`.
+        "spawn" is the default, as forking a process that runs threads, e.g. the ones of PyTorch, may deadlock.
+        On Python 3.6, the default start method of the platform is always used,
+        and the model is sent to the workers with each request.
+    """
+
+    def __init__(
+        self,
+        model: BaseModel,
+        namespace_key: Optional[str] = None,
+        executor: Union[str, Executor] = "thread",
+        max_workers: int = 1,
+        max_concurrency: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        start_method: str = "spawn",
+    ) -> None:
+        super().__init__(namespace_key=namespace_key or model.namespace_key)
+        if isinstance(executor, str) and executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}. Use 'thread', 'process' or an Executor instance.")
+        self.model = model
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+        self.start_method = start_method
+        self._executor: Optional[Executor] = executor if isinstance(executor, Executor) else None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.running = 0
+
+    @property
+    def version(self) -> int:
+        return self.model.version
+
+    def fingerprint(self) -> str:
+        return self.model.fingerprint()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor == "process":
+                if _POOL_INITIALIZER_SUPPORTED:
+                    self.model.identity  # assign the identity before the model is sent to the workers
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker,
+                        initargs=(self.model,),
+                    )
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="model_executor")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the created pool. The executors passed to the constructor are left running.
+        """
+        if self._executor is not None and not isinstance(self.executor, Executor):
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    async def _run(self, request: str) -> Union[dict, LabelScores]:
+        semaphore = self._get_semaphore()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+
+        def release(_):
+            self.running -= 1
+            semaphore.release()
+
+        try:
+            loop = asyncio.get_event_loop()
+            if self.executor == "process" and _POOL_INITIALIZER_SUPPORTED:
+                future = loop.run_in_executor(self._get_executor(), _predict_in_worker, self.model.identity, request)
+            else:
+                future = loop.run_in_executor(self._get_executor(), self.model.predict, request)
+        except BaseException:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        # the slot is released when the computation ends, not when the caller gives up
+        return await asyncio.shield(future)
+
+    async def predict(self, request: str) -> Union[dict, LabelScores]:
+        semaphore = self._get_semaphore()
+        if self.max_queue_size is not None and semaphore.locked() and self.waiting >= self.max_queue_size:
+            logger.warning(f"Model {self.namespace_key!r} is overloaded, the request has been rejected.")
+            return dict()
+        try:
+            return await asyncio.wait_for(self._run(request), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Model {self.namespace_key!r} has not answered in {self.timeout}s.")
+            return dict()
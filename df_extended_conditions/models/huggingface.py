@@ -4,17 +4,34 @@ Base HF Model
 
 This module provides a base class for matchers and classifiers
 built on top of Hugging Face models.
+On CPU, the models can be quantized with PyTorch dynamic quantization: the weights of the linear layers
+are stored as int8, and the activations are quantized on the fly, which makes the inference
+several times faster at a small cost in accuracy.
+
+Long requests are the main source of latency spikes, since the cost of a forward pass grows
+with the sequence length. Set `max_length` to cap the number of tokens; the truncated requests keep
+their beginning and their end, which usually carry the intent of a message.
+The batched methods can pad the requests to a few fixed lengths, see `padding_buckets`.
+The number of tokens in each request, counted before truncation, is saved to
+`ctx.framework_states[TOKEN_COUNT_KEY][namespace_key]`.
 """
 import os
+import copy
+import json
+import hashlib
+import inspect
+import threading
+from functools import partial
+from pathlib import Path
 from argparse import Namespace
-from typing import Optional
+from typing import List, Optional, Sequence, Tuple, Union
 from collections.abc import Iterable
 
 try:
     import numpy as np
     from tokenizers import Tokenizer
     from transformers.modeling_utils import PreTrainedModel
-    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer, BatchEncoding
     import torch
 
     IMPORT_ERROR_MESSAGE = None
@@ -23,13 +40,208 @@ except ImportError as e:
     torch = Namespace(device=None)
     Tokenizer = None
     PreTrainedModel = None
+    BatchEncoding = None
     IMPORT_ERROR_MESSAGE = e.msg
 
+from df_engine.core import Context, Actor
+
 from .base_model import BaseModel
+from .embedding_cache import cached_embedding
+from .lazy import LazyModel
 from ..dataset import Dataset
+from ..utils import TOKEN_COUNT_KEY
+
+QUANTIZATION_MODES = ("dynamic-int8",)
+QUANTIZATION_CONFIG = "quantization.json"
+QUANTIZED_WEIGHTS = "quantized_model.pt"
+TRUNCATION_STRATEGIES = ("head", "tail", "head+tail")
+
+
+def _get_quantization_api() -> tuple:
+    # torch.ao.quantization appeared in torch 1.10 and torch.ao.nn.quantized in 1.13,
+    # the older versions only provide torch.quantization and torch.nn.quantized
+    try:
+        quantization = torch.ao.quantization
+    except AttributeError:
+        quantization = torch.quantization
+    try:
+        dynamic_linear = torch.ao.nn.quantized.dynamic.Linear
+    except AttributeError:
+        dynamic_linear = torch.nn.quantized.dynamic.Linear
+    return quantization, dynamic_linear
+
+
+def is_quantized(model: PreTrainedModel) -> bool:
+    """
+    Check, whether a model contains dynamically quantized linear layers.
+    """
+    _, dynamic_linear = _get_quantization_api()
+    return any(isinstance(module, dynamic_linear) for module in model.modules())
+
+
+def quantize_model(model: PreTrainedModel, quantize: str) -> PreTrainedModel:
+    """
+    Quantize the linear layers of a model. The quantized model only runs on CPU.
+
+    Parameters
+    -----------
+    model: PreTrainedModel
+        A pretrained Hugging Face format model. The model is not modified, a quantized copy is returned.
+    quantize: str
+        Quantization mode. Only "dynamic-int8" is supported.
+    """
+    if quantize not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {quantize}. Supported modes: {', '.join(QUANTIZATION_MODES)}.")
+    if is_quantized(model):
+        return model
+    quantization, _ = _get_quantization_api()
+    return quantization.quantize_dynamic(
+        copy.deepcopy(model).eval(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def _update_digest(digest, value) -> None:
+    # the packed parameters of the quantized layers are stored as tuples of quantized tensors
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, torch.Tensor):
+        value = value.detach().cpu()
+        if value.is_quantized:
+            digest.update(repr(value.qscheme()).encode("utf-8"))
+            if value.qscheme() in (torch.per_tensor_affine, torch.per_tensor_symmetric):
+                digest.update(repr((value.q_scale(), value.q_zero_point())).encode("utf-8"))
+            else:
+                digest.update(value.q_per_channel_scales().numpy().tobytes())
+                digest.update(value.q_per_channel_zero_points().numpy().tobytes())
+            value = value.int_repr()
+        digest.update(value.numpy().tobytes())
+    else:
+        digest.update(repr(value).encode("utf-8"))
+
+
+class HFTokenizationMixin:
+    """
+    Tokenization of the models that use Hugging Face tokenizers: truncation of long requests,
+    padding to fixed lengths and token counting. The tokenizer and its arguments
+    should be set as the `tokenizer` and `tokenizer_kwargs` attributes.
+    """
+
+    def _init_tokenization(
+        self,
+        max_length: Optional[int] = None,
+        truncation: str = "head+tail",
+        head_fraction: float = 0.25,
+        padding_buckets: Optional[Sequence[int]] = None,
+    ) -> None:
+        if truncation not in TRUNCATION_STRATEGIES:
+            raise ValueError(f"Unknown truncation: {truncation}. Supported values: {', '.join(TRUNCATION_STRATEGIES)}.")
+        self.max_length = max_length
+        self.truncation = truncation
+        self.head_fraction = head_fraction
+        self.padding_buckets = sorted(padding_buckets) if padding_buckets else None
+        self._last_token_count = threading.local()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_last_token_count"]  # thread-local objects cannot be pickled
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._last_token_count = threading.local()
+
+    def _get_kept_positions(self, special_tokens_mask: List[int]) -> Optional[List[int]]:
+        """
+        Get the positions of the tokens that are kept after the truncation.
+        The special tokens are always kept. Returns None, if the request is short enough.
+        """
+        if self.max_length is None or len(special_tokens_mask) <= self.max_length:
+            return None
+        content = [idx for idx, special in enumerate(special_tokens_mask) if not special]
+        budget = max(self.max_length - (len(special_tokens_mask) - len(content)), 0)
+        if self.truncation == "head":
+            kept = content[:budget]
+        elif self.truncation == "tail":
+            kept = content[len(content) - budget :]
+        else:
+            head = int(budget * self.head_fraction)
+            kept = content[:head] + content[len(content) - (budget - head) :]
+        kept = set(kept)
+        return [idx for idx, special in enumerate(special_tokens_mask) if special or idx in kept]
+
+    def tokenize(self, requests: List[str], bucketed: bool = False) -> Tuple[BatchEncoding, List[int]]:
+        """
+        Tokenize several requests, truncating them to `max_length` and padding them to a common length.
+        Returns the model inputs and the numbers of tokens in the requests before truncation.
+
+        Parameters
+        -----------
+        requests: List[str]
+            Strings to tokenize.
+        bucketed: bool = False
+            If set, the requests are padded to one of the `padding_buckets`.
+        """
+        bucketed = bucketed and self.padding_buckets is not None
+        if self.max_length is None and not bucketed:
+            tokenized_examples = self.tokenizer(requests, **{**self.tokenizer_kwargs, "padding": True})
+            if "attention_mask" in tokenized_examples:
+                token_counts = [int(count) for count in tokenized_examples["attention_mask"].sum(-1)]
+            else:
+                token_counts = [tokenized_examples["input_ids"].shape[-1]] * len(requests)
+        else:
+            kwargs = {
+                key: value
+                for key, value in self.tokenizer_kwargs.items()
+                if key not in ("return_tensors", "padding", "truncation", "max_length")
+            }
+            encoded = self.tokenizer(requests, **kwargs, return_special_tokens_mask=True)
+            token_counts = [len(input_ids) for input_ids in encoded["input_ids"]]
+            features = {key: [] for key in encoded.keys() if key != "special_tokens_mask"}
+            for idx, special_tokens_mask in enumerate(encoded["special_tokens_mask"]):
+                positions = self._get_kept_positions(special_tokens_mask)
+                for key, values in features.items():
+                    values.append(encoded[key][idx] if positions is None else [encoded[key][idx][i] for i in positions])
+            longest = max(len(input_ids) for input_ids in features["input_ids"])
+            length = longest
+            if bucketed:
+                length = next((bucket for bucket in self.padding_buckets if bucket >= longest), longest)
+                if self.max_length is not None:
+                    length = max(min(length, self.max_length), longest)
+            tokenized_examples = self.tokenizer.pad(
+                features,
+                padding="max_length",
+                max_length=length,
+                return_tensors=self.tokenizer_kwargs.get("return_tensors", "pt"),
+            )
+        if len(requests) == 1:
+            self._last_token_count.value = (requests[0], token_counts[0])
+        return tokenized_examples, token_counts
 
+    def count_tokens(self, request: str) -> int:
+        """
+        Get the number of tokens in a request before truncation, including the special tokens.
+        """
+        last_token_count = getattr(self._last_token_count, "value", None)
+        if last_token_count is not None and last_token_count[0] == request:
+            return last_token_count[1]
+        kwargs = {
+            key: value
+            for key, value in self.tokenizer_kwargs.items()
+            if key not in ("return_tensors", "padding", "truncation", "max_length")
+        }
+        return len(self.tokenizer(request, **kwargs)["input_ids"])
+
+    def __call__(self, ctx: Context, actor: Actor):
+        ctx = super().__call__(ctx, actor)
+        if ctx.last_request:
+            ctx.framework_states.setdefault(TOKEN_COUNT_KEY, dict())[self.namespace_key] = self.count_tokens(
+                ctx.last_request
+            )
+        return ctx
 
-class BaseHFModel(BaseModel):
+
+class BaseHFModel(HFTokenizationMixin, BaseModel):
     """
     Base class for Hugging Face-based models.
 
@@ -47,6 +259,26 @@ class BaseHFModel(BaseModel):
         Default tokenizer arguments override.
     model_kwargs: Optional[dict] = None
         Default model arguments override.
+    top_k: Optional[int] = None
+        If set, only the labels with the `top_k` highest scores are kept in the prediction.
+    min_score: Optional[float] = None
+        If set, the labels scored below this value are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the scores are returned as :py:class:`~LabelScores` instead of a dict.
+    quantize: Optional[str] = None
+        If set to "dynamic-int8", the linear layers of the model are quantized to int8.
+        The quantized model only runs on CPU.
+    max_length: Optional[int] = None
+        Maximum number of tokens in a request, including the special tokens.
+        The requests are not truncated, if set to None.
+    truncation: str = "head+tail"
+        Part of a long request that is kept: "head", "tail" or "head+tail".
+    head_fraction: float = 0.25
+        Fraction of the tokens taken from the beginning of the request by the "head+tail" truncation.
+    padding_buckets: Optional[Sequence[int]] = None
+        Lengths the batches are padded to, e.g. (16, 32, 64, 128). A batch is padded
+        to the smallest bucket that fits its longest request, so that the model only sees a few shapes.
+        The batches are padded to their longest request, if set to None.
     """
 
     def __init__(
@@ -57,36 +289,107 @@ class BaseHFModel(BaseModel):
         namespace_key: Optional[str] = None,
         tokenizer_kwargs: Optional[dict] = None,
         model_kwargs: Optional[dict] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
+        quantize: Optional[str] = None,
+        max_length: Optional[int] = None,
+        truncation: str = "head+tail",
+        head_fraction: float = 0.25,
+        padding_buckets: Optional[Sequence[int]] = None,
     ) -> None:
         IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
         if IMPORT_ERROR_MESSAGE is not None:
             raise ImportError(IMPORT_ERROR_MESSAGE)
-        super().__init__(namespace_key=namespace_key)
+        super().__init__(namespace_key=namespace_key, top_k=top_k, min_score=min_score, compact_scores=compact_scores)
+        self._init_tokenization(max_length, truncation, head_fraction, padding_buckets)
+        if quantize is not None:
+            if torch.device(device).type != "cpu":
+                raise ValueError("Quantized models can only be used on CPU.")
+            model = quantize_model(model, quantize)
+        self.quantize = quantize
         self.model = model
         self.tokenizer = tokenizer
         self.device = device
         self.tokenizer_kwargs = tokenizer_kwargs or {"return_tensors": "pt"}
         self.model_kwargs = model_kwargs or dict()
 
+    @cached_embedding
     def transform(self, request: str) -> Iterable:
-        tokenized_examples = self.tokenizer(request, **self.tokenizer_kwargs)
-        output = self.model(**tokenized_examples.to(self.device), **{**self.model_kwargs, "output_hidden_states": True})
-        return (
-            output.hidden_states[-1][0, 0, :].detach().numpy().reshape(1, -1)
-        )  # reshape for cosine similarity to be applicable
+        tokenized_examples, _ = self.tokenize([request])
+        with torch.inference_mode():
+            output = self.model(
+                **tokenized_examples.to(self.device), **{**self.model_kwargs, "output_hidden_states": True}
+            )
+        return output.hidden_states[-1][0, 0, :].cpu().numpy().reshape(1, -1)  # reshape for cosine similarity
+
+    def transform_batch(self, requests: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Get the representations of several requests as a single array, one row per request.
+        The requests are sorted by length and padded batch by batch to minimize the amount of padding.
+
+        Parameters
+        -----------
+        requests: List[str]
+            Strings to embed.
+        batch_size: int = 32
+            Number of strings in a single forward pass.
+        """
+        order = sorted(range(len(requests)), key=lambda idx: len(requests[idx]))
+        embeddings = []
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                batch = [requests[idx] for idx in order[start : start + batch_size]]
+                tokenized_examples, _ = self.tokenize(batch, bucketed=True)
+                output = self.model(
+                    **tokenized_examples.to(self.device), **{**self.model_kwargs, "output_hidden_states": True}
+                )
+                embeddings.append(output.hidden_states[-1][:, 0, :].cpu().numpy())
+        result = np.empty((len(requests), self.model.config.hidden_size), dtype=np.float32)
+        if embeddings:
+            result[order] = np.concatenate(embeddings)
+        return result
 
     def call_model(self, request: str) -> dict:
-        tokenized_examples = self.tokenizer(request, **self.tokenizer_kwargs)
-        output = self.model(
-            **tokenized_examples.to(self.device), **{**self.model_kwargs, "output_hidden_states": False}
-        )
+        tokenized_examples, _ = self.tokenize([request])
+        with torch.inference_mode():
+            output = self.model(
+                **tokenized_examples.to(self.device), **{**self.model_kwargs, "output_hidden_states": False}
+            )
+        return output
+
+    def call_model_batch(self, requests: List[str]):
+        """
+        Run a single forward pass over several requests, padded to a common length.
+        """
+        tokenized_examples, _ = self.tokenize(requests, bucketed=True)
+        with torch.inference_mode():
+            output = self.model(
+                **tokenized_examples.to(self.device), **{**self.model_kwargs, "output_hidden_states": False}
+            )
         return output
 
     def fit(self, dataset: Dataset) -> None:
         raise NotImplementedError
 
+    def fingerprint(self) -> str:
+        digest = hashlib.sha1()
+        digest.update(type(self.model).__name__.encode("utf-8"))
+        digest.update(self.model.config.to_json_string().encode("utf-8"))
+        digest.update(json.dumps(self.tokenizer.get_vocab(), sort_keys=True).encode("utf-8"))
+        kwargs = (sorted(self.tokenizer_kwargs.items()), sorted(self.model_kwargs.items()))
+        truncation = (self.max_length, self.truncation, self.head_fraction)
+        digest.update(repr(kwargs + truncation).encode("utf-8"))
+        for name, value in self.model.state_dict().items():
+            digest.update(name.encode("utf-8"))
+            _update_digest(digest, value)
+        return digest.hexdigest()
+
     def save(self, path: str, **kwargs) -> None:
         """
+        The quantized models are saved as a config and a state dict,
+        since the quantized layers cannot be saved with 'save_pretrained'.
+
         Parameters
         -----------
         path: str
@@ -94,12 +397,110 @@ class BaseHFModel(BaseModel):
         kwargs
             Keyword arguments are forwarded to the 'save_pretrained' method of the underlying model.
         """
-        self.model.save_pretrained(path, **kwargs)
+        if self.quantize is not None and is_quantized(self.model):
+            Path(path).mkdir(parents=True, exist_ok=True)
+            self.model.config.save_pretrained(path)
+            torch.save(self.model.state_dict(), os.path.join(path, QUANTIZED_WEIGHTS))
+            with open(os.path.join(path, QUANTIZATION_CONFIG), "w", encoding="utf-8") as file:
+                json.dump({"quantize": self.quantize, "weights": QUANTIZED_WEIGHTS}, file)
+        else:
+            self.model.save_pretrained(path, **kwargs)
+            if os.path.exists(os.path.join(path, QUANTIZATION_CONFIG)):
+                os.remove(os.path.join(path, QUANTIZATION_CONFIG))
         self.tokenizer.save_pretrained(path)
 
     @classmethod
-    def load(cls, path: str, namespace_key: str) -> __qualname__:
-        model = AutoModelForSequenceClassification.from_pretrained(path)
+    def load(
+        cls, path: str, namespace_key: str, quantize: Optional[str] = None, lazy: bool = False, **kwargs
+    ) -> Union[__qualname__, LazyModel]:
+        """
+        Parameters
+        -----------
+        path: str
+            Path to saving directory.
+        namespace_key: str
+            Name of the namespace in framework states that the model will be using.
+        quantize: Optional[str] = None
+            Quantization mode applied to the loaded model.
+            The models saved after quantization are loaded in the saved mode.
+        lazy: bool = False
+            If set, a :py:class:`~LazyModel` is returned, and the model is loaded on first use.
+        kwargs
+            Keyword arguments are forwarded to the constructor.
+        """
+        if lazy:
+            return LazyModel(
+                partial(cls.load, path, namespace_key, quantize=quantize, **kwargs), namespace_key=namespace_key
+            )
+        quantization_config = os.path.join(path, QUANTIZATION_CONFIG)
+        if os.path.exists(quantization_config):
+            with open(quantization_config, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if quantize is not None and quantize != saved["quantize"]:
+                raise ValueError(f"The model at {path} has been saved with {saved['quantize']} quantization.")
+            quantize = saved["quantize"]
+            model = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(path))
+            model = quantize_model(model, quantize)
+            model.load_state_dict(torch.load(os.path.join(path, saved["weights"]), map_location="cpu"))
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(path)
         tokenizer = AutoTokenizer.from_pretrained(path)
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        return cls(model=model, tokenizer=tokenizer, device=device, namespace_key=namespace_key)
+        if quantize is not None:
+            device = torch.device("cpu")
+        else:
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return cls(
+            model=model, tokenizer=tokenizer, device=device, namespace_key=namespace_key, quantize=quantize, **kwargs
+        )
+
+    def export_onnx(self, path: str, opset_version: int = 14) -> None:
+        """
+        Export the model to ONNX along with its config and tokenizer.
+        The exported model returns the logits and the last hidden state, and can be loaded
+        with :py:class:`~ORTClassifier` or :py:class:`~ORTMatcher`. Requires the `onnx` package.
+
+        Parameters
+        -----------
+        path: str
+            Path to the export directory.
+        opset_version: int = 14
+            ONNX operator set version.
+        """
+        from .onnx import ONNX_MODEL, ONNX_INPUTS, ONNX_OUTPUTS
+
+        if is_quantized(self.model):
+            raise ValueError("Quantized models cannot be exported to ONNX.")
+
+        class ExportedModel(torch.nn.Module):
+            def __init__(self, model: PreTrainedModel, input_names: List[str]) -> None:
+                super().__init__()
+                self.model = model
+                self.input_names = input_names
+
+            def forward(self, *inputs):
+                output = self.model(**dict(zip(self.input_names, inputs)), output_hidden_states=True)
+                return output.logits, output.hidden_states[-1]
+
+        Path(path).mkdir(parents=True, exist_ok=True)
+        examples = self.tokenizer(["Hello world!", "Hi"], return_tensors="pt", padding=True).to(self.device)
+        input_names = [name for name in ONNX_INPUTS if name in examples]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes.update({ONNX_OUTPUTS[0]: {0: "batch"}, ONNX_OUTPUTS[1]: {0: "batch", 1: "sequence"}})
+        # the TorchDynamo-based exporter is the default in the recent versions of PyTorch
+        export_kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+        training = self.model.training
+        self.model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                ExportedModel(self.model, input_names),
+                tuple(examples[name] for name in input_names),
+                os.path.join(path, ONNX_MODEL),
+                input_names=input_names,
+                output_names=list(ONNX_OUTPUTS),
+                dynamic_axes=dynamic_axes,
+                opset_version=opset_version,
+                **export_kwargs,
+            )
+        self.model.train(training)  # the exporter leaves the model in the training mode
+        self.model.config.save_pretrained(path)
+        self.tokenizer.save_pretrained(path)
@@ -0,0 +1,117 @@
+"""
+Lazy Model
+***********
+
+This module provides :py:class:`~LazyModel`, a proxy returned by the `load` methods
+of the models called with `lazy=True`. Reading the weights of a transformer or a word vector model
+takes seconds, and a bot that loads several models at start-up cannot answer health checks meanwhile.
+The proxy defers the loading until the model is used for the first time or until :py:meth:`~BaseModel.warmup`
+is called.
+"""
+import time
+import logging
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from df_engine.core import Context, Actor
+
+from .base_model import BaseModel
+from ..dataset import Dataset
+from ..label_scores import LabelScores
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModel(BaseModel):
+    """
+    LazyModel loads the wrapped model on the first call to `predict`, `transform`
+    or any other method of the model, and forwards the calls afterwards.
+    The model is loaded exactly once, even if several threads use the proxy at the same time.
+    If the loading fails, the error is raised to the caller, and the next call tries again.
+
+    Parameters
+    -----------
+    loader: Callable[[], BaseModel]
+        A function without arguments that loads the model.
+        Should be picklable, e.g. a `functools.partial` of a `load` method,
+        if the proxy is sent to other processes.
+    namespace_key: Optional[str] = None
+        Name of the namespace in framework states. Should match the namespace of the loaded model.
+    """
+
+    def __init__(self, loader: Callable[[], BaseModel], namespace_key: Optional[str] = None) -> None:
+        super().__init__(namespace_key=namespace_key)
+        self.loader = loader
+        self._model: Optional[BaseModel] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):  # avoid loading the model for internal lookups, e.g. by pickle
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    @property
+    def loaded(self) -> bool:
+        """
+        Whether the wrapped model has been loaded.
+        """
+        return self._model is not None
+
+    @property
+    def model(self) -> BaseModel:
+        """
+        The wrapped model. Loads the model on first access.
+        """
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = self.loader()
+                    logger.info(f"Model {self.namespace_key!r} loaded in {time.perf_counter() - start:.2f}s.")
+                model = self._model
+        return model
+
+    @property
+    def version(self) -> int:
+        return self._model.version if self._model is not None else 0
+
+    def predict(self, request: str) -> Union[dict, LabelScores]:
+        return self.model.predict(request)
+
+    def predict_batch(self, requests: List[str]) -> List[Union[dict, LabelScores]]:
+        return self.model.predict_batch(requests)
+
+    def predict_batch_array(self, requests: List[str]) -> Tuple[List[str], np.ndarray]:
+        return self.model.predict_batch_array(requests)
+
+    def transform(self, request: str):
+        return self.model.transform(request)
+
+    def transform_batch(self, requests: List[str]) -> np.ndarray:
+        return self.model.transform_batch(requests)
+
+    def fit(self, dataset: Dataset) -> None:
+        self.model.fit(dataset)
+
+    def fingerprint(self) -> str:
+        return self.model.fingerprint()
+
+    def warmup(self, samples: Sequence[str]) -> None:
+        self.model.warmup(samples)
+
+    def __call__(self, ctx: Context, actor: Actor):
+        return self.model(ctx, actor)
+
+    def save(self, path: str, **kwargs) -> None:
+        self.model.save(path, **kwargs)
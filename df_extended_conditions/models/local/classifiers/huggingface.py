@@ -5,7 +5,10 @@ HuggingFace classifier
 This module provides an adapter interface for Hugging Face models.
 Use pre-trained NLU classifiers to make the most of your conversational data.
 """
+from typing import List, Tuple, Union
+
 try:
+    import numpy as np
     from torch.nn import Softmax
 
     IMPORT_ERROR_MESSAGE = None
@@ -14,6 +17,7 @@ except ImportError as e:
     IMPORT_ERROR_MESSAGE = e.msg
 
 from ...huggingface import BaseHFModel
+from ....label_scores import LabelScores
 
 
 class HFClassifier(BaseHFModel):
@@ -34,6 +38,24 @@ class HFClassifier(BaseHFModel):
         Default tokenizer arguments override.
     model_kwargs: Optional[dict] = None
         Default model arguments override.
+    top_k: Optional[int] = None
+        If set, only the labels with the `top_k` highest probabilities are kept.
+    min_score: Optional[float] = None
+        If set, the labels with lower probabilities are dropped.
+    compact_scores: bool = False
+        If set, the probabilities are returned as :py:class:`~LabelScores` instead of a dict.
+    quantize: Optional[str] = None
+        If set to "dynamic-int8", the linear layers of the model are quantized to int8.
+        The quantized model only runs on CPU.
+    max_length: Optional[int] = None
+        Maximum number of tokens in a request, including the special tokens.
+        The requests are not truncated, if set to None.
+    truncation: str = "head+tail"
+        Part of a long request that is kept: "head", "tail" or "head+tail".
+    head_fraction: float = 0.25
+        Fraction of the tokens taken from the beginning of the request by the "head+tail" truncation.
+    padding_buckets: Optional[Sequence[int]] = None
+        Lengths the batches are padded to, e.g. (16, 32, 64, 128).
     """
 
     def __init__(self, *args, **kwargs) -> None:
@@ -41,13 +63,27 @@ class HFClassifier(BaseHFModel):
         IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
         if IMPORT_ERROR_MESSAGE is not None:
             raise ImportError(IMPORT_ERROR_MESSAGE)
-        self.sofmax = Softmax()
+        self.sofmax = Softmax(dim=-1)
+
+    def score_logits(self, logits) -> Union[dict, LabelScores]:
+        """
+        Get the prediction from the logits of a single request, e.g. the ones obtained
+        from a forward pass shared with another model.
+        """
+        probabilities = self.sofmax.forward(logits).squeeze(0).cpu().numpy()
+        labels = [self.model.config.id2label[idx] for idx in range(probabilities.shape[0])]
+        return self._select_labels(labels, probabilities)
 
     def predict(self, request: str) -> dict:
-        model_output = self.call_model(request)
-        logits_list = self.sofmax.forward(model_output.logits).squeeze(0)
-        result = {}
-        for idx in range(logits_list.shape[0]):
-            label = self.model.config.id2label[idx]
-            result[label] = logits_list[idx].item()
-        return result
+        return self.score_logits(self.call_model(request).logits)
+
+    def predict_batch(self, requests: List[str]) -> List[Union[dict, LabelScores]]:
+        labels, probabilities = self.predict_batch_array(requests)
+        return [self._select_labels(labels, row) for row in probabilities]
+
+    def predict_batch_array(self, requests: List[str]) -> Tuple[List[str], np.ndarray]:
+        labels = [self.model.config.id2label[idx] for idx in range(self.model.config.num_labels)]
+        if not requests:
+            return labels, np.empty((0, len(labels)), dtype=np.float32)
+        model_output = self.call_model_batch(requests)
+        return labels, self._mask_scores(self.sofmax.forward(model_output.logits).cpu().numpy())
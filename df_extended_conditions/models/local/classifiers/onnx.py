@@ -0,0 +1,82 @@
+"""
+ONNX Runtime classifier
+************************
+
+This module provides a classifier that runs Hugging Face models exported to ONNX.
+Use :py:meth:`~BaseHFModel.export_onnx` to export an :py:class:`~HFClassifier`.
+"""
+from typing import List, Tuple, Union
+
+try:
+    import numpy as np
+
+    IMPORT_ERROR_MESSAGE = None
+except ImportError as e:
+    IMPORT_ERROR_MESSAGE = e.msg
+
+from ...onnx import BaseORTModel
+from ....label_scores import LabelScores
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exponents = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exponents / exponents.sum(axis=-1, keepdims=True)
+
+
+class ORTClassifier(BaseORTModel):
+    """
+    ORTClassifier runs Hugging Face models with ONNX Runtime to predict utterance labels.
+
+    Parameters
+    -----------
+    model_path: str
+        Path to the ONNX model file.
+    tokenizer: Tokenizer
+        A pretrained Hugging Face tokenizer.
+    config: PretrainedConfig
+        Config of the exported model. The label names are taken from its `id2label` field.
+    namespace_key: Optional[str] = None
+        Name of the namespace in framework states that the model will be using.
+    tokenizer_kwargs: Optional[dict] = None
+        Default tokenizer arguments override.
+    intra_op_num_threads: Optional[int] = None
+        Number of threads used to parallelize a single operator. Defaults to the number of cores.
+    inter_op_num_threads: Optional[int] = None
+        Number of threads used to run independent operators in parallel.
+    providers: Optional[List[str]] = None
+        ONNX Runtime execution providers. Defaults to the CPU provider.
+    top_k: Optional[int] = None
+        If set, only the labels with the `top_k` highest probabilities are kept.
+    min_score: Optional[float] = None
+        If set, the labels with lower probabilities are dropped.
+    compact_scores: bool = False
+        If set, the probabilities are returned as :py:class:`~LabelScores` instead of a dict.
+    max_length: Optional[int] = None
+        Maximum number of tokens in a request. The requests are not truncated, if set to None.
+    truncation: str = "head+tail"
+        Part of a long request that is kept: "head", "tail" or "head+tail".
+    head_fraction: float = 0.25
+        Fraction of the tokens taken from the beginning of the request by the "head+tail" truncation.
+    padding_buckets: Optional[Sequence[int]] = None
+        Lengths the batches are padded to, see :py:class:`~BaseHFModel`.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
+        if IMPORT_ERROR_MESSAGE is not None:
+            raise ImportError(IMPORT_ERROR_MESSAGE)
+        self.labels = [self.config.id2label[idx] for idx in range(len(self.config.id2label))]
+
+    def predict(self, request: str) -> Union[dict, LabelScores]:
+        return self.predict_batch([request])[0]
+
+    def predict_batch(self, requests: List[str]) -> List[Union[dict, LabelScores]]:
+        labels, probabilities = self.predict_batch_array(requests)
+        return [self._select_labels(labels, row) for row in probabilities]
+
+    def predict_batch_array(self, requests: List[str]) -> Tuple[List[str], np.ndarray]:
+        if not requests:
+            return self.labels, np.empty((0, len(self.labels)), dtype=np.float32)
+        logits, _ = self.run(requests, bucketed=len(requests) > 1)
+        return self.labels, self._mask_scores(_softmax(logits))
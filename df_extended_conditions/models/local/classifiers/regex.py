@@ -6,32 +6,226 @@ This module provides a regex-based labelling model.
 Initialize it with a :py:class:`~Dataset` with regex-compliant examples.
 """
 import re
-from typing import Optional, Union
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple, Union
 
+import numpy as np
+
+from .regex_prefilter import LiteralPrefilter, extract_literals, sre_parse, sre_constants
+from .regex_analysis import PatternTiming, PatternWarning, analyze_dataset, profile_patterns
 from ...base_model import BaseModel
 from ....dataset import Dataset
 
+logger = logging.getLogger(__name__)
+
+_PrefilteredPatterns = Tuple[LiteralPrefilter, List[Tuple[str, Pattern]]]
+
+
+def _iter_opcodes(parsed) -> Iterator:
+    """
+    Iterate over the opcodes of a parsed pattern, including the nested subpatterns.
+    """
+    for op, av in parsed:
+        yield op
+        stack = [av]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, sre_parse.SubPattern):
+                yield from _iter_opcodes(value)
+            elif isinstance(value, (list, tuple)):
+                stack.extend(value)
+
+
+def _is_combinable(sample: str, pattern: Pattern) -> bool:
+    """
+    Check, whether a pattern keeps its meaning inside an alternation with other patterns.
+    Backreferences and named groups depend on the group numbering, and the inline global flags,
+    like `(?i)`, would apply to the whole alternation.
+    """
+    if pattern.groupindex or re.compile(sample).flags != re.compile("").flags:
+        return False
+    if pattern.groups == 0:
+        return True
+    opcodes = set(_iter_opcodes(sre_parse.parse(sample, pattern.flags)))
+    return sre_constants.GROUPREF not in opcodes and sre_constants.GROUPREF_EXISTS not in opcodes
+
+
+def _compile_samples(samples: List[str], flags: int) -> List[Pattern]:
+    """
+    Compile the samples of a label into a single alternation. The samples that cannot be combined
+    with the others are compiled separately.
+    """
+    patterns = [re.compile(sample, flags) for sample in samples]
+    is_combinable = [_is_combinable(sample, pattern) for sample, pattern in zip(samples, patterns)]
+    combinable = [sample for sample, combine in zip(samples, is_combinable) if combine]
+    if len(combinable) < 2:
+        return patterns
+    try:
+        combined = re.compile("|".join(f"(?:{sample})" for sample in combinable), flags)
+    except (re.error, RecursionError, OverflowError):
+        return patterns
+    return [combined] + [pattern for pattern, combine in zip(patterns, is_combinable) if not combine]
+
+
+def _search(label: str, pattern: Pattern, request: str):
+    return pattern.search(request)
+
 
 class RegexModel:
     """
     RegexModel implements utterance classification based on regex rules.
+    The samples of each label are compiled into a single alternation, so that a label is checked
+    with a single scan of the request. The compiled patterns are cached for each set of flags
+    and discarded, when the dataset is replaced.
+
+    The samples are checked for the constructs that can cause catastrophic backtracking,
+    when they are compiled, and the flagged samples are logged as warnings.
+    Use :py:meth:`~profile` to find the samples that are slow on the real requests.
+    Python cannot interrupt a running regex search, so `budget` only protects the following requests:
+    a label whose alternation exceeds the budget has its samples compiled separately,
+    so that the next slow search shows the culprit, and a separate sample that exceeds the budget
+    is quarantined, i.e. skipped until it is removed from :py:attr:`~quarantined`.
 
     Parameters
     -----------
     dataset: Dataset
         Labels for the matcher. The prediction output depends on proximity to different labels.
+    prefilter: bool = False
+        If set, the samples that contain required literal substrings are indexed by these literals,
+        and only the samples whose literals occur in the request are evaluated.
+        This makes the cost of a prediction nearly independent of the number of such samples.
+        The other samples are evaluated on every request.
+    min_literal_length: int = 3
+        Minimal length of the literals used by the prefilter.
+    budget: Optional[float] = None
+        Time limit for a single search, in seconds. The searches are not timed, if set to None.
+        With a budget, the samples flagged by the analysis are compiled separately from the others.
     """
 
-    def __init__(self, dataset: Dataset):
+    def __init__(
+        self,
+        dataset: Dataset,
+        prefilter: bool = False,
+        min_literal_length: int = 3,
+        budget: Optional[float] = None,
+    ):
+        self.prefilter = prefilter
+        self.min_literal_length = min_literal_length
+        self.budget = budget
+        # kept, when the dataset is replaced, since the new dataset can include the same samples
+        self.quarantined: Set[str] = set()
         self.dataset = dataset
 
-    def __call__(self, request: str, **re_kwargs):
+    @property
+    def dataset(self) -> Dataset:
+        return self._dataset
+
+    @dataset.setter
+    def dataset(self, value: Dataset):
+        self._dataset = value
+        self._compiled: Dict[int, Tuple[List[Tuple[str, List[Pattern]]], Optional[_PrefilteredPatterns]]] = dict()
+        self._separate_labels: Set[str] = set()
+        self._warnings: Dict[int, List[PatternWarning]] = dict()
+
+    def analyze(self, flags: int = 0) -> List[PatternWarning]:
+        """
+        Find the samples that can cause catastrophic backtracking.
+        See :py:func:`~df_extended_conditions.models.local.classifiers.regex_analysis.analyze_pattern`.
+        """
+        return analyze_dataset(self.dataset, flags)
+
+    def profile(self, corpus: Iterable[str], flags: int = 0, top: Optional[int] = 10) -> List[PatternTiming]:
+        """
+        Measure the time each sample takes on a corpus of requests and get the slowest samples.
+        See :py:func:`~df_extended_conditions.models.local.classifiers.regex_analysis.profile_patterns`.
+        """
+        return profile_patterns(self.dataset, corpus, flags, top)
+
+    def _compile_label(self, label: str, samples: List[str], flags: int, suspicious: Set[str]) -> List[Pattern]:
+        if label in self._separate_labels:
+            return [re.compile(sample, flags) for sample in samples]
+        separate = [sample for sample in samples if sample in suspicious]
+        combined = [sample for sample in samples if sample not in suspicious]
+        return _compile_samples(combined, flags) + [re.compile(sample, flags) for sample in separate]
+
+    def _compile(self, flags: int) -> Tuple[List[Tuple[str, List[Pattern]]], Optional[_PrefilteredPatterns]]:
+        compiled = self._compiled.get(flags)
+        if compiled is not None:
+            return compiled
+        warnings = self._warnings.get(flags)
+        if warnings is None:
+            warnings = self._warnings[flags] = self.analyze(flags)
+            for warning in warnings:
+                logger.warning(f"Regex sample {warning.pattern!r} of label {warning.label!r}: {warning.message}.")
+        suspicious = {warning.pattern for warning in warnings} if self.budget is not None else set()
+        items = [
+            (label, [sample for sample in dataset_item.samples if sample not in self.quarantined])
+            for label, dataset_item in self.dataset.items.items()
+        ]
+        if not self.prefilter:
+            patterns = [
+                (label, self._compile_label(label, samples, flags, suspicious)) for label, samples in items if samples
+            ]
+            self._compiled[flags] = (patterns, None)
+            return self._compiled[flags]
+        patterns, indexed_patterns, indexed_literals = [], [], []
+        for label, samples in items:
+            unindexed_samples = []
+            for sample in samples:
+                literals = extract_literals(sample, flags, self.min_literal_length)
+                if literals is None:
+                    unindexed_samples.append(sample)
+                else:
+                    indexed_patterns.append((label, re.compile(sample, flags)))
+                    indexed_literals.append(literals)
+            if unindexed_samples:
+                patterns.append((label, self._compile_label(label, unindexed_samples, flags, suspicious)))
+        prefiltered = (LiteralPrefilter(indexed_literals), indexed_patterns) if indexed_patterns else None
+        self._compiled[flags] = (patterns, prefiltered)
+        return self._compiled[flags]
+
+    def compile(self, flags: int = 0) -> List[Tuple[str, List[Pattern]]]:
+        """
+        Get the compiled patterns of each label, compiling them, if necessary.
+        If the prefilter is enabled, only the patterns that are evaluated on every request are returned.
+        """
+        return self._compile(flags)[0]
+
+    def _search_with_budget(self, label: str, pattern: Pattern, request: str):
+        start = time.perf_counter()
+        match = pattern.search(request)
+        elapsed = time.perf_counter() - start
+        if elapsed > self.budget:
+            if pattern.pattern in self.dataset.items[label].samples:
+                self.quarantined.add(pattern.pattern)
+                logger.warning(
+                    f"Regex sample {pattern.pattern!r} of label {label!r} took {elapsed:.3f}s "
+                    f"and has been quarantined."
+                )
+            else:
+                self._separate_labels.add(label)
+                logger.warning(
+                    f"Regex samples of label {label!r} took {elapsed:.3f}s "
+                    f"and will be evaluated separately to find the slow sample."
+                )
+            self._compiled.clear()
+        return match
+
+    def __call__(self, request: str, flags: int = 0):
         result = {}
-        for label, dataset_item in self.dataset.items.items():
-            matches = [
-                re.search(item, request, **re_kwargs) for item in dataset_item.samples
-            ]  # TODO: replace compilation to the init
-            if any(map(bool, matches)):
+        search = _search if self.budget is None else self._search_with_budget
+        patterns, prefiltered = self._compile(flags)
+        if prefiltered is not None:
+            prefilter, indexed_patterns = prefiltered
+            for idx in prefilter.candidates(request):
+                label, pattern = indexed_patterns[idx]
+                if label not in result and search(label, pattern, request):
+                    result[label] = 1.0
+        for label, label_patterns in patterns:
+            if label not in result and any(search(label, pattern, request) for pattern in label_patterns):
                 result[label] = 1.0
 
         return result
@@ -61,9 +255,22 @@ class RegexClassifier(BaseModel):
         self.re_kwargs = re_kwargs or {"flags": re.IGNORECASE}
         # instantiate if DatasetItem Collection has been passed
         self.model = model if isinstance(model, RegexModel) else RegexModel(model)
+        self.model.compile(**self.re_kwargs)
 
     def fit(self, dataset: Dataset):
         self.model.dataset = dataset
+        self.model.compile(**self.re_kwargs)
+        self.version += 1
 
     def predict(self, request: str) -> dict:
         return self.model(request, **self.re_kwargs)
+
+    def predict_batch_array(self, requests: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        The columns follow the labels of the dataset, and the labels that have not matched are scored with `nan`.
+        """
+        return self._stack_predictions(self.predict_batch(requests), labels=self.model.dataset.items)
+
+    def fingerprint(self) -> str:
+        content = json.dumps([self.model.dataset.dict(), self.re_kwargs], sort_keys=True, default=int)
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
@@ -0,0 +1,205 @@
+"""
+Regex Analysis
+***************
+
+This module provides tools for finding the regex samples that are slow to evaluate.
+Python regular expressions are evaluated with backtracking, so a pattern with nested quantifiers,
+like `(\\w+\\s?)+`, or with an ambiguous alternation under a quantifier, like `(a|ab)*`,
+can take exponential time on a request that almost matches it.
+:py:func:`~analyze_pattern` finds such constructs in the parsed pattern,
+and :py:func:`~profile_patterns` measures the time each sample takes on a corpus of requests.
+"""
+
+import re
+import time
+from typing import FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from .regex_prefilter import sre_parse, sre_constants, _REPEATS, _get_state
+
+try:
+    from re import _compiler as sre_compile
+except ImportError:  # Python < 3.11
+    import sre_compile
+
+from ....dataset import Dataset
+
+NESTED_QUANTIFIERS = "nested quantifiers"
+AMBIGUOUS_ALTERNATION = "ambiguous alternation"
+
+# the characters used to compare the character sets of the alternatives
+_ALPHABET = [chr(code) for code in range(256)]
+_SINGLE_CHARACTER = {sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.IN, sre_constants.ANY}
+_ZERO_WIDTH = {sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT}
+
+
+class PatternWarning(NamedTuple):
+    """
+    A construct in a regex sample that can cause catastrophic backtracking.
+    """
+
+    label: Optional[str]
+    pattern: str
+    kind: str
+    message: str
+
+
+class PatternTiming(NamedTuple):
+    """
+    Time a regex sample has taken on a corpus of requests, in seconds.
+    """
+
+    label: str
+    pattern: str
+    total: float
+    worst: float
+
+
+def _is_unbounded(op, av) -> bool:
+    return op in _REPEATS and av[1] == sre_constants.MAXREPEAT
+
+
+def _get_first_chars(parsed) -> Optional[Tuple[FrozenSet[str], bool]]:
+    """
+    Get the characters from `_ALPHABET` that a match of a parsed pattern can start with,
+    and whether the pattern can match an empty string. Returns None, if they cannot be determined.
+    """
+    chars = set()
+    for op, av in parsed:
+        if op in _SINGLE_CHARACTER:
+            state = _get_state(parsed)
+            element = sre_compile.compile(sre_parse.SubPattern(state, [(op, av)]), state.flags)
+            chars.update(char for char in _ALPHABET if element.fullmatch(char))
+            return frozenset(chars), False
+        if op in _ZERO_WIDTH:
+            continue
+        if op is sre_constants.SUBPATTERN:
+            first = _get_first_chars(av[3])
+            nullable_from = 1
+        elif op in _REPEATS:
+            first = _get_first_chars(av[2])
+            nullable_from = 0 if av[0] == 0 else 1
+        elif op is sre_constants.BRANCH:
+            branches = [_get_first_chars(branch) for branch in av[1]]
+            if any(branch is None for branch in branches):
+                return None
+            first = (frozenset().union(*(branch[0] for branch in branches)), any(branch[1] for branch in branches))
+            nullable_from = 1
+        else:
+            return None
+        if first is None:
+            return None
+        chars.update(first[0])
+        if not (first[1] or nullable_from == 0):
+            return frozenset(chars), False
+    return frozenset(chars), True
+
+
+def _find_issues(parsed, repeated: bool) -> List[Tuple[str, str]]:
+    """
+    Find the nested unbounded quantifiers and the overlapping alternatives under unbounded quantifiers.
+    `repeated` shows, whether the parsed pattern is inside an unbounded quantifier.
+    """
+    issues = []
+    for op, av in parsed:
+        if op is getattr(sre_constants, "POSSESSIVE_REPEAT", None):
+            continue  # possessive quantifiers do not backtrack
+        if op in _REPEATS:
+            unbounded = _is_unbounded(op, av)
+            if unbounded and repeated:
+                issues.append((NESTED_QUANTIFIERS, "an unbounded quantifier is nested in another one"))
+            issues.extend(_find_issues(av[2], repeated or unbounded))
+        elif op is sre_constants.SUBPATTERN:
+            issues.extend(_find_issues(av[3], repeated))
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            continue  # atomic groups do not backtrack
+        elif op is sre_constants.BRANCH:
+            if repeated:
+                first_chars = [_get_first_chars(branch) for branch in av[1]]
+                known = [first for first in first_chars if first is not None]
+                overlap = any(first[1] for first in known) or any(
+                    not known[i][0].isdisjoint(known[j][0]) for i in range(len(known)) for j in range(i)
+                )
+                if overlap:
+                    issues.append(
+                        (
+                            AMBIGUOUS_ALTERNATION,
+                            "the alternatives under an unbounded quantifier can match the same text",
+                        )
+                    )
+            for branch in av[1]:
+                issues.extend(_find_issues(branch, repeated))
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            issues.extend(_find_issues(av[1], repeated))
+    return issues
+
+
+def analyze_pattern(pattern: str, flags: int = 0, label: Optional[str] = None) -> List[PatternWarning]:
+    """
+    Find the constructs in a regex sample that can cause catastrophic backtracking.
+    The analysis is a heuristic: a flagged pattern is not necessarily slow, but it should be reviewed.
+
+    Parameters
+    -----------
+    pattern: str
+        Regular expression.
+    flags: int = 0
+        Flags the pattern is compiled with.
+    label: Optional[str] = None
+        Label of the sample, reported in the warnings.
+    """
+    issues = _find_issues(sre_parse.parse(pattern, flags), repeated=False)
+    return [PatternWarning(label, pattern, kind, message) for kind, message in dict.fromkeys(issues)]
+
+
+def analyze_dataset(dataset: Dataset, flags: int = 0) -> List[PatternWarning]:
+    """
+    Find the regex samples of a dataset that can cause catastrophic backtracking.
+
+    Parameters
+    -----------
+    dataset: Dataset
+        Dataset with regex samples.
+    flags: int = 0
+        Flags the samples are compiled with.
+    """
+    return [
+        warning
+        for label, dataset_item in dataset.items.items()
+        for sample in dataset_item.samples
+        for warning in analyze_pattern(sample, flags, label)
+    ]
+
+
+def profile_patterns(
+    dataset: Dataset, corpus: Iterable[str], flags: int = 0, top: Optional[int] = None
+) -> List[PatternTiming]:
+    """
+    Measure the time each regex sample of a dataset takes on a corpus of requests.
+    Each sample is evaluated on its own, so the results show the samples to fix or remove.
+
+    Parameters
+    -----------
+    dataset: Dataset
+        Dataset with regex samples.
+    corpus: Iterable[str]
+        Requests to evaluate the samples on, e.g. the logged user messages.
+    flags: int = 0
+        Flags the samples are compiled with.
+    top: Optional[int] = None
+        Number of the slowest samples to report. All the samples are reported, if set to None.
+    """
+    corpus = list(corpus)
+    timings = []
+    for label, dataset_item in dataset.items.items():
+        for sample in dataset_item.samples:
+            pattern = re.compile(sample, flags)
+            total, worst = 0.0, 0.0
+            for request in corpus:
+                start = time.perf_counter()
+                pattern.search(request)
+                elapsed = time.perf_counter() - start
+                total += elapsed
+                worst = max(worst, elapsed)
+            timings.append(PatternTiming(label, sample, total, worst))
+    timings.sort(key=lambda timing: timing.total, reverse=True)
+    return timings[:top] if top is not None else timings
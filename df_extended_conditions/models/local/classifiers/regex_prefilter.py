@@ -0,0 +1,203 @@
+"""
+Regex Prefilter
+****************
+
+This module provides a literal prefilter for large collections of regular expressions.
+Most of the regex samples contain a literal substring that every match must include.
+The literals are extracted from the parsed patterns and indexed with an Aho-Corasick automaton,
+so that a single pass over the request finds the patterns that can possibly match it.
+The patterns without extractable literals are always evaluated.
+"""
+
+import re
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+# non-ASCII characters that match ASCII letters with re.IGNORECASE
+_IGNORECASE_FIXES = str.maketrans({"İ": "i", "ı": "i", "ſ": "s", "K": "k"})
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)}
+
+Literal = Tuple[str, bool]
+
+
+def _get_state(parsed):
+    # the state of a parsed pattern is called `pattern` in Python 3.6 and `state` since Python 3.7
+    return parsed.state if hasattr(parsed, "state") else parsed.pattern
+
+
+def fold_case(text: str) -> str:
+    """
+    Map the text to lowercase, so that the ASCII literals of case-insensitive patterns
+    occur in it whenever the patterns can match the original text.
+    """
+    return text.translate(_IGNORECASE_FIXES).lower()
+
+
+def _get_required_literals(parsed, ignorecase: bool) -> Optional[List[Literal]]:
+    """
+    Get the literals, at least one of which occurs in every match of a parsed pattern.
+    Each literal is paired with a flag that shows, whether it should be matched case-insensitively.
+    Returns None, if no such literals can be found.
+    """
+    candidates: List[List[Literal]] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            candidates.append([("".join(run), ignorecase)])
+            run.clear()
+
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            char = chr(av)
+            if ignorecase and ord(char) > 127:
+                flush()
+            else:
+                run.append(char.lower() if ignorecase else char)
+            continue
+        flush()
+        literals = None
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, subpattern = av
+            group_ignorecase = (ignorecase or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE
+            literals = _get_required_literals(subpattern, group_ignorecase)
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            literals = _get_required_literals(av, ignorecase)
+        elif op in _REPEATS and av[0] >= 1:
+            literals = _get_required_literals(av[2], ignorecase)
+        elif op is sre_constants.BRANCH:
+            branches = [_get_required_literals(branch, ignorecase) for branch in av[1]]
+            if all(branch is not None for branch in branches):
+                literals = [literal for branch in branches for literal in branch]
+        if literals:
+            candidates.append(literals)
+    flush()
+    # the shortest literal of a candidate is the most likely one to occur by chance
+    return max(candidates, key=lambda literals: min(len(text) for text, _ in literals), default=None)
+
+
+def extract_literals(pattern: str, flags: int = 0, min_length: int = 3) -> Optional[List[Literal]]:
+    """
+    Extract the literals, at least one of which occurs in every match of a pattern.
+
+    Parameters
+    -----------
+    pattern: str
+        Regular expression.
+    flags: int = 0
+        Flags the pattern is compiled with.
+    min_length: int = 3
+        Minimal length of a useful literal. Shorter literals occur in too many requests,
+        so None is returned for the patterns that only have such literals.
+    """
+    parsed = sre_parse.parse(pattern, flags)
+    literals = _get_required_literals(parsed, bool(_get_state(parsed).flags & re.IGNORECASE))
+    if literals is None or min(len(text) for text, _ in literals) < min_length:
+        return None
+    return literals
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton that finds all the occurrences of several keywords in a single pass over the text.
+
+    Parameters
+    -----------
+    keywords: List[str]
+        Keywords to search for.
+    """
+
+    def __init__(self, keywords: List[str]) -> None:
+        self.keywords = keywords
+        self.goto: List[Dict[str, int]] = [dict()]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+        for idx, keyword in enumerate(keywords):
+            node = 0
+            for char in keyword:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append(dict())
+                    self.fail.append(0)
+                    self.output.append([])
+                node = next_node
+            self.output[node].append(idx)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self.goto[node].items():
+                queue.append(next_node)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                fail_state = self.goto[state].get(char, 0)
+                self.fail[next_node] = fail_state if fail_state != next_node else 0
+                self.output[next_node] = self.output[next_node] + self.output[self.fail[next_node]]
+
+    def find(self, text: str) -> Set[int]:
+        """
+        Get the indices of the keywords that occur in the text.
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class LiteralPrefilter:
+    """
+    Index of the patterns by their required literals.
+
+    Parameters
+    -----------
+    literals: List[List[Literal]]
+        Required literals of each pattern, as returned by :py:func:`~extract_literals`.
+    """
+
+    def __init__(self, literals: List[List[Literal]]) -> None:
+        keyword_ids: Dict[Literal, int] = dict()
+        self.keyword_patterns: List[List[int]] = []
+        for pattern_id, pattern_literals in enumerate(literals):
+            for literal in pattern_literals:
+                if literal not in keyword_ids:
+                    keyword_ids[literal] = len(self.keyword_patterns)
+                    self.keyword_patterns.append([])
+                self.keyword_patterns[keyword_ids[literal]].append(pattern_id)
+        keywords = sorted(keyword_ids, key=keyword_ids.get)
+        self._exact = self._build([(idx, text) for idx, (text, ignorecase) in enumerate(keywords) if not ignorecase])
+        self._folded = self._build([(idx, text) for idx, (text, ignorecase) in enumerate(keywords) if ignorecase])
+
+    @staticmethod
+    def _build(keywords: List[Tuple[int, str]]) -> Optional[Tuple[AhoCorasick, List[int]]]:
+        if not keywords:
+            return None
+        return AhoCorasick([text for _, text in keywords]), [idx for idx, _ in keywords]
+
+    def candidates(self, text: str) -> List[int]:
+        """
+        Get the sorted indices of the patterns whose literals occur in the text.
+        """
+        found = set()
+        if self._exact is not None:
+            automaton, ids = self._exact
+            found.update(ids[idx] for idx in automaton.find(text))
+        if self._folded is not None:
+            automaton, ids = self._folded
+            found.update(ids[idx] for idx in automaton.find(fold_case(text)))
+        return sorted({pattern_id for idx in found for pattern_id in self.keyword_patterns[idx]})
@@ -5,9 +5,10 @@ Sklearn Classifier
 This module provides an adapter interface for Sklearn models.
 Use Sklearn classifiers to achieve great results on a limited set of data.
 """
-from typing import Optional, Union
+from typing import List, Optional, Tuple, Union
 
 try:
+    import numpy as np
     from sklearn.base import BaseEstimator
     from sklearn.pipeline import Pipeline
 
@@ -17,6 +18,7 @@ except ImportError as e:
     Pipeline = object
 
 from ...sklearn import BaseSklearnModel
+from ....label_scores import LabelScores
 
 
 class SklearnClassifier(BaseSklearnModel):
@@ -32,6 +34,12 @@ class SklearnClassifier(BaseSklearnModel):
         of several preprocessors, unified with a pipeline.
     namespace_key: Optional[str]
         Name of the namespace in framework states that the model will be using.
+    top_k: Optional[int] = None
+        If set, only the labels with the `top_k` highest probabilities are kept.
+    min_score: Optional[float] = None
+        If set, the labels with lower probabilities are dropped.
+    compact_scores: bool = False
+        If set, the probabilities are returned as :py:class:`~LabelScores` instead of a dict.
     """
 
     def __init__(
@@ -39,16 +47,36 @@ class SklearnClassifier(BaseSklearnModel):
         model: Optional[BaseEstimator] = None,
         tokenizer: Optional[Union[BaseEstimator, Pipeline]] = None,
         namespace_key: Optional[str] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
     ) -> None:
         assert model is not None, "model parameter is required."
-        super().__init__(model, tokenizer, namespace_key)
+        super().__init__(
+            model, tokenizer, namespace_key, top_k=top_k, min_score=min_score, compact_scores=compact_scores
+        )
 
-    def predict(self, request: str) -> dict:
+    def predict(self, request: str) -> Union[dict, LabelScores]:
         if hasattr(self._pipeline, "predict_proba"):
             probas = self._pipeline.predict_proba([request])[0]
             labels = self._pipeline._final_estimator.classes_
-            result = {key: value for key, value in zip(labels, probas)}
+            result = self._select_labels(labels, probas)
         else:
             label = self._pipeline.predict([request])[0]
             result = {label: 1}
         return result
+
+    def predict_batch(self, requests: List[str]) -> List[Union[dict, LabelScores]]:
+        if not hasattr(self._pipeline, "predict_proba"):
+            return [{label: 1} for label in self._pipeline.predict(requests)] if requests else []
+        labels, probas = self.predict_batch_array(requests)
+        return [self._select_labels(labels, row) for row in probas]
+
+    def predict_batch_array(self, requests: List[str]) -> Tuple[List[str], np.ndarray]:
+        classes = getattr(self._pipeline._final_estimator, "classes_", None)
+        if not hasattr(self._pipeline, "predict_proba"):
+            return self._stack_predictions(self.predict_batch(requests), labels=classes)
+        labels = list(classes)
+        if not requests:
+            return labels, np.empty((0, len(labels)), dtype=np.float32)
+        return labels, self._mask_scores(self._pipeline.predict_proba(requests))
@@ -1,6 +1,12 @@
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+import copy
+import json
+import threading
+from typing import List, Optional, Tuple, Union
 from argparse import Namespace
 
+from sklearn.preprocessing import normalize
+
 try:
     import numpy as np
 
@@ -11,6 +17,11 @@ except ImportError as e:
 
 
 from ....dataset import Dataset
+from ....label_scores import LabelIndex
+from .index import ExactIndex, IVFIndex
+from .embedding_store import EmbeddingStore
+
+MATCHER_DATASET = "dataset.json"
 
 
 class CosineMatcherMixin:
@@ -18,24 +29,169 @@ class CosineMatcherMixin:
     This class imlements a 'predict' method that returns the likelihood of each label
     from a pre-defined collection, judging by how close the last request is to the examples.
 
+    The examples are embedded once and stored as a single L2-normalized reference matrix,
+    so that a request is scored with one matrix product. The matrix is built on the first
+    prediction and discarded whenever the dataset is replaced or the model is refit.
+    The index is built by a single thread, and the searches that run meanwhile keep using the previous index.
+
     Parameters
     -----------
     dataset: Dataset
         Labels for the matcher. The prediction output depends on proximity to examples of different labels.
+    index: Optional[Union[ExactIndex, IVFIndex]] = None
+        Search structure for the reference examples. Defaults to an exact search.
+        Use :py:class:`~IVFIndex` for large datasets to trade recall for latency;
+        in this case, labels that the search has not reached are omitted from the prediction.
+    embedding_store: Optional[EmbeddingStore] = None
+        Persistent store for the reference matrix. If set, the matrix is embedded once
+        per dataset and model fingerprint and then memory-mapped from the disk.
+        Sparse reference matrices are not stored.
     """
 
-    def __init__(self, dataset: Dataset):
+    def __init__(
+        self,
+        dataset: Dataset,
+        index: Optional[Union[ExactIndex, IVFIndex]] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+    ):
+        self._references_lock = threading.Lock()
+        self.index = index or ExactIndex()
+        self.embedding_store = embedding_store
         self.dataset = dataset
 
+    def __getstate__(self) -> dict:
+        parent_getstate = getattr(super(), "__getstate__", None)
+        state = dict(parent_getstate() if parent_getstate is not None else self.__dict__)
+        del state["_references_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        parent_setstate = getattr(super(), "__setstate__", None)
+        if parent_setstate is not None:
+            parent_setstate(state)
+        else:
+            self.__dict__.update(state)
+        self._references_lock = threading.Lock()
+
+    @property
+    def dataset(self) -> Dataset:
+        return self._dataset
+
+    @dataset.setter
+    def dataset(self, value: Dataset):
+        self._dataset = value
+        self.reset_references()
+
+    def reset_references(self) -> None:
+        """
+        Discard the reference index. It will be rebuilt on the next prediction.
+        """
+        with self._references_lock:
+            self._references: Optional[LabelIndex] = None
+
+    def save_dataset(self, path: str) -> None:
+        """
+        Save the dataset of the matcher to the model directory, see :py:meth:`~load_dataset`.
+        """
+        with open(os.path.join(path, MATCHER_DATASET), "w", encoding="utf-8") as file:
+            json.dump([item.dict() for item in self.dataset.items.values()], file, ensure_ascii=False)
+
+    @staticmethod
+    def load_dataset(path: str) -> Dataset:
+        """
+        Load the dataset saved to the model directory by :py:meth:`~save_dataset`.
+        """
+        return Dataset.parse_json(os.path.join(path, MATCHER_DATASET))
+
+    def fit(self, dataset: Dataset, **kwargs) -> None:
+        super().fit(dataset, **kwargs)
+        self.reset_references()
+
+    def _embed_references(self, samples: List[str]) -> np.ndarray:
+        """
+        Stack the representations of the reference samples into a single matrix.
+        Override this method, if the model can embed a collection of strings more efficiently.
+        """
+        return np.vstack([self.transform(item) for item in samples])
+
+    def _embed_request(self, request: str) -> np.ndarray:
+        """
+        Get the representation of the request that is compared to the reference matrix.
+        """
+        return self.transform(request)
+
+    def _embed_requests(self, requests: List[str]) -> np.ndarray:
+        """
+        Get the representations of several requests as a single matrix.
+        Defaults to the method that embeds the reference samples.
+        """
+        return self._embed_references(requests)
+
+    def _get_reference_matrix(self, samples: List[str]) -> np.ndarray:
+        """
+        Get the normalized reference matrix from the embedding store or embed the samples.
+        """
+        if self.embedding_store is None:
+            return normalize(self._embed_references(samples))
+        fingerprint = self.fingerprint()
+        key = self.embedding_store.get_key(fingerprint, samples)
+        matrix = self.embedding_store.load(key)
+        if matrix is None:
+            matrix = normalize(self._embed_references(samples))
+            if isinstance(matrix, np.ndarray):
+                matrix = self.embedding_store.save(key, matrix, fingerprint=fingerprint)
+        return matrix
+
+    def _get_references(self) -> LabelIndex:
+        """
+        Get the label table, building the reference index, if necessary.
+        """
+        references = self._references
+        if references is None:
+            with self._references_lock:
+                if self._references is None:
+                    labels = LabelIndex.from_dataset(self.dataset)
+                    dataset_items = [self.dataset.items[label] for label in labels]
+                    samples = [sample for dataset_item in dataset_items for sample in dataset_item.samples]
+                    label_ids = np.repeat(
+                        np.arange(len(labels)), [len(dataset_item.samples) for dataset_item in dataset_items]
+                    )
+                    if samples:
+                        # the new index replaces the old one at once, so a concurrent search sees either of them
+                        index = copy.copy(self.index)
+                        index.build(self._get_reference_matrix(samples), label_ids, len(labels))
+                        self.index = index
+                    self._references = labels
+                references = self._references
+        return references
+
+    def score_embedding(self, embedding: np.ndarray) -> dict:
+        """
+        Score a precomputed representation of a request, e.g. the one obtained
+        from a forward pass shared with another model.
+        """
+        labels = self._get_references()
+        if not labels:
+            return dict()
+        return self._select_labels(labels, self.index.search(normalize(embedding)))
+
     def predict(self, request: str) -> dict:
-        request_cls_embedding = self.transform(request)
-        result = dict()
-        for label_name, dataset_item in self.dataset.items.items():
-            reference_examples = dataset_item.samples
-            reference_embeddings = [self.transform(item) for item in reference_examples]
-            cosine_scores = [
-                cosine_similarity(request_cls_embedding, ref_emb)[0][0] for ref_emb in reference_embeddings
-            ]
-            result[label_name] = np.max(np.array(cosine_scores))
-
-        return result
+        if not self._get_references():
+            return dict()
+        return self.score_embedding(self._embed_request(request))
+
+    def _score_batch(self, requests: List[str]) -> Tuple[LabelIndex, np.ndarray]:
+        labels = self._get_references()
+        if not labels or not requests:
+            return labels, np.full((len(requests), len(labels)), np.nan, dtype=np.float32)
+        return labels, self.index.search_batch(normalize(self._embed_requests(requests)))
+
+    def predict_batch(self, requests: List[str]) -> List[dict]:
+        labels, scores = self._score_batch(requests)
+        if not labels:
+            return [dict() for _ in requests]
+        return [self._select_labels(labels, row) for row in scores]
+
+    def predict_batch_array(self, requests: List[str]) -> Tuple[List[str], np.ndarray]:
+        labels, scores = self._score_batch(requests)
+        return list(labels), self._mask_scores(scores)
@@ -0,0 +1,114 @@
+"""
+Embedding Store
+----------------
+
+This module provides a persistent store for the reference embeddings of cosine matchers.
+The embeddings are saved as `.npy` files and opened as read-only memory maps,
+so that several worker processes can share a single copy through the OS page cache
+instead of embedding the dataset anew on startup.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Union
+from argparse import Namespace
+
+try:
+    import numpy as np
+
+    IMPORT_ERROR_MESSAGE = None
+except ImportError as e:
+    np = Namespace(ndarray=None)
+    IMPORT_ERROR_MESSAGE = e.msg
+
+
+class EmbeddingStore:
+    """
+    Directory of precomputed reference embeddings. Each entry is keyed on the content hash
+    of the reference samples and on the fingerprint of the model that embedded them.
+    An entry is stored as a `<key>.npy` file with the embeddings and a `<key>.json` file with their description.
+    Each file is replaced atomically, and the entries do not share files,
+    so several processes can save to the same store without a lock.
+
+    Parameters
+    -----------
+    path: Union[str, Path]
+        Path to the store directory. The directory is created, if it does not exist.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
+        if IMPORT_ERROR_MESSAGE is not None:
+            raise ImportError(IMPORT_ERROR_MESSAGE)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def get_key(fingerprint: str, samples: List[str]) -> str:
+        """
+        Compute the entry key from the model fingerprint and the reference samples.
+        """
+        content = json.dumps([fingerprint, samples], ensure_ascii=False)
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def get_entry(self, key: str) -> Optional[dict]:
+        """
+        Read the description of an entry. Returns None, if the entry does not exist.
+        """
+        entry_path = self.path / f"{key}.json"
+        if not entry_path.exists():
+            return None
+        with entry_path.open("r", encoding="utf-8") as file:
+            return json.load(file)
+
+    @property
+    def manifest(self) -> dict:
+        """
+        The descriptions of all entries, keyed by the entry keys.
+        """
+        return {entry_path.stem: self.get_entry(entry_path.stem) for entry_path in sorted(self.path.glob("*.json"))}
+
+    def _write_atomically(self, file_name: str, write) -> None:
+        # write to a temporary file first, so that the readers never see partially written data
+        descriptor, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                write(file)
+            os.replace(temp_path, self.path / file_name)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        """
+        Open the stored embeddings as a read-only memory map. Returns None, if the entry does not exist.
+        """
+        entry = self.get_entry(key)
+        if entry is None or not (self.path / entry["file"]).exists():
+            return None
+        array = np.load(self.path / entry["file"], mmap_mode="r")
+        if list(array.shape) != entry["shape"] or str(array.dtype) != entry["dtype"]:
+            return None
+        return array
+
+    def save(self, key: str, array: np.ndarray, fingerprint: Optional[str] = None) -> np.ndarray:
+        """
+        Save the embeddings and their description.
+        Returns the saved embeddings opened as a read-only memory map.
+        """
+        array = np.ascontiguousarray(array)
+        file_name = f"{key}.npy"
+        self._write_atomically(file_name, lambda file: np.save(file, array))
+        entry = {
+            "file": file_name,
+            "shape": list(array.shape),
+            "dtype": str(array.dtype),
+            "fingerprint": fingerprint,
+            "created": time.time(),
+        }
+        # the description is written last, so that an entry is never listed before its embeddings are saved
+        self._write_atomically(f"{key}.json", lambda file: file.write(json.dumps(entry, indent=2).encode("utf-8")))
+        return np.load(self.path / file_name, mmap_mode="r")
@@ -5,7 +5,8 @@ Gensim Cosine Model
 This module provides an adapter interface for Gensim models.
 We use word2vec embeddings to compute distances between utterances.
 """
-from typing import Optional, Callable, List
+from functools import partial
+from typing import Optional, Callable, Dict, List, Tuple, Union
 import joblib
 
 try:
@@ -21,15 +22,22 @@ except ImportError as e:
     ALL_MODELS = []
 
 from ...base_model import BaseModel
+from ...embedding_cache import cached_embedding
+from ...lazy import LazyModel
 from ....dataset import Dataset
 from ....utils import DefaultTokenizer
 from .cosine_matcher_mixin import CosineMatcherMixin
+from .index import ExactIndex, IVFIndex
+from .embedding_store import EmbeddingStore
 
 
 class GensimMatcher(CosineMatcherMixin, BaseModel):
     """
     GensimMatcher utilizes embeddings from Gensim models to measure
     proximity between utterances and pre-defined labels.
+    Utterances are represented with the mean of normalized token vectors.
+    The vectors of the tokens that occur in the dataset are copied to a compact float32 table,
+    so that most requests are embedded with a single gather from this table.
 
     Parameters
     -----------
@@ -41,6 +49,20 @@ class GensimMatcher(CosineMatcherMixin, BaseModel):
         Class or function that performs string tokenization.
     namespace_key: Optional[str]
         Name of the namespace in framework states that the model will be using.
+    index: Optional[Union[ExactIndex, IVFIndex]] = None
+        Search structure for the reference examples. Defaults to an exact search.
+    embedding_store: Optional[EmbeddingStore] = None
+        Persistent store for the reference embeddings, shared by worker processes.
+    top_k: Optional[int] = None
+        If set, only the `top_k` closest labels are kept in the prediction.
+    min_score: Optional[float] = None
+        If set, the labels with lower similarity are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the similarities are returned as :py:class:`~LabelScores` instead of a dict.
+    oov_policy: str = "model"
+        Treatment of request tokens that are missing from the dataset vocabulary.
+        With "model", their vectors are retrieved from the full model, which makes the
+        representations identical to `get_mean_vector`. With "ignore", such tokens are skipped.
     kwargs:
         Keyword arguments are forwarded to the model constructor.
     """
@@ -51,19 +73,84 @@ class GensimMatcher(CosineMatcherMixin, BaseModel):
         dataset: Dataset,
         tokenizer: Optional[Callable[[str], List[str]]] = None,
         namespace_key: Optional[str] = None,
+        index: Optional[Union[ExactIndex, IVFIndex]] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
+        oov_policy: str = "model",
         **kwargs,
     ) -> None:
         IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
         if IMPORT_ERROR_MESSAGE is not None:
             raise ImportError(IMPORT_ERROR_MESSAGE)
-        CosineMatcherMixin.__init__(self, dataset=dataset)
-        BaseModel.__init__(self, namespace_key=namespace_key)
+        if oov_policy not in ("model", "ignore"):
+            raise ValueError(f"Unknown oov_policy: {oov_policy}. Use 'model' or 'ignore'.")
+        self.oov_policy = oov_policy
+        CosineMatcherMixin.__init__(self, dataset=dataset, index=index, embedding_store=embedding_store)
+        BaseModel.__init__(
+            self, namespace_key=namespace_key, top_k=top_k, min_score=min_score, compact_scores=compact_scores
+        )
         self.model = model
         self.tokenizer = tokenizer or DefaultTokenizer()
         # self.fit(self.dataset, **kwargs)
 
+    def reset_references(self) -> None:
+        super().reset_references()
+        self._token_table: Optional[Tuple[Dict[str, int], np.ndarray]] = None
+        if self.oov_policy == "ignore":  # representations depend on the dataset vocabulary
+            self.version += 1
+
+    def _get_token_table(self) -> Tuple[Dict[str, int], np.ndarray]:
+        """
+        Get the mapping from the dataset tokens to the rows of the token table and the table itself.
+        """
+        if self._token_table is None:
+            tokens = {
+                token
+                for dataset_item in self.dataset.items.values()
+                for sample in dataset_item.samples
+                for token in self.tokenizer(sample)
+                if token in self.model.wv
+            }
+            token_ids = {token: idx for idx, token in enumerate(sorted(tokens))}
+            table = np.zeros((len(token_ids), self.model.wv.vector_size), dtype=np.float32)
+            for token, idx in token_ids.items():
+                table[idx] = self.model.wv.get_vector(token, norm=True)
+            self._token_table = (token_ids, table)
+        return self._token_table
+
+    def _mean_vectors(self, tokenized_requests: List[List[str]]) -> np.ndarray:
+        """
+        Average the normalized token vectors of each request.
+        Requests without known tokens are represented with zero vectors.
+        """
+        token_ids, table = self._get_token_table()
+        result = np.zeros((len(tokenized_requests), table.shape[1]), dtype=np.float32)
+        counts = np.zeros(len(tokenized_requests), dtype=np.float32)
+        rows, ids = [], []
+        for row, tokens in enumerate(tokenized_requests):
+            for token in tokens:
+                idx = token_ids.get(token)
+                if idx is not None:
+                    rows.append(row)
+                    ids.append(idx)
+                elif self.oov_policy == "model" and token in self.model.wv:
+                    result[row] += self.model.wv.get_vector(token, norm=True)
+                    counts[row] += 1
+        np.add.at(result, rows, table[ids])
+        counts += np.bincount(rows, minlength=len(tokenized_requests))
+        return result / np.maximum(counts, 1)[:, None]
+
+    @cached_embedding
     def transform(self, request: str):
-        return self.model.wv.get_mean_vector(self.tokenizer(request)).reshape(1, -1)
+        return self._mean_vectors([self.tokenizer(request)])
+
+    def transform_batch(self, requests: List[str]) -> np.ndarray:
+        return self._mean_vectors(list(map(self.tokenizer, requests)))
+
+    def _embed_references(self, samples: List[str]) -> np.ndarray:
+        return self.transform_batch(samples)
 
     def fit(self, dataset: Dataset, **kwargs) -> None:
         """
@@ -76,6 +163,11 @@ class GensimMatcher(CosineMatcherMixin, BaseModel):
         self.model = self.model.__class__(**kwargs)
         self.model.build_vocab(tokenized_sents)
         self.model.train(tokenized_sents, total_examples=self.model.corpus_count, epochs=self.model.epochs)
+        self.version += 1
+        self.reset_references()
+
+    def fingerprint(self) -> str:
+        return joblib.hash((type(self.model).__name__, self.model.wv, self.tokenizer))
 
     def save(self, path: str):
         self.model.save(path)
@@ -83,7 +175,19 @@ class GensimMatcher(CosineMatcherMixin, BaseModel):
         joblib.dump(self.tokenizer, f"{path}.tokenizer")
 
     @classmethod
-    def load(cls, path: str, namespace_key: str) -> __qualname__:
+    def load(cls, path: str, namespace_key: str, lazy: bool = False) -> Union[__qualname__, LazyModel]:
+        """
+        Parameters
+        -----------
+        path: str
+            Path to the saved model.
+        namespace_key: str
+            Name of the namespace in framework states that the model will be using.
+        lazy: bool = False
+            If set, a :py:class:`~LazyModel` is returned, and the model is loaded on first use.
+        """
+        if lazy:
+            return LazyModel(partial(cls.load, path, namespace_key), namespace_key=namespace_key)
         with open(path, "rb") as picklefile:
             contents = picklefile.readline()  # get the header line, find the class name inside
         for name in ALL_MODELS:
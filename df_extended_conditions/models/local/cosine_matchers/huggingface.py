@@ -5,7 +5,7 @@ HuggingFace Cosine Model
 This module provides an adapter interface for Huggingface models.
 It leverages transformer embeddings to compute distances between utterances.
 """
-from typing import Optional
+from typing import List, Optional, Sequence, Union
 from argparse import Namespace
 
 try:
@@ -24,7 +24,10 @@ except ImportError as e:
 
 from ....dataset import Dataset
 from ...huggingface import BaseHFModel
+from ...lazy import LazyModel
 from .cosine_matcher_mixin import CosineMatcherMixin
+from .index import ExactIndex, IVFIndex
+from .embedding_store import EmbeddingStore
 
 
 class HFMatcher(CosineMatcherMixin, BaseHFModel):
@@ -48,6 +51,28 @@ class HFMatcher(CosineMatcherMixin, BaseHFModel):
         Default tokenizer arguments override.
     model_kwargs: Optional[dict] = None
         Default model arguments override.
+    index: Optional[Union[ExactIndex, IVFIndex]] = None
+        Search structure for the reference examples. Defaults to an exact search.
+    embedding_store: Optional[EmbeddingStore] = None
+        Persistent store for the reference embeddings, shared by worker processes.
+    top_k: Optional[int] = None
+        If set, only the `top_k` closest labels are kept in the prediction.
+    min_score: Optional[float] = None
+        If set, the labels with lower similarity are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the similarities are returned as :py:class:`~LabelScores` instead of a dict.
+    quantize: Optional[str] = None
+        If set to "dynamic-int8", the linear layers of the model are quantized to int8.
+        The quantized model only runs on CPU.
+    max_length: Optional[int] = None
+        Maximum number of tokens in a request, including the special tokens.
+        The requests are not truncated, if set to None.
+    truncation: str = "head+tail"
+        Part of a long request that is kept: "head", "tail" or "head+tail".
+    head_fraction: float = 0.25
+        Fraction of the tokens taken from the beginning of the request by the "head+tail" truncation.
+    padding_buckets: Optional[Sequence[int]] = None
+        Lengths the batches are padded to, e.g. (16, 32, 64, 128).
     """
 
     def __init__(
@@ -59,6 +84,83 @@ class HFMatcher(CosineMatcherMixin, BaseHFModel):
         dataset: Dataset,
         tokenizer_kwargs: Optional[dict] = None,
         model_kwargs: Optional[dict] = None,
+        index: Optional[Union[ExactIndex, IVFIndex]] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
+        quantize: Optional[str] = None,
+        max_length: Optional[int] = None,
+        truncation: str = "head+tail",
+        head_fraction: float = 0.25,
+        padding_buckets: Optional[Sequence[int]] = None,
     ) -> None:
-        CosineMatcherMixin.__init__(self, dataset=dataset)
-        BaseHFModel.__init__(self, namespace_key, model, tokenizer, device, tokenizer_kwargs, model_kwargs)
+        CosineMatcherMixin.__init__(self, dataset=dataset, index=index, embedding_store=embedding_store)
+        BaseHFModel.__init__(
+            self,
+            model=model,
+            tokenizer=tokenizer,
+            device=device,
+            namespace_key=namespace_key,
+            tokenizer_kwargs=tokenizer_kwargs,
+            model_kwargs=model_kwargs,
+            top_k=top_k,
+            min_score=min_score,
+            compact_scores=compact_scores,
+            quantize=quantize,
+            max_length=max_length,
+            truncation=truncation,
+            head_fraction=head_fraction,
+            padding_buckets=padding_buckets,
+        )
+
+    def _embed_references(self, samples: List[str]) -> np.ndarray:
+        return self.transform_batch(samples)
+
+    def _embed_requests(self, requests: List[str]) -> np.ndarray:
+        return self.transform_batch(requests, batch_size=max(len(requests), 1))
+
+    def save(self, path: str, **kwargs) -> None:
+        """
+        The dataset of the matcher is saved along with the model.
+
+        Parameters
+        -----------
+        path: str
+            Path to saving directory.
+        kwargs
+            Keyword arguments are forwarded to the 'save_pretrained' method of the underlying model.
+        """
+        super().save(path, **kwargs)
+        self.save_dataset(path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        namespace_key: str,
+        dataset: Optional[Dataset] = None,
+        quantize: Optional[str] = None,
+        lazy: bool = False,
+        **kwargs,
+    ) -> Union[__qualname__, LazyModel]:
+        """
+        Parameters
+        -----------
+        path: str
+            Path to saving directory.
+        namespace_key: str
+            Name of the namespace in framework states that the model will be using.
+        dataset: Optional[Dataset] = None
+            Labels for the matcher. Defaults to the dataset saved with the model.
+        quantize: Optional[str] = None
+            Quantization mode applied to the loaded model.
+            The models saved after quantization are loaded in the saved mode.
+        lazy: bool = False
+            If set, a :py:class:`~LazyModel` is returned, and the model is loaded on first use.
+        kwargs
+            Keyword arguments are forwarded to the constructor.
+        """
+        if dataset is None and not lazy:
+            dataset = cls.load_dataset(path)
+        return super().load(path, namespace_key, quantize=quantize, lazy=lazy, dataset=dataset, **kwargs)
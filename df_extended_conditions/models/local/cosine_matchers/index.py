@@ -0,0 +1,169 @@
+"""
+Reference Index
+----------------
+
+This module provides search structures that cosine matchers use to compare a request
+against the reference examples. :py:class:`~ExactIndex` performs a brute-force search,
+while :py:class:`~IVFIndex` partitions the examples with spherical k-means and only
+searches the partitions that are closest to the request.
+"""
+from typing import Optional
+from argparse import Namespace
+
+try:
+    import numpy as np
+    from scipy.sparse import issparse
+
+    IMPORT_ERROR_MESSAGE = None
+except ImportError as e:
+    np = Namespace(ndarray=None)
+    issparse = None
+    IMPORT_ERROR_MESSAGE = e.msg
+
+
+class ExactIndex:
+    """
+    Brute-force index. The request is compared to every reference example with
+    a single matrix product, and the maximum similarity of each label is computed
+    with a segmented reduction. Both dense arrays and sparse matrices are supported.
+    """
+
+    def build(self, matrix: np.ndarray, label_ids: np.ndarray, n_labels: int) -> None:
+        """
+        Index the reference examples.
+
+        Parameters
+        -----------
+        matrix: np.ndarray
+            L2-normalized embeddings of the examples, one row per example.
+            The rows should be grouped by label. Can be a sparse matrix.
+        label_ids: np.ndarray
+            Label index of each row.
+        n_labels: int
+            Total number of labels.
+        """
+        self.matrix = matrix
+        self.offsets = np.searchsorted(label_ids, np.arange(n_labels))
+
+    def search(self, query: np.ndarray) -> np.ndarray:
+        """
+        Get the maximum cosine similarity of the L2-normalized query to the examples of each label.
+        """
+        scores = self.matrix @ query.T
+        scores = scores.toarray().ravel() if issparse(scores) else np.asarray(scores).ravel()
+        return np.maximum.reduceat(scores, self.offsets)
+
+    def search_batch(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Get the maximum cosine similarities of several L2-normalized queries, one row per query.
+        All the queries are compared to the examples with a single matrix product.
+        """
+        scores = queries @ self.matrix.T
+        scores = scores.toarray() if issparse(scores) else np.asarray(scores)
+        return np.maximum.reduceat(scores, self.offsets, axis=1)
+
+
+class IVFIndex:
+    """
+    Inverted file index. The examples are split into partitions with spherical k-means.
+    A query is only compared to the examples from the `n_probe` partitions with the closest centroids,
+    so the labels that have no examples in those partitions are not scored.
+    Increase `n_probe` to improve the recall at the cost of latency; setting it to `n_partitions`
+    makes the search exact. The index is stored as a dense float32 array, so sparse embeddings are densified.
+
+    Parameters
+    -----------
+    n_partitions: Optional[int] = None
+        Number of partitions. Defaults to the square root of the number of examples.
+    n_probe: int = 8
+        Number of partitions searched for each query.
+    n_iter: int = 10
+        Number of k-means iterations.
+    max_train_size: Optional[int] = None
+        Maximum number of examples used to train the centroids. Defaults to 64 examples per partition.
+    seed: int = 0
+        Random seed for centroid initialization.
+    """
+
+    def __init__(
+        self,
+        n_partitions: Optional[int] = None,
+        n_probe: int = 8,
+        n_iter: int = 10,
+        max_train_size: Optional[int] = None,
+        seed: int = 0,
+    ) -> None:
+        IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
+        if IMPORT_ERROR_MESSAGE is not None:
+            raise ImportError(IMPORT_ERROR_MESSAGE)
+        self.n_partitions = n_partitions
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.max_train_size = max_train_size
+        self.seed = seed
+
+    def _train_centroids(self, matrix: np.ndarray, n_partitions: int) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        max_train_size = self.max_train_size or 64 * n_partitions
+        if matrix.shape[0] > max_train_size:
+            matrix = matrix[rng.choice(matrix.shape[0], max_train_size, replace=False)]
+        centroids = matrix[rng.choice(matrix.shape[0], n_partitions, replace=False)]
+        for _ in range(self.n_iter):
+            assignments = np.argmax(matrix @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, matrix)
+            empty = ~sums.any(axis=1)
+            sums[empty] = matrix[rng.choice(matrix.shape[0], int(empty.sum()))]  # restart empty partitions
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1, norms)
+        return centroids
+
+    def build(self, matrix: np.ndarray, label_ids: np.ndarray, n_labels: int) -> None:
+        """
+        Index the reference examples.
+
+        Parameters
+        -----------
+        matrix: np.ndarray
+            L2-normalized embeddings of the examples, one row per example.
+        label_ids: np.ndarray
+            Label index of each row.
+        n_labels: int
+            Total number of labels.
+        """
+        matrix = np.asarray(matrix.toarray() if issparse(matrix) else matrix, dtype=np.float32)
+        n_partitions = self.n_partitions or int(np.ceil(np.sqrt(matrix.shape[0])))
+        n_partitions = min(n_partitions, matrix.shape[0])
+        self.centroids = self._train_centroids(matrix, n_partitions)
+        assignments = np.argmax(matrix @ self.centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        self.matrix = np.ascontiguousarray(matrix[order])
+        self.label_ids = np.asarray(label_ids)[order]
+        self.bounds = np.searchsorted(assignments[order], np.arange(n_partitions + 1))
+        self.n_labels = n_labels
+
+    def search(self, query: np.ndarray) -> np.ndarray:
+        """
+        Get the maximum cosine similarity of the L2-normalized query to the examples of each label.
+        Labels that have not been reached by the search are scored with `nan`.
+        """
+        query = np.asarray(query.toarray() if issparse(query) else query, dtype=np.float32).ravel()
+        centroid_scores = self.centroids @ query
+        n_probe = min(self.n_probe, centroid_scores.shape[0])
+        probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        rows = np.concatenate([np.arange(self.bounds[idx], self.bounds[idx + 1]) for idx in probed])
+        result = np.full(self.n_labels, -np.inf, dtype=np.float32)
+        np.maximum.at(result, self.label_ids[rows], self.matrix[rows] @ query)
+        result[np.isneginf(result)] = np.nan
+        return result
+
+    def search_batch(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Get the maximum cosine similarities of several L2-normalized queries, one row per query.
+        Each query probes its own partitions, so the queries are searched one by one.
+        """
+        queries = np.asarray(queries.toarray() if issparse(queries) else queries, dtype=np.float32)
+        result = np.empty((queries.shape[0], self.n_labels), dtype=np.float32)
+        for idx, query in enumerate(queries):
+            result[idx] = self.search(query)
+        return result
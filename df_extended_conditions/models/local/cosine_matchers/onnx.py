@@ -0,0 +1,155 @@
+"""
+ONNX Runtime Cosine Model
+--------------------------
+
+This module provides a matcher that runs Hugging Face models exported to ONNX.
+It leverages transformer embeddings to compute distances between utterances.
+"""
+from typing import List, Optional, Sequence, Union
+from argparse import Namespace
+
+try:
+    import numpy as np
+    from tokenizers import Tokenizer
+    from transformers import PretrainedConfig
+
+    IMPORT_ERROR_MESSAGE = None
+except ImportError as e:
+    np = Namespace(ndarray=None)
+    Tokenizer = None
+    PretrainedConfig = None
+    IMPORT_ERROR_MESSAGE = e.msg
+
+from ....dataset import Dataset
+from ...lazy import LazyModel
+from ...onnx import BaseORTModel
+from .cosine_matcher_mixin import CosineMatcherMixin
+from .index import ExactIndex, IVFIndex
+from .embedding_store import EmbeddingStore
+
+
+class ORTMatcher(CosineMatcherMixin, BaseORTModel):
+    """
+    ORTMatcher utilizes embeddings from Hugging Face models run with ONNX Runtime to measure
+    proximity between utterances and pre-defined labels.
+
+    Parameters
+    -----------
+    model_path: str
+        Path to the ONNX model file.
+    tokenizer: Tokenizer
+        A pretrained Hugging Face tokenizer.
+    config: PretrainedConfig
+        Config of the exported model.
+    namespace_key: str
+        Name of the namespace in framework states that the model will be using.
+    dataset: Dataset
+        Labels for the matcher. The prediction output depends on proximity to different labels.
+    tokenizer_kwargs: Optional[dict] = None
+        Default tokenizer arguments override.
+    intra_op_num_threads: Optional[int] = None
+        Number of threads used to parallelize a single operator. Defaults to the number of cores.
+    inter_op_num_threads: Optional[int] = None
+        Number of threads used to run independent operators in parallel.
+    providers: Optional[List[str]] = None
+        ONNX Runtime execution providers. Defaults to the CPU provider.
+    index: Optional[Union[ExactIndex, IVFIndex]] = None
+        Search structure for the reference examples. Defaults to an exact search.
+    embedding_store: Optional[EmbeddingStore] = None
+        Persistent store for the reference embeddings, shared by worker processes.
+    top_k: Optional[int] = None
+        If set, only the `top_k` closest labels are kept in the prediction.
+    min_score: Optional[float] = None
+        If set, the labels with lower similarity are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the similarities are returned as :py:class:`~LabelScores` instead of a dict.
+    max_length: Optional[int] = None
+        Maximum number of tokens in a request. The requests are not truncated, if set to None.
+    truncation: str = "head+tail"
+        Part of a long request that is kept: "head", "tail" or "head+tail".
+    head_fraction: float = 0.25
+        Fraction of the tokens taken from the beginning of the request by the "head+tail" truncation.
+    padding_buckets: Optional[Sequence[int]] = None
+        Lengths the batches are padded to, see :py:class:`~BaseHFModel`.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer: Tokenizer,
+        config: PretrainedConfig,
+        namespace_key: str,
+        dataset: Dataset,
+        tokenizer_kwargs: Optional[dict] = None,
+        intra_op_num_threads: Optional[int] = None,
+        inter_op_num_threads: Optional[int] = None,
+        providers: Optional[List[str]] = None,
+        index: Optional[Union[ExactIndex, IVFIndex]] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
+        max_length: Optional[int] = None,
+        truncation: str = "head+tail",
+        head_fraction: float = 0.25,
+        padding_buckets: Optional[Sequence[int]] = None,
+    ) -> None:
+        CosineMatcherMixin.__init__(self, dataset=dataset, index=index, embedding_store=embedding_store)
+        BaseORTModel.__init__(
+            self,
+            model_path=model_path,
+            tokenizer=tokenizer,
+            config=config,
+            namespace_key=namespace_key,
+            tokenizer_kwargs=tokenizer_kwargs,
+            intra_op_num_threads=intra_op_num_threads,
+            inter_op_num_threads=inter_op_num_threads,
+            providers=providers,
+            top_k=top_k,
+            min_score=min_score,
+            compact_scores=compact_scores,
+            max_length=max_length,
+            truncation=truncation,
+            head_fraction=head_fraction,
+            padding_buckets=padding_buckets,
+        )
+
+    def _embed_references(self, samples: List[str]) -> np.ndarray:
+        return self.transform_batch(samples)
+
+    def _embed_requests(self, requests: List[str]) -> np.ndarray:
+        return self.transform_batch(requests, batch_size=max(len(requests), 1))
+
+    def save(self, path: str, **kwargs) -> None:
+        """
+        The dataset of the matcher is saved along with the model.
+
+        Parameters
+        -----------
+        path: str
+            Path to saving directory.
+        """
+        super().save(path, **kwargs)
+        self.save_dataset(path)
+
+    @classmethod
+    def load(
+        cls, path: str, namespace_key: str, dataset: Optional[Dataset] = None, lazy: bool = False, **kwargs
+    ) -> Union[__qualname__, LazyModel]:
+        """
+        Parameters
+        -----------
+        path: str
+            Path to the directory written by :py:meth:`~BaseHFModel.export_onnx` or :py:meth:`~save`.
+        namespace_key: str
+            Name of the namespace in framework states that the model will be using.
+        dataset: Optional[Dataset] = None
+            Labels for the matcher. Defaults to the dataset saved with the model.
+        lazy: bool = False
+            If set, a :py:class:`~LazyModel` is returned, and the model is loaded on first use.
+        kwargs
+            Keyword arguments are forwarded to the constructor, e.g. the thread counts.
+        """
+        if dataset is None and not lazy:
+            dataset = cls.load_dataset(path)
+        return super().load(path, namespace_key=namespace_key, dataset=dataset, lazy=lazy, **kwargs)
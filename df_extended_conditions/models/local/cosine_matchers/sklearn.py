@@ -5,26 +5,38 @@ Sklearn Cosine Matcher
 This module provides an adapter interface for sklearn models.
 It uses Sklearn BOW representations and other features to compute distances between utterances.
 """
-from typing import Optional, Union
+from typing import List, Optional, Union
+from argparse import Namespace
 
 try:
+    import numpy as np
     from sklearn.base import BaseEstimator
     from sklearn.pipeline import Pipeline
 
+    from scipy.sparse import spmatrix
+
     IMPORT_ERROR_MESSAGE = None
 except ImportError as e:
+    np = Namespace(ndarray=None)
     BaseEstimator = object
+    spmatrix = object
     IMPORT_ERROR_MESSAGE = e.msg
 
 from ...sklearn import BaseSklearnModel
+from ...embedding_cache import cached_embedding
 from ....dataset import Dataset
 from .cosine_matcher_mixin import CosineMatcherMixin
+from .index import ExactIndex, IVFIndex
+from .embedding_store import EmbeddingStore
 
 
 class SklearnMatcher(CosineMatcherMixin, BaseSklearnModel):
     """
     SklearnMatcher utilizes embeddings from Sklearn models to measure
     proximity between utterances and pre-defined labels.
+    Sparse representations, like those of TfidfVectorizer, are never densified during prediction:
+    the reference matrix is kept in the sparse format, so the cost of scoring a request
+    depends on the number of non-zero features rather than on the vocabulary size.
 
     Parameters
     -----------
@@ -37,6 +49,16 @@ class SklearnMatcher(CosineMatcherMixin, BaseSklearnModel):
         of several preprocessors, unified with a pipeline.
     namespace_key: Optional[str]
         Name of the namespace in framework states that the model will be using.
+    index: Optional[Union[ExactIndex, IVFIndex]] = None
+        Search structure for the reference examples. Defaults to an exact search.
+    embedding_store: Optional[EmbeddingStore] = None
+        Persistent store for the reference embeddings, shared by worker processes.
+    top_k: Optional[int] = None
+        If set, only the `top_k` closest labels are kept in the prediction.
+    min_score: Optional[float] = None
+        If set, the labels with lower similarity are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the similarities are returned as :py:class:`~LabelScores` instead of a dict.
     """
 
     def __init__(
@@ -45,6 +67,26 @@ class SklearnMatcher(CosineMatcherMixin, BaseSklearnModel):
         dataset: Optional[Dataset] = None,
         tokenizer: Optional[Union[BaseEstimator, Pipeline]] = None,
         namespace_key: Optional[str] = None,
+        index: Optional[Union[ExactIndex, IVFIndex]] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
     ) -> None:
-        CosineMatcherMixin.__init__(self, dataset=dataset)
-        BaseSklearnModel.__init__(self, model=model, tokenizer=tokenizer, namespace_key=namespace_key)
+        CosineMatcherMixin.__init__(self, dataset=dataset, index=index, embedding_store=embedding_store)
+        BaseSklearnModel.__init__(
+            self,
+            model=model,
+            tokenizer=tokenizer,
+            namespace_key=namespace_key,
+            top_k=top_k,
+            min_score=min_score,
+            compact_scores=compact_scores,
+        )
+
+    def _embed_references(self, samples: List[str]) -> Union[np.ndarray, spmatrix]:
+        return self._pipeline.transform(samples)
+
+    @cached_embedding
+    def _embed_request(self, request: str) -> Union[np.ndarray, spmatrix]:
+        return self._pipeline.transform([request])
@@ -0,0 +1,247 @@
+"""
+Base ONNX Model
+****************
+
+This module provides a base class for matchers and classifiers that run
+exported Hugging Face models with ONNX Runtime. On CPU, ONNX Runtime is considerably faster
+than eager PyTorch for small transformer models. Export a model with
+:py:meth:`~BaseHFModel.export_onnx` and load it with the `load` method of an ONNX-based model.
+"""
+import os
+import json
+import shutil
+import hashlib
+from functools import partial
+from pathlib import Path
+from argparse import Namespace
+from typing import List, Optional, Sequence, Union
+from collections.abc import Iterable
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    from transformers import AutoConfig, AutoTokenizer, PretrainedConfig
+
+    IMPORT_ERROR_MESSAGE = None
+except ImportError as e:
+    np = Namespace(ndarray=None)
+    ort = None
+    Tokenizer = None
+    PretrainedConfig = None
+    IMPORT_ERROR_MESSAGE = e.msg
+
+from .base_model import BaseModel
+from .embedding_cache import cached_embedding
+from .huggingface import HFTokenizationMixin
+from .lazy import LazyModel
+from ..dataset import Dataset
+
+ONNX_MODEL = "model.onnx"
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+ONNX_OUTPUTS = ("logits", "last_hidden_state")
+
+
+def create_session(
+    path: str,
+    intra_op_num_threads: Optional[int] = None,
+    inter_op_num_threads: Optional[int] = None,
+    providers: Optional[List[str]] = None,
+):
+    """
+    Create an ONNX Runtime inference session.
+
+    Parameters
+    -----------
+    path: str
+        Path to the ONNX model file.
+    intra_op_num_threads: Optional[int] = None
+        Number of threads used to parallelize a single operator. Defaults to the number of cores.
+    inter_op_num_threads: Optional[int] = None
+        Number of threads used to run independent operators in parallel.
+    providers: Optional[List[str]] = None
+        Execution providers. Defaults to the CPU provider.
+    """
+    options = ort.SessionOptions()
+    if intra_op_num_threads is not None:
+        options.intra_op_num_threads = intra_op_num_threads
+    if inter_op_num_threads is not None:
+        options.inter_op_num_threads = inter_op_num_threads
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(str(path), sess_options=options, providers=providers or ["CPUExecutionProvider"])
+
+
+class BaseORTModel(HFTokenizationMixin, BaseModel):
+    """
+    Base class for the models that run exported Hugging Face models with ONNX Runtime.
+    The model file should have the inputs and the outputs written by :py:meth:`~BaseHFModel.export_onnx`.
+    The requests are tokenized in the same way as by :py:class:`~BaseHFModel`, so that the exported model
+    gives the same predictions as the original one with the same truncation settings.
+    The inference session is created anew when the model is unpickled, e.g. in a worker process.
+
+    Parameters
+    -----------
+    model_path: str
+        Path to the ONNX model file.
+    tokenizer: Tokenizer
+        A pretrained Hugging Face tokenizer.
+    config: PretrainedConfig
+        Config of the exported model. The label names are taken from its `id2label` field.
+    namespace_key: Optional[str] = None
+        Name of the namespace in framework states that the model will be using.
+    tokenizer_kwargs: Optional[dict] = None
+        Default tokenizer arguments override.
+    intra_op_num_threads: Optional[int] = None
+        Number of threads used to parallelize a single operator. Defaults to the number of cores.
+    inter_op_num_threads: Optional[int] = None
+        Number of threads used to run independent operators in parallel.
+    providers: Optional[List[str]] = None
+        ONNX Runtime execution providers. Defaults to the CPU provider.
+    top_k: Optional[int] = None
+        If set, only the labels with the `top_k` highest scores are kept in the prediction.
+    min_score: Optional[float] = None
+        If set, the labels scored below this value are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the scores are returned as :py:class:`~LabelScores` instead of a dict.
+    max_length: Optional[int] = None
+        Maximum number of tokens in a request, including the special tokens.
+        The requests are not truncated, if set to None.
+    truncation: str = "head+tail"
+        Part of a long request that is kept: "head", "tail" or "head+tail".
+    head_fraction: float = 0.25
+        Fraction of the tokens taken from the beginning of the request by the "head+tail" truncation.
+    padding_buckets: Optional[Sequence[int]] = None
+        Lengths the batches are padded to, see :py:class:`~BaseHFModel`.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        tokenizer: Tokenizer,
+        config: PretrainedConfig,
+        namespace_key: Optional[str] = None,
+        tokenizer_kwargs: Optional[dict] = None,
+        intra_op_num_threads: Optional[int] = None,
+        inter_op_num_threads: Optional[int] = None,
+        providers: Optional[List[str]] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
+        max_length: Optional[int] = None,
+        truncation: str = "head+tail",
+        head_fraction: float = 0.25,
+        padding_buckets: Optional[Sequence[int]] = None,
+    ) -> None:
+        IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
+        if IMPORT_ERROR_MESSAGE is not None:
+            raise ImportError(IMPORT_ERROR_MESSAGE)
+        super().__init__(namespace_key=namespace_key, top_k=top_k, min_score=min_score, compact_scores=compact_scores)
+        self._init_tokenization(max_length, truncation, head_fraction, padding_buckets)
+        self.model_path = str(model_path)
+        self.tokenizer = tokenizer
+        self.config = config
+        self.tokenizer_kwargs = {**(tokenizer_kwargs or dict()), "return_tensors": "np"}
+        self.session_kwargs = {
+            "intra_op_num_threads": intra_op_num_threads,
+            "inter_op_num_threads": inter_op_num_threads,
+            "providers": providers,
+        }
+        self.session = create_session(self.model_path, **self.session_kwargs)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self._fingerprint: Optional[str] = None
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        del state["session"]  # inference sessions cannot be pickled
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        super().__setstate__(state)
+        self.session = create_session(self.model_path, **self.session_kwargs)
+
+    def run(self, requests: List[str], bucketed: bool = False) -> List[np.ndarray]:
+        """
+        Run the model on several requests, truncated and padded by :py:meth:`~tokenize`.
+        Returns the logits and the last hidden state.
+        """
+        tokenized_examples, _ = self.tokenize(requests, bucketed=bucketed)
+        inputs = {name: np.asarray(tokenized_examples[name], dtype=np.int64) for name in self.input_names}
+        return self.session.run(list(ONNX_OUTPUTS), inputs)
+
+    @cached_embedding
+    def transform(self, request: str) -> Iterable:
+        _, hidden_state = self.run([request])
+        return hidden_state[0, 0, :].reshape(1, -1)  # reshape for cosine similarity
+
+    def transform_batch(self, requests: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Get the representations of several requests as a single array, one row per request.
+        The requests are sorted by length and padded batch by batch to minimize the amount of padding.
+
+        Parameters
+        -----------
+        requests: List[str]
+            Strings to embed.
+        batch_size: int = 32
+            Number of strings in a single run.
+        """
+        order = sorted(range(len(requests)), key=lambda idx: len(requests[idx]))
+        result = np.empty((len(requests), self.config.hidden_size), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            indices = order[start : start + batch_size]
+            _, hidden_state = self.run([requests[idx] for idx in indices], bucketed=True)
+            result[indices] = hidden_state[:, 0, :]
+        return result
+
+    def fit(self, dataset: Dataset) -> None:
+        raise NotImplementedError
+
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            with open(self.model_path, "rb") as file:
+                for chunk in iter(lambda: file.read(2**20), b""):
+                    digest.update(chunk)
+            digest.update(json.dumps(self.tokenizer.get_vocab(), sort_keys=True).encode("utf-8"))
+            truncation = (self.max_length, self.truncation, self.head_fraction)
+            digest.update(repr((sorted(self.tokenizer_kwargs.items()),) + truncation).encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def save(self, path: str, **kwargs) -> None:
+        """
+        Parameters
+        -----------
+        path: str
+            Path to saving directory.
+        """
+        Path(path).mkdir(parents=True, exist_ok=True)
+        model_path = os.path.join(path, ONNX_MODEL)
+        if os.path.abspath(model_path) != os.path.abspath(self.model_path):
+            shutil.copyfile(self.model_path, model_path)
+        self.config.save_pretrained(path)
+        self.tokenizer.save_pretrained(path)
+
+    @classmethod
+    def load(cls, path: str, namespace_key: str, lazy: bool = False, **kwargs) -> Union[__qualname__, LazyModel]:
+        """
+        Parameters
+        -----------
+        path: str
+            Path to the directory written by :py:meth:`~BaseHFModel.export_onnx` or :py:meth:`~save`.
+        namespace_key: str
+            Name of the namespace in framework states that the model will be using.
+        lazy: bool = False
+            If set, a :py:class:`~LazyModel` is returned, and the model is loaded on first use.
+        kwargs
+            Keyword arguments are forwarded to the constructor, e.g. the thread counts.
+        """
+        if lazy:
+            return LazyModel(partial(cls.load, path, namespace_key, **kwargs), namespace_key=namespace_key)
+        return cls(
+            model_path=os.path.join(path, ONNX_MODEL),
+            tokenizer=AutoTokenizer.from_pretrained(path),
+            config=AutoConfig.from_pretrained(path),
+            namespace_key=namespace_key,
+            **kwargs,
+        )
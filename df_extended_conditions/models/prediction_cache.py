@@ -0,0 +1,319 @@
+"""
+Prediction Cache
+*****************
+
+This module provides wrappers that cache the predictions of label-scoring models.
+Identical utterances arrive from many sessions, so the results of the remote models
+and of the expensive local models can be reused instead of being computed anew.
+The predictions are keyed on the normalized request text and on the model fingerprint,
+so the entries of a model are not reused after it has been refit or replaced.
+
+Two backends are available: :py:class:`~MemoryPredictionCache` keeps the entries in the process memory,
+while :py:class:`~SQLitePredictionCache` stores them in a file that several worker processes can share.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from .base_model import BaseModel
+from .remote_api.async_mixin import AsyncMixin
+from ..label_scores import LabelIndex, LabelScores
+
+
+def normalize_text(request: str) -> str:
+    """
+    Default request normalization: Unicode NFC normalization, stripping and collapsing whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFC", request).split())
+
+
+class BasePredictionCache:
+    """
+    Base class for prediction cache backends. Keeps the usage counters of the current process.
+
+    Parameters
+    -----------
+    max_entries: Optional[int]
+        Maximum number of cached predictions. No limit, if set to None.
+    ttl: Optional[float]
+        Lifetime of the entries in seconds. The entries do not expire, if set to None.
+    """
+
+    # whether the lookups wait for I/O, so that the async wrappers should run them in an executor
+    blocking = False
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expiry(self) -> float:
+        return time.time() + self.ttl if self.ttl is not None else float("inf")
+
+    def get(self, key: str) -> Optional[Union[dict, LabelScores]]:
+        raise NotImplementedError
+
+    def put(self, key: str, value: Union[dict, LabelScores]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def stats(self) -> dict:
+        """
+        Cache usage counters of the current process: hits, misses, hit rate and the number of entries.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+
+class MemoryPredictionCache(BasePredictionCache):
+    """
+    Thread-safe in-process LRU cache of predictions.
+
+    Parameters
+    -----------
+    max_entries: Optional[int] = 10000
+        Maximum number of cached predictions. No limit, if set to None.
+    ttl: Optional[float] = None
+        Lifetime of the entries in seconds. The entries do not expire, if set to None.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 10000, ttl: Optional[float] = None) -> None:
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Union[dict, LabelScores]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] < time.time():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        value = entry[0]
+        return dict(value) if isinstance(value, dict) else value
+
+    def put(self, key: str, value: Union[dict, LabelScores]) -> None:
+        value = dict(value) if isinstance(value, dict) else value
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, self._expiry())
+            while self.max_entries is not None and len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLitePredictionCache(BasePredictionCache):
+    """
+    Prediction cache stored in an SQLite database, which can be shared by several worker processes.
+    The predictions are stored as JSON, and the :py:class:`~LabelScores` are returned
+    as :py:class:`~LabelScores` over a label table shared by the entries with the same labels.
+    When the number of entries exceeds `max_entries`, the oldest entries are removed;
+    the limit is enforced every `prune_interval` insertions, so it can be exceeded by a few entries.
+
+    Parameters
+    -----------
+    path: Union[str, Path]
+        Path to the database file. The file is created, if it does not exist.
+    max_entries: Optional[int] = 100000
+        Maximum number of cached predictions. No limit, if set to None.
+    ttl: Optional[float] = None
+        Lifetime of the entries in seconds. The entries do not expire, if set to None.
+    prune_interval: int = 64
+        Number of insertions between the removals of the expired and excess entries.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: Optional[int] = 100000,
+        ttl: Optional[float] = None,
+        prune_interval: int = 64,
+    ) -> None:
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.path = Path(path)
+        self.prune_interval = prune_interval
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._puts = 0
+        self._label_indexes: Dict[Tuple[str, ...], LabelIndex] = dict()
+        with self._lock:
+            self._get_connection()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # connections must not be shared with the forked worker processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, expires REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS predictions_created ON predictions (created)")
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._get_connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def _decode(self, value: str) -> Union[dict, LabelScores]:
+        value = json.loads(value)
+        if isinstance(value, dict):
+            return value
+        labels, scores = tuple(value[0]), value[1]  # a compact prediction is stored as [labels, scores]
+        with self._lock:
+            index = self._label_indexes.setdefault(labels, LabelIndex(labels))
+        return LabelScores(index, [float("nan") if score is None else score for score in scores])
+
+    def get(self, key: str) -> Optional[Union[dict, LabelScores]]:
+        with self._lock:
+            row = (
+                self._get_connection()
+                .execute("SELECT value FROM predictions WHERE key = ? AND expires >= ?", (key, time.time()))
+                .fetchone()
+            )
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._decode(row[0])
+
+    def put(self, key: str, value: Union[dict, LabelScores]) -> None:
+        if isinstance(value, LabelScores):
+            scores = [None if score != score else score for score in value.scores.tolist()]  # nan is not valid JSON
+            value = json.dumps([list(value.index.labels), scores])
+        else:
+            value = json.dumps({label: float(score) for label, score in value.items()})
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO predictions (key, value, created, expires) VALUES (?, ?, ?, ?)",
+                    (key, value, time.time(), self._expiry()),
+                )
+            self._puts += 1
+            if self._puts % self.prune_interval == 0:
+                self._prune(connection)
+
+    def _prune(self, connection: sqlite3.Connection) -> None:
+        with connection:
+            connection.execute("DELETE FROM predictions WHERE expires < ?", (time.time(),))
+            if self.max_entries is not None:
+                connection.execute(
+                    "DELETE FROM predictions WHERE key IN "
+                    "(SELECT key FROM predictions ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute("DELETE FROM predictions")
+
+
+class CachedModel(BaseModel):
+    """
+    CachedModel wraps a label-scoring model and caches its predictions.
+    The wrapped model should implement the :py:meth:`~BaseModel.fingerprint` method.
+    The fingerprint is computed once per model version.
+
+    Parameters
+    -----------
+    model: BaseModel
+        The model to wrap.
+    cache: Optional[BasePredictionCache] = None
+        Cache backend. Defaults to a new :py:class:`~MemoryPredictionCache`.
+        Pass the same backend to several wrappers to share it.
+    namespace_key: Optional[str] = None
+        Name of the namespace in framework states. Defaults to the namespace of the wrapped model.
+    normalizer: Optional[Callable[[str], str]] = None
+        Request normalization applied before the lookup. Defaults to :py:func:`~normalize_text`.
+        Note, that the wrapped model receives the original request.
+    """
+
+    def __init__(
+        self,
+        model: BaseModel,
+        cache: Optional[BasePredictionCache] = None,
+        namespace_key: Optional[str] = None,
+        normalizer: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        super().__init__(namespace_key=namespace_key or model.namespace_key)
+        self.model = model
+        self.cache = cache if cache is not None else MemoryPredictionCache()
+        self.normalizer = normalizer or normalize_text
+        self._fingerprint = (None, None)
+
+    def fingerprint(self) -> str:
+        if self._fingerprint[0] != self.model.version:
+            self._fingerprint = (self.model.version, self.model.fingerprint())
+        return self._fingerprint[1]
+
+    def get_key(self, request: str) -> str:
+        content = f"{self.fingerprint()}\0{self.normalizer(request)}"
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def predict(self, request: str) -> Union[dict, LabelScores]:
+        key = self.get_key(request)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.model.predict(request)
+            self.cache.put(key, result)
+        return result
+
+
+class AsyncCachedModel(AsyncMixin, CachedModel):
+    """
+    Asynchronous version of :py:class:`~CachedModel` for the models that implement :py:class:`~AsyncMixin`.
+    The lookups in the blocking backends, like :py:class:`~SQLitePredictionCache`,
+    run in the default executor of the event loop.
+    """
+
+    async def predict(self, request: str) -> Union[dict, LabelScores]:
+        key = self.get_key(request)
+        loop = asyncio.get_event_loop()
+        if self.cache.blocking:
+            result = await loop.run_in_executor(None, self.cache.get, key)
+        else:
+            result = self.cache.get(key)
+        if result is None:
+            result = await self.model.predict(request)
+            if self.cache.blocking:
+                await loop.run_in_executor(None, self.cache.put, key, result)
+            else:
+                self.cache.put(key, result)
+        return result
@@ -1,10 +1,36 @@
+import asyncio
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
 from df_engine.core import Context, Actor
 
 from ..base_model import BaseModel
+from ...label_scores import LabelScores
 from ...utils import LABEL_KEY
 
 
 class AsyncMixin(BaseModel):
+    async def warmup(self, samples: Sequence[str]) -> None:
+        for sample in samples:
+            await self.predict(sample)
+
+    async def predict_batch(self, requests: List[str], max_concurrency: int = 8) -> List[Union[dict, LabelScores]]:
+        """
+        Get the predictions for several requests concurrently.
+        At most `max_concurrency` requests are awaited at once, so that a large batch
+        does not exceed the rate limits of the remote service.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def predict(request: str) -> Union[dict, LabelScores]:
+            async with semaphore:
+                return await self.predict(request)
+
+        return list(await asyncio.gather(*(predict(request) for request in requests)))
+
+    async def predict_batch_array(self, requests: List[str], max_concurrency: int = 8) -> Tuple[List[str], np.ndarray]:
+        return self._stack_predictions(await self.predict_batch(requests, max_concurrency=max_concurrency))
+
     async def __call__(self, ctx: Context, actor: Actor):
         labels = dict()
         if ctx.last_request is not None:
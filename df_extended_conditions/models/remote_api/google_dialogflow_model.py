@@ -7,6 +7,7 @@ The module allows you to use Dialogflow as a service to gain insights about user
 from typing import Optional
 import uuid
 import json
+import hashlib
 from pathlib import Path
 
 from ..base_model import BaseModel
@@ -68,6 +69,10 @@ class AbstractGDFModel(BaseModel):
 
         self._credentials = service_account.Credentials.from_service_account_info(info)
 
+    def fingerprint(self) -> str:
+        content = json.dumps(["dialogflow", self._credentials.project_id, self._language])
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
     @classmethod
     def from_file(cls, filename: str, namespace_key: str, language: str = "en"):
         assert Path(filename).exists(), f"Path {filename} does not exist."
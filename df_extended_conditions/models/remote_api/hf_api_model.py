@@ -8,6 +8,7 @@ to use remotely hosted Hugging Face models.
 import time
 import json
 import asyncio
+import hashlib
 from typing import Optional
 from urllib.parse import urljoin
 
@@ -72,6 +73,9 @@ class AbstractHFAPIModel(BaseModel):
         if not test_response.status_code == STATUS_SUCCESS:
             raise requests.HTTPError(test_response.text)
 
+    def fingerprint(self) -> str:
+        return hashlib.sha1(json.dumps(["hf_api", self.url]).encode("utf-8")).hexdigest()
+
 
 class HFAPIModel(AbstractHFAPIModel):
     def predict(self, request: str) -> dict:
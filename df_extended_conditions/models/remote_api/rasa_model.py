@@ -7,6 +7,7 @@ This module provides an annotator that queries an external RASA Server for inten
 import asyncio
 import time
 import json
+import hashlib
 from urllib.parse import urljoin
 from typing import Optional
 
@@ -77,6 +78,9 @@ class AbstractRasaModel(BaseModel):
             self.headers["Authorization"] = "Bearer " + jwt_token
         self.retries = retries
 
+    def fingerprint(self) -> str:
+        return hashlib.sha1(json.dumps(["rasa", self.parse_url]).encode("utf-8")).hexdigest()
+
 
 class RasaModel(AbstractRasaModel):
     def predict(self, request: str) -> dict:
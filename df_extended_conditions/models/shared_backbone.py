@@ -0,0 +1,179 @@
+"""
+Shared Backbone
+****************
+
+This module provides :py:class:`~SharedBackboneModel` that runs :py:class:`~HFClassifier`
+and :py:class:`~HFMatcher` built on the same checkpoint with a single forward pass.
+Used separately, the two models tokenize each request and run the transformer twice:
+once for the logits of the classifier and once for the hidden states of the matcher.
+The combined model takes both from one pass, which halves the cost of a dialog turn.
+
+Unlike the label-scoring models, the combined model fills two namespaces, so it does not inherit
+from :py:class:`~BaseModel` and cannot be wrapped into :py:class:`~CachedModel` or :py:class:`~CascadeModel`.
+It can be used in the `PRE_TRANSITIONS_PROCESSING` sections and gated with :py:class:`~ScriptGate`.
+"""
+
+from argparse import Namespace
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+try:
+    import torch
+
+    IMPORT_ERROR_MESSAGE = None
+except ImportError as e:
+    torch = Namespace(Tensor=None)
+    IMPORT_ERROR_MESSAGE = e.msg
+
+from df_engine.core import Context, Actor
+
+from .huggingface import BaseHFModel
+from .local.classifiers.huggingface import HFClassifier
+from .local.cosine_matchers.huggingface import HFMatcher
+from ..label_scores import LabelScores
+from ..utils import LABEL_KEY, TOKEN_COUNT_KEY
+
+
+def _get_tokenization_settings(model: BaseHFModel) -> tuple:
+    return (
+        sorted(model.tokenizer_kwargs.items()),
+        model.max_length,
+        model.truncation,
+        model.head_fraction,
+        model.padding_buckets,
+    )
+
+
+class SharedBackboneModel:
+    """
+    SharedBackboneModel scores a request with a classifier and a matcher that share a checkpoint.
+    The request is tokenized once and passed through the model once with the hidden states enabled.
+    The logits go to the classifier, and the embedding of the first token goes to the matcher,
+    so both predictions are equal to the ones of the separate models.
+    Each prediction is saved to the namespace of its model, as if the models were called one by one.
+
+    Both models should be created with the same tokenizer and the same tokenization settings,
+    e.g. `max_length`, `truncation` and `padding_buckets`.
+
+    Parameters
+    -----------
+    classifier: HFClassifier
+        The classifier. Its probabilities are saved to its namespace.
+    matcher: HFMatcher
+        The matcher. Should wrap the same model object as the classifier or an equal one.
+    namespace_key: str = "shared_backbone"
+        Name of the combined model. The predictions are saved to the namespaces of the wrapped models,
+        see :py:attr:`~namespaces`.
+    """
+
+    def __init__(self, classifier: HFClassifier, matcher: HFMatcher, namespace_key: str = "shared_backbone") -> None:
+        IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
+        if IMPORT_ERROR_MESSAGE is not None:
+            raise ImportError(IMPORT_ERROR_MESSAGE)
+        if classifier.namespace_key == matcher.namespace_key:
+            raise ValueError("The classifier and the matcher should use different namespaces.")
+        if _get_tokenization_settings(classifier) != _get_tokenization_settings(matcher) or (
+            classifier.tokenizer is not matcher.tokenizer
+            and classifier.tokenizer.get_vocab() != matcher.tokenizer.get_vocab()
+        ):
+            raise ValueError("The classifier and the matcher should tokenize the requests in the same way.")
+        if classifier.model is not matcher.model and classifier.fingerprint() != matcher.fingerprint():
+            raise ValueError("The classifier and the matcher should be built on the same checkpoint.")
+        self.namespace_key = namespace_key
+        self.classifier = classifier
+        self.matcher = matcher
+
+    @property
+    def namespaces(self) -> Tuple[str, str]:
+        """
+        The namespaces that the model fills: the ones of the classifier and the matcher.
+        """
+        return self.classifier.namespace_key, self.matcher.namespace_key
+
+    @property
+    def models(self) -> Tuple[HFClassifier, HFMatcher]:
+        """
+        The wrapped models.
+        """
+        return self.classifier, self.matcher
+
+    def fingerprint(self) -> str:
+        return self.classifier.fingerprint() + self.matcher.fingerprint()
+
+    def forward(self, requests: List[str], bucketed: bool = False) -> Tuple[torch.Tensor, torch.Tensor, List[int]]:
+        """
+        Run a single forward pass over several requests.
+        Returns the logits, the embeddings of the first tokens and the numbers of tokens in the requests.
+        """
+        tokenized_examples, token_counts = self.classifier.tokenize(requests, bucketed=bucketed)
+        with torch.inference_mode():
+            output = self.classifier.model(
+                **tokenized_examples.to(self.classifier.device),
+                **{**self.classifier.model_kwargs, "output_hidden_states": True},
+            )
+        return output.logits, output.hidden_states[-1][:, 0, :], token_counts
+
+    def predict(self, request: str) -> Dict[str, Union[dict, LabelScores]]:
+        """
+        Get the predictions of both models, keyed by their namespaces.
+        """
+        return self.predict_batch([request])[0]
+
+    def predict_batch(self, requests: List[str]) -> List[Dict[str, Union[dict, LabelScores]]]:
+        """
+        Get the predictions of both models for several requests with a single forward pass.
+        """
+        if not requests:
+            return []
+        logits, embeddings, _ = self.forward(requests, bucketed=len(requests) > 1)
+        embeddings = embeddings.cpu().numpy()
+        return [
+            {
+                self.classifier.namespace_key: self.classifier.score_logits(logits[idx : idx + 1]),
+                self.matcher.namespace_key: self.matcher.score_embedding(embeddings[idx : idx + 1]),
+            }
+            for idx in range(len(requests))
+        ]
+
+    def predict_batch_array(self, requests: List[str]) -> Dict[str, Tuple[List[str], np.ndarray]]:
+        """
+        Get the scores of several requests from a single forward pass as score matrices keyed by namespace,
+        see :py:meth:`~BaseModel.predict_batch_array`. Each value holds the labels of the columns and the matrix
+        of the respective model.
+        """
+        classifier_labels = [
+            self.classifier.model.config.id2label[idx] for idx in range(self.classifier.model.config.num_labels)
+        ]
+        matcher_labels = list(self.matcher._get_references())
+        classifier_scores = np.empty((0, len(classifier_labels)), dtype=np.float32)
+        matcher_scores = np.full((len(requests), len(matcher_labels)), np.nan, dtype=np.float32)
+        if requests:
+            logits, embeddings, _ = self.forward(requests, bucketed=len(requests) > 1)
+            classifier_scores = self.classifier.sofmax.forward(logits).cpu().numpy()
+            if matcher_labels:
+                matcher_scores = self.matcher.index.search_batch(normalize(embeddings.cpu().numpy()))
+        return {
+            self.classifier.namespace_key: (classifier_labels, self.classifier._mask_scores(classifier_scores)),
+            self.matcher.namespace_key: (matcher_labels, self.matcher._mask_scores(matcher_scores)),
+        }
+
+    def warmup(self, samples: Sequence[str]) -> None:
+        """
+        Run the models on representative requests before serving, see :py:meth:`~BaseModel.warmup`.
+        """
+        for sample in samples:
+            self.predict(sample)
+
+    def __call__(self, ctx: Context, actor: Actor):
+        namespaces = self.namespaces
+        if ctx.last_request:
+            labels = self.predict(ctx.last_request)
+            token_count = self.classifier.count_tokens(ctx.last_request)
+            for namespace in namespaces:
+                ctx.framework_states.setdefault(TOKEN_COUNT_KEY, dict())[namespace] = token_count
+        else:
+            labels = {namespace: dict() for namespace in namespaces}
+        ctx.framework_states.setdefault(LABEL_KEY, dict()).update(labels)
+        return ctx
@@ -5,7 +5,8 @@ Base Sklearn Model
 This module provides a base class for classifiers and matchers,
 built on top of Sklearn models.
 """
-from typing import Optional, Union
+from functools import partial
+from typing import List, Optional, Union
 import joblib
 
 from ..dataset import Dataset
@@ -22,6 +23,8 @@ except ImportError as e:
     IMPORT_ERROR_MESSAGE = e.msg
 
 from .base_model import BaseModel
+from .embedding_cache import cached_embedding
+from .lazy import LazyModel
 
 
 class BaseSklearnModel(BaseModel):
@@ -39,6 +42,12 @@ class BaseSklearnModel(BaseModel):
         unified with a pipeline.
     namespace_key: Optional[str]
         Name of the namespace in framework states that the model will be using.
+    top_k: Optional[int] = None
+        If set, only the labels with the `top_k` highest scores are kept in the prediction.
+    min_score: Optional[float] = None
+        If set, the labels scored below this value are dropped from the prediction.
+    compact_scores: bool = False
+        If set, the scores are returned as :py:class:`~LabelScores` instead of a dict.
     """
 
     def __init__(
@@ -46,32 +55,58 @@ class BaseSklearnModel(BaseModel):
         model: Optional[BaseEstimator] = None,
         tokenizer: Optional[Union[BaseEstimator, Pipeline]] = None,
         namespace_key: Optional[str] = None,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        compact_scores: bool = False,
     ) -> None:
         IMPORT_ERROR_MESSAGE = globals().get("IMPORT_ERROR_MESSAGE")
         if IMPORT_ERROR_MESSAGE is not None:
             raise ImportError(IMPORT_ERROR_MESSAGE)
         assert tokenizer is not None, "tokenizer parameter is required."
-        super().__init__(namespace_key=namespace_key)
+        super().__init__(namespace_key=namespace_key, top_k=top_k, min_score=min_score, compact_scores=compact_scores)
         self.model = model
         self.tokenizer = tokenizer
         self._pipeline = make_pipeline(*[tokenizer] + ([model] if model else []))
 
+    @cached_embedding
     def transform(self, request: str):
         intermediate_result = self._pipeline.transform([request])
         if isinstance(intermediate_result, csr_matrix):
             return intermediate_result.toarray()
         return intermediate_result
 
+    def transform_batch(self, requests: List[str]):
+        intermediate_result = self._pipeline.transform(requests)
+        if isinstance(intermediate_result, csr_matrix):
+            return intermediate_result.toarray()
+        return intermediate_result
+
     def fit(self, dataset: Dataset):
         sentences, pred_labels = map(list, zip(*dataset.flat_items))
         self._pipeline.fit(sentences, pred_labels)
+        self.version += 1
+
+    def fingerprint(self) -> str:
+        return joblib.hash(self._pipeline)
 
     def save(self, path: str, **kwargs) -> None:
         joblib.dump(self.model, f"{path}.model")
         joblib.dump(self.tokenizer, f"{path}.tokenizer")
 
     @classmethod
-    def load(cls, path: str, namespace_key: str) -> __qualname__:
+    def load(cls, path: str, namespace_key: str, lazy: bool = False) -> Union[__qualname__, LazyModel]:
+        """
+        Parameters
+        -----------
+        path: str
+            Path prefix of the saved files.
+        namespace_key: str
+            Name of the namespace in framework states that the model will be using.
+        lazy: bool = False
+            If set, a :py:class:`~LazyModel` is returned, and the model is loaded on first use.
+        """
+        if lazy:
+            return LazyModel(partial(cls.load, path, namespace_key), namespace_key=namespace_key)
         model = joblib.load(f"{path}.model")
         tokenizer = joblib.load(f"{path}.tokenizer")
         return cls(model=model, tokenizer=tokenizer, namespace_key=namespace_key)
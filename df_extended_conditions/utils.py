@@ -13,6 +13,8 @@ STATUS_UNAVAILABLE = 503
 STATUS_SUCCESS = 200
 
 LABEL_KEY = "labels"
+CASCADE_KEY = "cascade_stages"
+TOKEN_COUNT_KEY = "token_counts"
 
 
 class DefaultTokenizer:
@@ -67,17 +67,20 @@ setup(
     tests_require=test_requirements,
     extras_require={
         "async": ["httpx>=0.23.0"],
-        "hf": ["transformers>=4.16.2", "torch>=1.7.0", "scikit-learn<=1.1.1"],
+        "hf": ["transformers>=4.16.2", "torch>=1.9.0", "scikit-learn<=1.1.1"],
         "gensim": ["gensim>=4.0.0", "scikit-learn<=1.1.1"],
         "sklearn": ["scikit-learn<=1.1.1"],
         "dialogflow": ["google-cloud-dialogflow==2.15.0"],
+        "onnx": ["onnxruntime>=1.10.0", "onnx>=1.10.0", "transformers>=4.16.2", "torch>=1.9.0"],
         "all": [
             "transformers>=4.16.2",
-            "torch>=1.7.0",
+            "torch>=1.9.0",
             "scikit-learn<=1.1.1",
             "gensim>=4.0.0",
             "scikit-learn<=1.1.1", 
-            "google-cloud-dialogflow==2.15.0"
+            "google-cloud-dialogflow==2.15.0",
+            "onnxruntime>=1.10.0",
+            "onnx>=1.10.0",
         ]
     }
 )
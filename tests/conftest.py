@@ -1,10 +1,11 @@
 import os
 import sys
+import asyncio
 
 import pytest
 from sklearn.feature_extraction.text import TfidfVectorizer
 from df_extended_conditions.models.local.cosine_matchers.sklearn import SklearnMatcher
-from df_extended_conditions.dataset import Dataset
+from df_extended_conditions.dataset import Dataset, DatasetItem
 
 sys.path.insert(0, os.path.pardir)
 
@@ -16,6 +17,14 @@ def testing_actor():
     yield actor
 
 
+@pytest.fixture
+def run_async():
+    # asyncio.run is not available in Python 3.6
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
 @pytest.fixture(scope="session")
 def testing_dataset():
     yield Dataset.parse_yaml("./examples/data/example.yaml")
@@ -58,3 +67,36 @@ def rasa_api_key():
 def save_file(tmpdir_factory):
     file_name = tmpdir_factory.mktemp("testdir").join("testfile")
     return str(file_name)
+
+
+@pytest.fixture(scope="session")
+def tiny_hf_model(tmpdir_factory):
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    words = ["hello", "hi", "there", "bye", "see", "you", "have", "a", "meal", "snack", "something", "to", "eat"]
+    vocab_file = tmpdir_factory.mktemp("tiny_bert").join("vocab.txt")
+    vocab_file.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    tokenizer = transformers.BertTokenizerFast(str(vocab_file))
+    config = transformers.BertConfig(
+        vocab_size=len(words) + 5,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        id2label={0: "hello", 1: "goodbye", 2: "food"},
+        label2id={"hello": 0, "goodbye": 1, "food": 2},
+    )
+    torch.manual_seed(0)
+    model = transformers.BertForSequenceClassification(config).eval()
+    yield model, tokenizer
+
+
+@pytest.fixture(scope="session")
+def tiny_dataset():
+    yield Dataset(
+        items=[
+            DatasetItem(label="hello", samples=["hi there", "hello"]),
+            DatasetItem(label="goodbye", samples=["bye", "see you"]),
+            DatasetItem(label="food", samples=["something to eat", "have a meal"]),
+        ]
+    )
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from df_engine.core import Context
+
+from df_extended_conditions.utils import LABEL_KEY
+from df_extended_conditions.models.base_model import BaseModel
+from df_extended_conditions.models.batching import MicroBatchingModel
+
+
+class EchoModel(BaseModel):
+    def __init__(self) -> None:
+        super().__init__(namespace_key="echo")
+        self.batches = []
+
+    def predict(self, request: str) -> dict:
+        return {request: 1.0}
+
+    def predict_batch(self, requests: list) -> list:
+        self.batches.append(list(requests))
+        if "fail" in requests:
+            raise RuntimeError("fail")
+        return [self.predict(request) for request in requests]
+
+
+def test_batches(run_async):
+    model = EchoModel()
+    batcher = MicroBatchingModel(model, max_batch_size=4, max_delay=0.01)
+    requests = [f"request {idx}" for idx in range(10)]
+
+    async def run():
+        return await asyncio.gather(*(batcher.predict(request) for request in requests))
+
+    results = run_async(run())
+    assert results == [{request: 1.0} for request in requests]
+    assert [len(batch) for batch in model.batches] == [4, 4, 2]
+
+
+def test_errors(run_async):
+    model = EchoModel()
+    batcher = MicroBatchingModel(model, max_batch_size=2, max_delay=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.predict(request) for request in ["ok", "fail", "ok"]), return_exceptions=True
+        )
+
+    first, second, third = run_async(run())
+    assert isinstance(first, RuntimeError) and isinstance(second, RuntimeError)
+    assert third == {"ok": 1.0}
+
+
+def test_call(run_async):
+    class SingleModel(BaseModel):
+        def predict(self, request: str) -> dict:
+            return {request: 1.0}
+
+    batcher = MicroBatchingModel(SingleModel(namespace_key="single"))
+    assert asyncio.iscoroutinefunction(batcher.__call__)
+    ctx = Context()
+    ctx.add_request("hello")
+    ctx = run_async(batcher(ctx, None))
+    assert ctx.framework_states[LABEL_KEY]["single"] == {"hello": 1.0}
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        MicroBatchingModel(EchoModel(), max_batch_size=0)
+
+
+def test_async_predict_batch(run_async):
+    batcher = MicroBatchingModel(EchoModel(), max_batch_size=4, max_delay=0.01)
+    requests = [f"request {idx}" for idx in range(6)]
+    results = run_async(batcher.predict_batch(requests, max_concurrency=3))
+    assert results == [{request: 1.0} for request in requests]
+    assert [len(batch) for batch in batcher.model.batches] == [3, 3]
+    labels, scores = run_async(batcher.predict_batch_array(requests))
+    assert labels == requests and scores.shape == (6, 6)
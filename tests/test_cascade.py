@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from df_engine.core import Context
+
+from df_extended_conditions.utils import LABEL_KEY, CASCADE_KEY
+from df_extended_conditions.conditions import has_cls_label
+from df_extended_conditions.models.base_model import BaseModel
+from df_extended_conditions.models.cascade import CascadeModel, AsyncCascadeModel
+from df_extended_conditions.models.remote_api.async_mixin import AsyncMixin
+from df_extended_conditions.models.local.classifiers.regex import RegexClassifier
+
+
+class StaticModel(BaseModel):
+    def __init__(self, result: dict) -> None:
+        super().__init__()
+        self.result = result
+        self.calls = 0
+
+    def predict(self, request: str) -> dict:
+        self.calls += 1
+        return self.result
+
+
+class AsyncStaticModel(AsyncMixin, StaticModel):
+    async def predict(self, request: str) -> dict:
+        return StaticModel.predict(self, request)
+
+
+@pytest.mark.parametrize(
+    ["threshold", "margin", "expected_stage"],
+    [
+        (0.9, None, 2),
+        (0.7, None, 1),
+        (None, 0.5, 1),
+        (None, 0.05, 0),
+        (0.99, 0.99, 2),
+    ],
+)
+def test_stages(threshold, margin, expected_stage):
+    stages = [StaticModel({"a": 0.5, "b": 0.4}), StaticModel({"a": 0.8}), StaticModel({"b": 0.6})]
+    cascade = CascadeModel(stages, threshold=threshold, margin=margin)
+    labels, stage = cascade.predict_with_stage("request")
+    assert stage == expected_stage
+    assert labels == stages[stage].result
+    assert [model.calls for model in stages] == [1] * (stage + 1) + [0] * (len(stages) - stage - 1)
+
+
+def test_cascade_annotation(testing_dataset, testing_actor):
+    expensive_model = StaticModel({"food": 0.95})
+    cascade = CascadeModel([RegexClassifier(testing_dataset, namespace_key="regex"), expensive_model])
+    ctx = Context()
+    ctx.add_request("get something to eat")
+    ctx = cascade(ctx, testing_actor)
+    assert ctx.framework_states[CASCADE_KEY]["cascade"] == 0 and expensive_model.calls == 0
+    assert has_cls_label("food", namespace="cascade")(ctx, testing_actor)
+    ctx.add_request("unknown")
+    ctx = cascade(ctx, testing_actor)
+    assert ctx.framework_states[CASCADE_KEY]["cascade"] == 1 and expensive_model.calls == 1
+    assert ctx.framework_states[LABEL_KEY]["cascade"] == {"food": 0.95}
+
+
+def test_async_cascade(testing_actor):
+    stages = [StaticModel({}), AsyncStaticModel({"a": 1.0})]
+    cascade = AsyncCascadeModel(stages, namespace_key="async")
+    ctx = Context()
+    ctx.add_request("request")
+    ctx = asyncio.run(cascade(ctx, testing_actor))
+    assert ctx.framework_states[LABEL_KEY]["async"] == {"a": 1.0}
+    assert ctx.framework_states[CASCADE_KEY]["async"] == 1
+
+
+def test_invalid_cascade():
+    with pytest.raises(ValueError):
+        CascadeModel([])
+    with pytest.raises(ValueError):
+        CascadeModel([StaticModel({})], threshold=None)
@@ -53,3 +53,53 @@ def test_has_match(_input: dict, testing_actor, thresh, standard_model, last_req
     standard_model.fit(collection)
     result = has_match(standard_model, threshold=thresh, **_input)(ctx, testing_actor)
     assert result
+
+
+def test_has_match_embeds_examples_once(testing_actor, standard_model, testing_dataset):
+    standard_model.fit(testing_dataset)
+    calls = []
+    transform = standard_model.transform
+    standard_model.transform = lambda request: calls.append(request) or transform(request)
+    try:
+        condition = has_match(standard_model, ["hello", "hi"], ["bye"], threshold=0.5)
+        ctx = Context()
+        ctx.add_request("hello there")
+        assert condition(ctx, testing_actor)
+        assert condition(ctx, testing_actor)
+        assert len(calls) == 5  # three examples once, the request twice
+        standard_model.fit(testing_dataset)
+        assert condition(ctx, testing_actor)
+        assert len(calls) == 9  # the examples are embedded anew after refitting
+    finally:
+        del standard_model.transform
+
+
+@pytest.mark.parametrize(["positive_examples"], [([],), (None,)])
+def test_has_match_without_examples(positive_examples, standard_model):
+    with pytest.raises(ValueError):
+        has_match(standard_model, positive_examples, ["bye"])
+
+
+@pytest.mark.parametrize(
+    ["labels", "mode", "namespace", "expected"],
+    [
+        (["a", "d"], "any", None, True),
+        (["a", "d"], "all", None, False),
+        (["a", "c"], "all", None, True),
+        (["a", "c"], "all", "model_a", False),
+        ([["a", DatasetItem(label="b", samples=["b"])], ("c",)], 3, None, True),
+        (["a", "b", "d", "e"], 3, None, False),
+        (["d", "e"], 0, None, True),
+    ],
+)
+def test_label_collections(labels, mode, namespace, expected, testing_actor):
+    ctx = Context(framework_states={LABEL_KEY: {"model_a": {"a": 1, "b": 0.5}, "model_b": {"b": 1, "c": 1}}})
+    assert has_cls_label(labels, namespace=namespace, mode=mode)(ctx, testing_actor) == expected
+
+
+@pytest.mark.parametrize(["label"], [("a",), (DatasetItem(label="a", samples=["a"]),), (["a"],)])
+def test_label_mode(label, testing_actor):
+    ctx = Context(framework_states={LABEL_KEY: {"model_a": {"a": 1}}})
+    assert has_cls_label(label, mode="all")(ctx, testing_actor)
+    with pytest.raises(ValueError):
+        has_cls_label(label, mode="most")
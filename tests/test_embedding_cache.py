@@ -0,0 +1,49 @@
+import pytest
+
+try:
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:
+    pytest.skip(allow_module_level=True)
+
+from df_extended_conditions.models.embedding_cache import EmbeddingCache
+from df_extended_conditions.models.local.cosine_matchers.sklearn import SklearnMatcher
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_entries=2, max_bytes=None)
+    cache.put("a", np.zeros(4))
+    cache.put("b", np.zeros(4))
+    assert cache.get("a") is not None  # "b" becomes the least recently used entry
+    cache.put("c", np.zeros(4))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats == {"hits": 3, "misses": 1, "evictions": 1, "entries": 2, "bytes": 64}
+
+
+def test_byte_limit():
+    cache = EmbeddingCache(max_entries=None, max_bytes=100)
+    for key in range(5):
+        cache.put(key, np.zeros(4))  # 32 bytes each
+    assert len(cache) == 3
+    assert cache.stats["bytes"] == 96
+
+
+def test_cached_values_are_read_only():
+    cache = EmbeddingCache()
+    cache.put("a", np.zeros(4))
+    with pytest.raises(ValueError):
+        cache.get("a")[0] = 1
+
+
+def test_model_cache(testing_dataset):
+    model = SklearnMatcher(tokenizer=TfidfVectorizer(), dataset=testing_dataset)
+    model.embedding_cache = EmbeddingCache()
+    model.fit(testing_dataset)
+    first = model.transform("hello there")
+    assert model.transform("hello there") is first
+    assert model.embedding_cache.stats["hits"] == 1
+    model.fit(testing_dataset)
+    assert model.transform("hello there") is not first  # refitting invalidates the entries
+    model.embedding_cache = None
+    assert model.transform("hello there") is not model.transform("hello there")
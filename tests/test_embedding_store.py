@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+try:
+    import numpy as np
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:
+    pytest.skip(allow_module_level=True)
+
+from df_extended_conditions.models.local.cosine_matchers.embedding_store import EmbeddingStore
+from df_extended_conditions.models.local.cosine_matchers.sklearn import SklearnMatcher
+
+
+def test_store(tmp_path):
+    store = EmbeddingStore(tmp_path / "store")
+    key = store.get_key("fingerprint", ["a", "b"])
+    assert key != store.get_key("fingerprint", ["a", "c"])
+    assert key != store.get_key("other fingerprint", ["a", "b"])
+    assert store.load(key) is None
+    array = np.arange(6, dtype=np.float32).reshape(2, 3)
+    saved = store.save(key, array, fingerprint="fingerprint")
+    assert isinstance(saved, np.memmap)
+    loaded = EmbeddingStore(tmp_path / "store").load(key)
+    assert isinstance(loaded, np.memmap) and not loaded.flags.writeable
+    assert np.array_equal(loaded, array)
+    assert store.manifest[key]["shape"] == [2, 3]
+
+
+def _save_entry(path, idx):
+    store = EmbeddingStore(path)
+    store.save(store.get_key("fingerprint", [str(idx)]), np.full((2, 3), idx, dtype=np.float32))
+
+
+def test_concurrent_saves(tmp_path):
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_save_entry, [tmp_path] * 16, range(16)))
+    store = EmbeddingStore(tmp_path)
+    assert len(store.manifest) == 16
+    for idx in range(16):
+        assert np.all(store.load(store.get_key("fingerprint", [str(idx)])) == idx)
+
+
+def test_matcher_store(tmp_path, testing_dataset):
+    store = EmbeddingStore(tmp_path)
+    model, tokenizer = TruncatedSVD(n_components=3), TfidfVectorizer()
+    matcher = SklearnMatcher(model=model, tokenizer=tokenizer, dataset=testing_dataset, embedding_store=store)
+    matcher.fit(testing_dataset)
+    expected = matcher.predict("I want to eat")
+    assert len(store.manifest) == 1
+
+    def fail(samples):
+        raise AssertionError("The references should be loaded from the store.")
+
+    new_matcher = SklearnMatcher(model=model, tokenizer=tokenizer, dataset=testing_dataset, embedding_store=store)
+    new_matcher._embed_references = fail
+    result = new_matcher.predict("I want to eat")
+    assert isinstance(new_matcher.index.matrix, np.memmap)
+    for label, score in expected.items():
+        assert np.isclose(result[label], score)
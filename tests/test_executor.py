@@ -0,0 +1,81 @@
+import time
+import asyncio
+import multiprocessing
+
+import pytest
+from df_engine.core import Context
+
+from df_extended_conditions.utils import LABEL_KEY
+from df_extended_conditions.dataset import Dataset, DatasetItem
+from df_extended_conditions.models.base_model import BaseModel
+from df_extended_conditions.models.executor import ExecutorModel
+from df_extended_conditions.models.local.classifiers.regex import RegexClassifier
+
+
+class SleepingModel(BaseModel):
+    def __init__(self, delay: float) -> None:
+        super().__init__(namespace_key="sleeping")
+        self.delay = delay
+
+    def predict(self, request: str) -> dict:
+        time.sleep(self.delay)
+        return {request: 1.0}
+
+
+def test_event_loop_is_not_blocked(run_async):
+    model = ExecutorModel(SleepingModel(0.2))
+    ticks = []
+
+    async def tick():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.02)
+
+    async def run():
+        return await asyncio.gather(model.predict("hello"), tick())
+
+    result, _ = run_async(run())
+    assert result == {"hello": 1.0}
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.15
+    model.shutdown()
+
+
+def test_timeout_and_queue(run_async):
+    model = ExecutorModel(SleepingModel(0.2), max_concurrency=1, max_queue_size=1, timeout=0.1)
+
+    async def run():
+        return await asyncio.gather(*(model.predict(f"request {idx}") for idx in range(3)))
+
+    # the first request times out, the second one waits and times out, the third one is rejected
+    assert run_async(run()) == [dict(), dict(), dict()]
+    model.shutdown()
+
+    model = ExecutorModel(SleepingModel(0.05), max_workers=2, timeout=1.0)
+
+    async def run():
+        return await asyncio.gather(*(model.predict(f"request {idx}") for idx in range(4)))
+
+    assert run_async(run()) == [{f"request {idx}": 1.0} for idx in range(4)]
+    assert model.running == 0 and model.waiting == 0
+    model.shutdown()
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "fork"])
+def test_process_executor(run_async, start_method):
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"{start_method} is not available on this platform")
+    dataset = Dataset(items=[DatasetItem(label="greeting", samples=["hello", "hi"])])
+    model = ExecutorModel(
+        RegexClassifier(dataset, namespace_key="regex"), executor="process", start_method=start_method
+    )
+    assert asyncio.iscoroutinefunction(model.__call__)
+    ctx = Context()
+    ctx.add_request("hello there")
+    ctx = run_async(model(ctx, None))
+    assert ctx.framework_states[LABEL_KEY]["regex"] == {"greeting": 1.0}
+    model.shutdown()
+
+
+def test_invalid_executor():
+    with pytest.raises(ValueError):
+        ExecutorModel(SleepingModel(0.0), executor="fiber")
@@ -0,0 +1,118 @@
+import asyncio
+import functools
+
+import pytest
+from df_engine.core import Actor, Context
+from df_engine.core.keywords import GLOBAL, LOCAL, RESPONSE, TRANSITIONS, PRE_TRANSITIONS_PROCESSING
+from df_engine import conditions as cnd
+
+from df_extended_conditions.utils import LABEL_KEY
+from df_extended_conditions.dataset import Dataset, DatasetItem
+from df_extended_conditions.gating import ScriptGate, get_condition_requirements
+from df_extended_conditions.conditions import has_cls_label
+from df_extended_conditions.models.base_model import BaseModel
+from df_extended_conditions.models.executor import ExecutorModel
+from df_extended_conditions.models.lazy import LazyModel
+from df_extended_conditions.models.remote_api.async_mixin import AsyncMixin
+from df_extended_conditions.models.local.classifiers.regex import RegexClassifier
+
+
+class CountingModel(BaseModel):
+    def __init__(self, namespace_key: str) -> None:
+        super().__init__(namespace_key=namespace_key)
+        self.requests = []
+
+    def predict(self, request: str) -> dict:
+        self.requests.append(request)
+        return {"yes": 1.0}
+
+
+class AsyncCountingModel(AsyncMixin, CountingModel):
+    async def predict(self, request: str) -> dict:
+        return CountingModel.predict(self, request)
+
+
+def make_script(model: BaseModel) -> dict:
+    return {
+        GLOBAL: {PRE_TRANSITIONS_PROCESSING: {"annotate": model}},
+        "root": {
+            "start": {RESPONSE: "start", TRANSITIONS: {("flow", "ask"): cnd.true()}},
+            "fallback": {RESPONSE: "fallback"},
+        },
+        "flow": {
+            LOCAL: {TRANSITIONS: {("root", "start", 0.5): cnd.true()}},
+            "ask": {
+                RESPONSE: "ask",
+                TRANSITIONS: {
+                    ("flow", "done"): cnd.all([cnd.true(), has_cls_label("yes", namespace="model")]),
+                },
+            },
+            "done": {RESPONSE: "done"},
+        },
+    }
+
+
+def test_condition_requirements():
+    condition = cnd.negation(cnd.any([has_cls_label(["a", "b"]), has_cls_label("c", namespace="model")]))
+    assert get_condition_requirements(condition) == {None: {"a", "b"}, "model": {"c"}}
+    assert get_condition_requirements(cnd.true()) == {}
+
+
+def test_gated_dialog(testing_actor):
+    model = CountingModel(namespace_key="model")
+    gate = ScriptGate(make_script(model), start_label=("root", "start"))
+    actor = Actor(gate.wrap_script(), start_label=("root", "start"), fallback_label=("root", "fallback"))
+    ctx = Context()
+    responses = []
+    for request in ["hi", "yes", "hi", "hi", "yes"]:
+        ctx.add_request(request)
+        ctx = actor(ctx)
+        responses.append(ctx.last_response)
+    assert responses == ["ask", "done", "start", "ask", "done"]
+    assert model.requests == ["yes", "yes"]  # the model only runs at the `ask` node
+    ctx.add_request("hi")
+    ctx = actor(ctx)
+    assert ctx.framework_states[LABEL_KEY]["model"] == {}
+
+
+def test_label_requirements(testing_dataset: Dataset):
+    gate = ScriptGate({GLOBAL: {TRANSITIONS: {("root", "start"): has_cls_label("food")}}}, ("root", "start"))
+    ctx = Context()
+    assert gate.is_needed(RegexClassifier(testing_dataset, namespace_key="regex"), ctx)
+    other_dataset = Dataset(items=[DatasetItem(label="weather", samples=["rain"])])
+    assert not gate.is_needed(RegexClassifier(other_dataset, namespace_key="regex"), ctx)
+    assert gate.is_needed(CountingModel(namespace_key="unknown"), ctx)
+
+
+def load_regex_classifier(dataset: Dataset, namespace_key: str) -> RegexClassifier:
+    return RegexClassifier(dataset, namespace_key=namespace_key)
+
+
+def test_lazy_models(testing_dataset: Dataset):
+    gate = ScriptGate({GLOBAL: {TRANSITIONS: {("root", "start"): has_cls_label("food")}}}, ("root", "start"))
+    ctx = Context()
+    other_dataset = Dataset(items=[DatasetItem(label="weather", samples=["rain"])])
+    lazy_model = LazyModel(
+        functools.partial(load_regex_classifier, dataset=other_dataset, namespace_key="regex"), namespace_key="regex"
+    )
+    assert not gate.is_needed(lazy_model, ctx)
+    assert not gate.is_needed(ExecutorModel(lazy_model), ctx)
+    opaque_model = LazyModel(lambda: RegexClassifier(testing_dataset, namespace_key="regex"), namespace_key="regex")
+    assert gate.is_needed(opaque_model, ctx)
+    assert not lazy_model.loaded and not opaque_model.loaded
+    lazy_model.warmup([])
+    assert not gate.is_needed(lazy_model, ctx)
+
+
+def test_async_gate(testing_actor):
+    model = AsyncCountingModel(namespace_key="model")
+    gate = ScriptGate(make_script(model), start_label=("root", "start"))
+    gated_model = gate.wrap(model)
+    assert asyncio.iscoroutinefunction(gated_model)
+    ctx = Context()
+    ctx.add_request("hi")
+    asyncio.run(gated_model(ctx, testing_actor))
+    assert model.requests == [] and ctx.framework_states[LABEL_KEY]["model"] == {}
+    ctx.add_label(("flow", "ask"))
+    asyncio.run(gated_model(ctx, testing_actor))
+    assert model.requests == ["hi"] and ctx.framework_states[LABEL_KEY]["model"] == {"yes": 1.0}
@@ -34,3 +34,12 @@ def test_saving(save_file: str, testing_model: GensimMatcher):
     testing_model.save(save_file)
     new_testing_model = GensimMatcher.load(save_file, "gensim")
     assert new_testing_model
+
+
+def test_token_table(testing_model: GensimMatcher):
+    request = "I would like to get something to eat"
+    expected = testing_model.model.wv.get_mean_vector(testing_model.tokenizer(request)).reshape(1, -1)
+    assert np.allclose(testing_model.transform(request), expected, atol=1e-6)
+    token_ids, table = testing_model._get_token_table()
+    assert table.dtype == np.float32
+    assert len(token_ids) == table.shape[0]
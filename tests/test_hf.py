@@ -1,8 +1,10 @@
+import pickle
+from argparse import Namespace
+
 import pytest
 
 try:
-    from tokenizers import AutoTokenizer
-    from transformers import AutoModelForSequenceClassification
+    import transformers  # noqa: F401
     import torch
     import numpy as np
 except ImportError:
@@ -10,16 +12,18 @@ except ImportError:
 
 from df_extended_conditions.models.local.classifiers.huggingface import HFClassifier
 from df_extended_conditions.models.local.cosine_matchers.huggingface import HFMatcher
+from df_extended_conditions.models import huggingface
+from df_extended_conditions.models.huggingface import is_quantized, quantize_model
 
 
 @pytest.fixture(scope="session")
-def testing_model(hf_model_name):
-    yield AutoModelForSequenceClassification.from_pretrained(hf_model_name)
+def testing_model(tiny_hf_model):
+    yield tiny_hf_model[0]
 
 
 @pytest.fixture(scope="session")
-def testing_tokenizer(hf_model_name):
-    yield AutoTokenizer.from_pretrained(hf_model_name)
+def testing_tokenizer(tiny_hf_model):
+    yield tiny_hf_model[1]
 
 
 @pytest.fixture(scope="session")
@@ -30,19 +34,23 @@ def testing_classifier(testing_model, testing_tokenizer):
 
 
 @pytest.fixture(scope="session")
-def testing_model(testing_model, testing_tokenizer):
+def testing_matcher(testing_model, testing_tokenizer, tiny_dataset):
     yield HFMatcher(
-        model=testing_model, tokenizer=testing_tokenizer, device=torch.device("cpu"), namespace_key="HFmodel"
+        model=testing_model,
+        tokenizer=testing_tokenizer,
+        device=torch.device("cpu"),
+        namespace_key="HFmodel",
+        dataset=tiny_dataset,
     )
 
 
-def test_saving(save_file: str, testing_classifier: HFClassifier, testing_model: HFMatcher):
+def test_saving(save_file: str, testing_classifier: HFClassifier, testing_matcher: HFMatcher):
     testing_classifier.save(path=save_file)
     testing_classifier = HFClassifier.load(save_file, namespace_key="HFclassifier")
     assert testing_classifier
-    testing_model.save(path=save_file)
-    testing_model = HFMatcher.load(save_file, namespace_key="HFmodel")
-    assert testing_model
+    testing_matcher.save(path=save_file)
+    testing_matcher = HFMatcher.load(save_file, namespace_key="HFmodel")
+    assert testing_matcher
 
 
 def test_predict(testing_classifier: HFClassifier):
@@ -51,8 +59,142 @@ def test_predict(testing_classifier: HFClassifier):
     assert isinstance(result, dict)
 
 
-def test_transform(testing_model: HFMatcher, testing_classifier: HFClassifier):
-    result_1 = testing_model.transform()
+def test_transform(testing_matcher: HFMatcher, testing_classifier: HFClassifier):
+    result_1 = testing_matcher.transform("hello there")
     assert isinstance(result_1, np.ndarray)
-    result_2 = testing_classifier.transform()
+    result_2 = testing_classifier.transform("hello there")
     assert isinstance(result_2, np.ndarray)
+
+
+def test_transform_batch(testing_classifier: HFClassifier):
+    requests = ["We are looking for x.", "Hi", "I would like to sell my old car, it is in good condition."]
+    result = testing_classifier.transform_batch(requests, batch_size=2)
+    assert isinstance(result, np.ndarray)
+    assert result.shape[0] == len(requests)
+    expected = np.vstack([testing_classifier.transform(request) for request in requests])
+    assert np.allclose(result, expected, atol=1e-5)
+
+
+def test_quantization(save_file: str, testing_classifier: HFClassifier):
+    quantized = HFClassifier(
+        model=testing_classifier.model,
+        tokenizer=testing_classifier.tokenizer,
+        device=torch.device("cpu"),
+        namespace_key="HFclassifier",
+        quantize="dynamic-int8",
+    )
+    request = "We are looking for x."
+    expected = testing_classifier.predict(request)
+    result = quantized.predict(request)
+    assert result.keys() == expected.keys()
+    assert max(result, key=result.get) == max(expected, key=expected.get)
+    quantized.save(path=save_file)
+    loaded = HFClassifier.load(save_file, namespace_key="HFclassifier")
+    assert loaded.quantize == "dynamic-int8"
+    assert loaded.predict(request) == pytest.approx(result)
+    assert loaded.fingerprint() == quantized.fingerprint()
+
+
+def test_legacy_quantization_api(testing_classifier: HFClassifier, monkeypatch):
+    # torch<1.10 has neither torch.ao.quantization nor torch.ao.nn.quantized
+    legacy_torch = Namespace(quantization=torch.quantization, nn=torch.nn, qint8=torch.qint8)
+    monkeypatch.setattr(huggingface, "torch", legacy_torch)
+    quantized = quantize_model(testing_classifier.model, "dynamic-int8")
+    assert is_quantized(quantized)
+    assert not is_quantized(testing_classifier.model)
+
+
+def test_quantization_keeps_model(testing_classifier: HFClassifier):
+    model = testing_classifier.model
+    model.train()
+    try:
+        quantized = quantize_model(model, "dynamic-int8")
+        assert model.training and not quantized.training
+        assert not is_quantized(model)
+    finally:
+        model.eval()
+
+
+def test_predict_batch(testing_classifier: HFClassifier):
+    requests = ["We are looking for x.", "Hi", "I would like to sell my old car, it is in good condition."]
+    results = testing_classifier.predict_batch(requests)
+    assert len(results) == len(requests)
+    for request, result in zip(requests, results):
+        assert result == pytest.approx(testing_classifier.predict(request), abs=1e-5)
+    labels, probabilities = testing_classifier.predict_batch_array(requests)
+    assert probabilities.shape == (len(requests), len(labels))
+    assert np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-5)
+
+
+@pytest.mark.parametrize("truncation", ["head", "tail", "head+tail"])
+def test_truncation(testing_classifier: HFClassifier, truncation: str):
+    classifier = HFClassifier(
+        model=testing_classifier.model,
+        tokenizer=testing_classifier.tokenizer,
+        device=torch.device("cpu"),
+        namespace_key="HFclassifier",
+        max_length=16,
+        truncation=truncation,
+        padding_buckets=(8, 16, 32),
+    )
+    long_request = "I would like to sell my old car, it is in good condition. " * 50
+    tokenized_examples, token_counts = classifier.tokenize([long_request, "Hi"], bucketed=True)
+    assert tokenized_examples["input_ids"].shape == (2, 16)
+    assert token_counts[0] == classifier.count_tokens(long_request) > 16
+    tokenized_examples, _ = classifier.tokenize(["Hi", "Hello"], bucketed=True)
+    assert tokenized_examples["input_ids"].shape == (2, 8)
+    assert classifier.predict("Hi") == pytest.approx(testing_classifier.predict("Hi"), abs=1e-5)
+
+
+def test_lazy_loading(save_file: str, testing_classifier: HFClassifier):
+    testing_classifier.save(path=save_file)
+    lazy_classifier = HFClassifier.load(save_file, namespace_key="HFclassifier", lazy=True)
+    assert not lazy_classifier.loaded
+    lazy_classifier.warmup(["Hi"])
+    assert lazy_classifier.loaded
+    assert lazy_classifier.predict("Hi") == pytest.approx(testing_classifier.predict("Hi"), abs=1e-5)
+
+
+@pytest.mark.parametrize("quantize", [None, "dynamic-int8"])
+def test_matcher_saving(tmpdir, tiny_hf_model, tiny_dataset, quantize):
+    model, tokenizer = tiny_hf_model
+    matcher = HFMatcher(
+        model=model,
+        tokenizer=tokenizer,
+        device=torch.device("cpu"),
+        namespace_key="HFmodel",
+        dataset=tiny_dataset,
+        quantize=quantize,
+    )
+    matcher.save(path=str(tmpdir))
+    loaded = HFMatcher.load(str(tmpdir), namespace_key="HFmodel")
+    assert loaded.quantize == quantize
+    assert loaded.dataset == tiny_dataset
+    assert loaded.predict("hello there") == pytest.approx(matcher.predict("hello there"), abs=1e-5)
+
+
+def test_lazy_matcher(tmpdir, tiny_hf_model, tiny_dataset):
+    model, tokenizer = tiny_hf_model
+    matcher = HFMatcher(
+        model=model, tokenizer=tokenizer, device=torch.device("cpu"), namespace_key="HFmodel", dataset=tiny_dataset
+    )
+    matcher.save(path=str(tmpdir))
+    lazy_matcher = HFMatcher.load(str(tmpdir), namespace_key="HFmodel", lazy=True)
+    assert not lazy_matcher.loaded
+    assert lazy_matcher.predict("hello there") == pytest.approx(matcher.predict("hello there"), abs=1e-5)
+    assert isinstance(lazy_matcher.model, HFMatcher)
+    assert lazy_matcher.dataset == tiny_dataset
+
+
+def test_pickling(testing_model, testing_tokenizer, tiny_dataset):
+    # transformers>=5 attaches an unpicklable hook on the first pass with the hidden states, so use a fresh copy
+    model = type(testing_model)(testing_model.config).eval()
+    model.load_state_dict(testing_model.state_dict())
+    kwargs = {"model": model, "tokenizer": testing_tokenizer, "device": torch.device("cpu")}
+    models = [
+        HFClassifier(**kwargs, namespace_key="HFclassifier", max_length=8),
+        HFMatcher(**kwargs, namespace_key="HFmodel", dataset=tiny_dataset, max_length=8),
+    ]
+    for model, restored in zip(models, pickle.loads(pickle.dumps(models))):
+        assert restored.predict("hello there") == pytest.approx(model.predict("hello there"), abs=1e-5)
+        assert restored.count_tokens("hello there") == model.count_tokens("hello there")
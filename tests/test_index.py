@@ -0,0 +1,76 @@
+import pytest
+
+try:
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import normalize
+except ImportError:
+    pytest.skip(allow_module_level=True)
+
+from df_extended_conditions.models.local.cosine_matchers.index import ExactIndex, IVFIndex
+from df_extended_conditions.models.local.cosine_matchers.sklearn import SklearnMatcher
+
+
+@pytest.fixture(scope="module")
+def reference_data():
+    rng = np.random.default_rng(42)
+    label_ids = np.sort(rng.integers(0, 20, size=2000))
+    label_ids[:20] = np.arange(20)  # every label has at least one example
+    label_ids.sort()
+    matrix = normalize(rng.normal(size=(2000, 16)))
+    queries = normalize(rng.normal(size=(20, 16)))
+    yield matrix, label_ids, queries
+
+
+def test_exact_index(reference_data):
+    matrix, label_ids, queries = reference_data
+    index = ExactIndex()
+    index.build(matrix, label_ids, 20)
+    for query in queries:
+        scores = matrix @ query
+        expected = [scores[label_ids == label].max() for label in range(20)]
+        assert np.allclose(index.search(query.reshape(1, -1)), expected)
+
+
+def test_ivf_index_full_probe(reference_data):
+    matrix, label_ids, queries = reference_data
+    exact, ivf = ExactIndex(), IVFIndex(n_partitions=16, n_probe=16)
+    exact.build(matrix, label_ids, 20)
+    ivf.build(matrix, label_ids, 20)
+    for query in queries:
+        assert np.allclose(ivf.search(query.reshape(1, -1)), exact.search(query.reshape(1, -1)), atol=1e-5)
+
+
+def test_ivf_index_partial_probe(reference_data):
+    matrix, label_ids, queries = reference_data
+    exact, ivf = ExactIndex(), IVFIndex(n_partitions=16, n_probe=2)
+    exact.build(matrix, label_ids, 20)
+    ivf.build(matrix, label_ids, 20)
+    for query in queries:
+        approximate = ivf.search(query.reshape(1, -1))
+        reached = ~np.isnan(approximate)
+        assert reached.any()
+        # approximate scores can only underestimate the exact ones
+        assert np.all(approximate[reached] <= exact.search(query.reshape(1, -1))[reached] + 1e-5)
+
+
+def test_matcher_with_ivf_index(testing_dataset):
+    exact_matcher = SklearnMatcher(tokenizer=TfidfVectorizer(), dataset=testing_dataset)
+    ivf_matcher = SklearnMatcher(
+        tokenizer=TfidfVectorizer(), dataset=testing_dataset, index=IVFIndex(n_partitions=3, n_probe=3)
+    )
+    exact_matcher.fit(testing_dataset)
+    ivf_matcher.fit(testing_dataset)
+    exact_result = exact_matcher.predict("I want to eat")
+    ivf_result = ivf_matcher.predict("I want to eat")
+    assert exact_result.keys() == ivf_result.keys()
+    for label, score in exact_result.items():
+        assert np.isclose(score, ivf_result[label], atol=1e-5)
+
+
+@pytest.mark.parametrize("index", [ExactIndex(), IVFIndex(n_partitions=16, n_probe=2)])
+def test_search_batch(reference_data, index):
+    matrix, label_ids, queries = reference_data
+    index.build(matrix, label_ids, 20)
+    expected = np.vstack([index.search(query.reshape(1, -1)) for query in queries])
+    assert np.allclose(index.search_batch(queries), expected, atol=1e-5, equal_nan=True)
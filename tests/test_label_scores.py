@@ -0,0 +1,93 @@
+import copy
+
+import pytest
+
+try:
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+except ImportError:
+    pytest.skip(allow_module_level=True)
+
+from df_engine.core import Context
+from df_extended_conditions.utils import LABEL_KEY
+from df_extended_conditions.dataset import Dataset
+from df_extended_conditions.label_scores import LabelIndex, LabelScores
+from df_extended_conditions.conditions import has_cls_label
+from df_extended_conditions.models.local.classifiers.sklearn import SklearnClassifier
+from df_extended_conditions.models.local.cosine_matchers.sklearn import SklearnMatcher
+
+
+def test_mapping_view():
+    scores = LabelScores(LabelIndex(["a", "b", "c"]), [0.5, np.nan, 1])
+    assert scores == {"a": 0.5, "c": 1.0}
+    assert "b" not in scores and "d" not in scores
+    assert scores.get("b", 0) == 0 and scores.get("d") is None
+    assert list(scores) == ["a", "c"] and len(scores) == 2
+    assert scores.to_dict() == {"a": 0.5, "c": 1.0}
+    with pytest.raises(KeyError):
+        scores["b"]
+    with pytest.raises(ValueError):
+        scores.scores[0] = 1
+    with pytest.raises(ValueError):
+        LabelScores(LabelIndex(["a"]), [0.5, 0.5])
+
+
+def test_context_copy():
+    index = LabelIndex(["a", "b"])
+    ctx = Context()
+    ctx.framework_states[LABEL_KEY] = {"model": LabelScores(index, [0.5, 1])}
+    for copied in (copy.deepcopy(ctx), ctx.copy(deep=True)):
+        scores = copied.framework_states[LABEL_KEY]["model"]
+        assert scores == {"a": 0.5, "b": 1.0}
+        assert scores.index is index
+        assert not scores.scores.flags.writeable
+    assert copy.copy(index) is index and copy.deepcopy(index) is index
+
+
+def test_index_from_dataset(testing_dataset: Dataset):
+    index = LabelIndex.from_dataset(testing_dataset)
+    for label, item in testing_dataset.items.items():
+        assert index.index_of(label) == item._categorical_code
+    assert list(index.resolve(("missing", index[0]))) == [-1, 0]
+
+
+@pytest.mark.parametrize("top_k", [None, 2])
+def test_compact_predictions(testing_dataset: Dataset, top_k):
+    matcher = SklearnMatcher(tokenizer=TfidfVectorizer(), dataset=testing_dataset, top_k=top_k)
+    matcher.fit(testing_dataset)
+    compact_matcher = SklearnMatcher(tokenizer=matcher.tokenizer, dataset=testing_dataset, top_k=top_k)
+    compact_matcher.compact_scores = True
+    result = compact_matcher.predict("hello")
+    assert isinstance(result, LabelScores)
+    assert result.keys() == matcher.predict("hello").keys()
+    assert result.index is compact_matcher.predict("goodbye").index  # the label table is shared
+
+    classifier = SklearnClassifier(model=LogisticRegression(), tokenizer=TfidfVectorizer(), compact_scores=True)
+    classifier.fit(testing_dataset)
+    result = classifier.predict("hello")
+    assert isinstance(result, LabelScores)
+    assert np.isclose(sum(result.values()), 1)
+
+
+@pytest.mark.parametrize(
+    ["labels", "mode", "namespace", "expected"],
+    [
+        ("a", "any", None, True),
+        ("d", "any", None, False),
+        (["a", "d"], "any", None, True),
+        (["a", "c"], "all", None, True),
+        (["a", "c"], "all", "model_a", False),
+        (["a", "b", "d"], 3, None, False),
+    ],
+)
+def test_compact_conditions(labels, mode, namespace, expected, testing_actor):
+    states = {
+        "model_a": LabelScores(LabelIndex(["a", "b", "c"]), [1, 0.5, np.nan]),
+        "model_b": LabelScores(LabelIndex(["b", "c"]), [1, 1]),
+    }
+    ctx = Context(framework_states={LABEL_KEY: states})
+    if isinstance(labels, str):
+        assert has_cls_label(labels, namespace=namespace)(ctx, testing_actor) == expected
+    else:
+        assert has_cls_label(labels, namespace=namespace, mode=mode)(ctx, testing_actor) == expected
@@ -0,0 +1,83 @@
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from df_engine.core import Context
+
+from df_extended_conditions.utils import LABEL_KEY
+from df_extended_conditions.models.base_model import BaseModel
+from df_extended_conditions.models.lazy import LazyModel
+
+
+class SlowModel(BaseModel):
+    loads = 0
+
+    def __init__(self) -> None:
+        super().__init__(namespace_key="slow")
+        self.requests = []
+
+    @classmethod
+    def load(cls, path: str = "", namespace_key: str = "slow") -> "SlowModel":
+        time.sleep(0.05)
+        cls.loads += 1
+        return cls()
+
+    def predict(self, request: str) -> dict:
+        self.requests.append(request)
+        return {request: 1.0}
+
+
+def test_loads_once():
+    SlowModel.loads = 0
+    model = LazyModel(SlowModel.load, namespace_key="slow")
+    assert not model.loaded
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(model.predict, [str(idx) for idx in range(16)]))
+    assert results == [{str(idx): 1.0} for idx in range(16)]
+    assert SlowModel.loads == 1
+    assert model.loaded and model.requests  # attributes are forwarded to the loaded model
+
+
+def test_failed_load():
+    attempts = []
+
+    def loader():
+        attempts.append(threading.get_ident())
+        if len(attempts) == 1:
+            raise OSError("not yet")
+        return SlowModel()
+
+    model = LazyModel(loader, namespace_key="slow")
+    with pytest.raises(OSError):
+        model.predict("hello")
+    assert model.predict("hello") == {"hello": 1.0}
+    assert len(attempts) == 2
+
+
+def test_warmup_and_call():
+    model = LazyModel(SlowModel.load, namespace_key="slow")
+    model.warmup(["hello", "how are you"])
+    assert model.loaded and model.requests == ["hello", "how are you"]
+    ctx = Context()
+    ctx.add_request("bye")
+    ctx = model(ctx, None)
+    assert ctx.framework_states[LABEL_KEY]["slow"] == {"bye": 1.0}
+
+
+def test_sklearn_lazy_load(save_file, testing_dataset):
+    pytest.importorskip("sklearn")
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from df_extended_conditions.models import SklearnClassifier
+
+    classifier = SklearnClassifier(model=LogisticRegression(), tokenizer=TfidfVectorizer(), namespace_key="classifier")
+    classifier.fit(testing_dataset)
+    classifier.save(save_file)
+    lazy = SklearnClassifier.load(save_file, namespace_key="classifier", lazy=True)
+    assert isinstance(lazy, LazyModel) and not lazy.loaded
+    lazy = pickle.loads(pickle.dumps(lazy))
+    assert not lazy.loaded
+    assert lazy.predict("hello") == pytest.approx(classifier.predict("hello"))
+    assert isinstance(lazy.model, SklearnClassifier)
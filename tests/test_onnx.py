@@ -0,0 +1,111 @@
+import pytest
+
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import pickle  # noqa: E402
+
+import numpy as np  # noqa: E402
+
+from df_extended_conditions.models import HFClassifier, HFMatcher, ORTClassifier, ORTMatcher  # noqa: E402
+from df_extended_conditions.models.executor import ExecutorModel  # noqa: E402
+
+REQUESTS = ["hello there", "bye", "have a snack please", "see you"]
+LONG_REQUEST = "hello there please have a snack and see you bye hello food"
+TRUNCATION = {"max_length": 6, "truncation": "head+tail", "head_fraction": 0.5, "padding_buckets": [8, 16]}
+
+
+def test_classifier_parity(tiny_hf_model, tmpdir):
+    model, tokenizer = tiny_hf_model
+    classifier = HFClassifier(model=model, tokenizer=tokenizer, device=torch.device("cpu"), namespace_key="hf")
+    classifier.export_onnx(str(tmpdir.join("export")))
+    ort_classifier = ORTClassifier.load(str(tmpdir.join("export")), namespace_key="ort", intra_op_num_threads=1)
+    for request in REQUESTS:
+        expected = classifier.predict(request)
+        assert ort_classifier.predict(request) == pytest.approx(expected, abs=1e-5)
+        assert np.allclose(ort_classifier.transform(request), classifier.transform(request), atol=1e-4)
+    assert ort_classifier.predict_batch(REQUESTS) == [pytest.approx(classifier.predict(r), abs=1e-5) for r in REQUESTS]
+
+    ort_classifier.save(str(tmpdir.join("saved")))
+    loaded = ORTClassifier.load(str(tmpdir.join("saved")), namespace_key="ort")
+    assert loaded.fingerprint() == ort_classifier.fingerprint()
+    assert loaded.predict(REQUESTS[0]) == pytest.approx(classifier.predict(REQUESTS[0]), abs=1e-5)
+
+
+def test_matcher_parity(tiny_hf_model, tiny_dataset, tmpdir):
+    model, tokenizer = tiny_hf_model
+    matcher = HFMatcher(
+        model=model, tokenizer=tokenizer, device=torch.device("cpu"), namespace_key="hf", dataset=tiny_dataset
+    )
+    matcher.export_onnx(str(tmpdir))
+    ort_matcher = ORTMatcher.load(str(tmpdir), namespace_key="ort", dataset=tiny_dataset, inter_op_num_threads=1)
+    for request in REQUESTS:
+        assert ort_matcher.predict(request) == pytest.approx(matcher.predict(request), abs=1e-4)
+    assert np.allclose(ort_matcher.transform_batch(REQUESTS), matcher.transform_batch(REQUESTS), atol=1e-4)
+
+
+def test_quantized_export(tiny_hf_model, tmpdir):
+    model, tokenizer = tiny_hf_model
+    classifier = HFClassifier(
+        model=model, tokenizer=tokenizer, device=torch.device("cpu"), namespace_key="hf", quantize="dynamic-int8"
+    )
+    with pytest.raises(ValueError):
+        classifier.export_onnx(str(tmpdir))
+
+
+def test_truncation_parity(tiny_hf_model, tiny_dataset, tmpdir):
+    model, tokenizer = tiny_hf_model
+    classifier = HFClassifier(
+        model=model, tokenizer=tokenizer, device=torch.device("cpu"), namespace_key="hf", **TRUNCATION
+    )
+    classifier.export_onnx(str(tmpdir))
+    ort_classifier = ORTClassifier.load(str(tmpdir), namespace_key="ort", **TRUNCATION)
+    requests = REQUESTS + [LONG_REQUEST]
+    assert ort_classifier.predict(LONG_REQUEST) == pytest.approx(classifier.predict(LONG_REQUEST), abs=1e-5)
+    expected = classifier.predict_batch(requests)
+    assert ort_classifier.predict_batch(requests) == [pytest.approx(item, abs=1e-5) for item in expected]
+    assert ort_classifier.count_tokens(LONG_REQUEST) == classifier.count_tokens(LONG_REQUEST) > TRUNCATION["max_length"]
+
+    matcher = HFMatcher(
+        model=model,
+        tokenizer=tokenizer,
+        device=torch.device("cpu"),
+        namespace_key="hf",
+        dataset=tiny_dataset,
+        **TRUNCATION,
+    )
+    ort_matcher = ORTMatcher.load(str(tmpdir), namespace_key="ort", dataset=tiny_dataset, **TRUNCATION)
+    assert np.allclose(ort_matcher.transform_batch(requests), matcher.transform_batch(requests), atol=1e-4)
+    assert ort_matcher.predict(LONG_REQUEST) == pytest.approx(matcher.predict(LONG_REQUEST), abs=1e-4)
+
+
+def test_matcher_saving(tiny_hf_model, tiny_dataset, tmpdir):
+    model, tokenizer = tiny_hf_model
+    matcher = HFMatcher(
+        model=model, tokenizer=tokenizer, device=torch.device("cpu"), namespace_key="hf", dataset=tiny_dataset
+    )
+    matcher.export_onnx(str(tmpdir.join("export")))
+    ort_matcher = ORTMatcher.load(str(tmpdir.join("export")), namespace_key="ort", dataset=tiny_dataset)
+    ort_matcher.save(str(tmpdir.join("saved")))
+    loaded = ORTMatcher.load(str(tmpdir.join("saved")), namespace_key="ort")
+    assert loaded.dataset.items.keys() == tiny_dataset.items.keys()
+    assert loaded.predict(REQUESTS[0]) == pytest.approx(ort_matcher.predict(REQUESTS[0]), abs=1e-5)
+
+
+def test_pickling(tiny_hf_model, tiny_dataset, tmpdir, run_async):
+    model, tokenizer = tiny_hf_model
+    classifier = HFClassifier(model=model, tokenizer=tokenizer, device=torch.device("cpu"), namespace_key="hf")
+    classifier.export_onnx(str(tmpdir))
+    ort_classifier = ORTClassifier.load(str(tmpdir), namespace_key="ort", max_length=8)
+    ort_matcher = ORTMatcher.load(str(tmpdir), namespace_key="ort", dataset=tiny_dataset)
+    for ort_model in (ort_classifier, ort_matcher):
+        restored = pickle.loads(pickle.dumps(ort_model))
+        assert restored.predict(REQUESTS[0]) == pytest.approx(ort_model.predict(REQUESTS[0]), abs=1e-5)
+    executor_model = ExecutorModel(ort_classifier, executor="process")
+    try:
+        result = run_async(executor_model.predict(REQUESTS[0]))
+    finally:
+        executor_model.shutdown()
+    assert result == pytest.approx(ort_classifier.predict(REQUESTS[0]), abs=1e-5)
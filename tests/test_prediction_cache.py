@@ -0,0 +1,119 @@
+import time
+import asyncio
+import threading
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from df_engine.core import Context
+
+from df_extended_conditions.utils import LABEL_KEY
+from df_extended_conditions.models.base_model import BaseModel
+from df_extended_conditions.models.remote_api.async_mixin import AsyncMixin
+from df_extended_conditions.label_scores import LabelScores
+from df_extended_conditions.models.local.classifiers.regex import RegexClassifier
+from df_extended_conditions.models.local.cosine_matchers.sklearn import SklearnMatcher
+from df_extended_conditions.models.prediction_cache import (
+    CachedModel,
+    AsyncCachedModel,
+    MemoryPredictionCache,
+    SQLitePredictionCache,
+)
+
+
+class CountingModel(BaseModel):
+    def __init__(self) -> None:
+        super().__init__(namespace_key="counting")
+        self.calls = 0
+
+    def predict(self, request: str) -> dict:
+        self.calls += 1
+        return {"label": 0.5}
+
+    def fit(self, dataset) -> None:
+        self.version += 1
+
+    def fingerprint(self) -> str:
+        return f"counting-{self.version}"
+
+
+class AsyncCountingModel(AsyncMixin, CountingModel):
+    async def predict(self, request: str) -> dict:
+        return CountingModel.predict(self, request)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    if request.param == "memory":
+        return lambda **kwargs: MemoryPredictionCache(**kwargs)
+    return lambda **kwargs: SQLitePredictionCache(tmp_path / "predictions.db", prune_interval=1, **kwargs)
+
+
+def test_cached_model(make_cache):
+    model = CountingModel()
+    cached_model = CachedModel(model, cache=make_cache())
+    assert cached_model.namespace_key == "counting"
+    assert cached_model.predict("hello  world") == {"label": 0.5}
+    assert cached_model.predict(" hello world ") == {"label": 0.5}
+    assert model.calls == 1
+    model.fit(None)  # refitting changes the fingerprint
+    cached_model.predict("hello world")
+    assert model.calls == 2
+    assert cached_model.cache.stats == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "entries": 2}
+
+
+def test_eviction(make_cache):
+    cache = make_cache(max_entries=2)
+    for key in ["a", "b", "c"]:
+        cache.put(key, {key: 1.0})
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == {"c": 1.0}
+    cache = make_cache(ttl=0.05)
+    cache.put("a", {"a": 1.0})
+    assert cache.get("a") == {"a": 1.0}
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+
+def test_shared_sqlite_cache(tmp_path):
+    model = CountingModel()
+    CachedModel(model, cache=SQLitePredictionCache(tmp_path / "shared.db")).predict("hi")
+    CachedModel(model, cache=SQLitePredictionCache(tmp_path / "shared.db")).predict("hi")
+    assert model.calls == 1
+
+
+def test_regex_fingerprint(testing_dataset):
+    first = RegexClassifier(testing_dataset, namespace_key="regex")
+    second = RegexClassifier(testing_dataset, namespace_key="other")
+    assert first.fingerprint() == second.fingerprint()
+    second.re_kwargs = {}
+    assert first.fingerprint() != second.fingerprint()
+
+
+def test_async_cached_model(testing_actor, make_cache, run_async):
+    model = AsyncCountingModel()
+    cache = make_cache()
+    threads = []
+    get = cache.get
+    cache.get = lambda key: threads.append(threading.current_thread()) or get(key)
+    cached_model = AsyncCachedModel(model, cache=cache)
+    ctx = Context()
+    ctx.add_request("hello")
+    ctx = run_async(cached_model(ctx, testing_actor))
+    ctx = run_async(cached_model(ctx, testing_actor))
+    assert ctx.framework_states[LABEL_KEY]["counting"] == {"label": 0.5}
+    assert model.calls == 1
+    # the blocking backends are queried outside of the event loop thread
+    assert all((thread is threading.main_thread()) != cache.blocking for thread in threads)
+
+
+def test_compact_predictions(make_cache, testing_dataset):
+    matcher = SklearnMatcher(tokenizer=TfidfVectorizer(), dataset=testing_dataset, top_k=2, compact_scores=True)
+    matcher.fit(testing_dataset)
+    cached_model = CachedModel(matcher, cache=make_cache())
+    expected = matcher.predict("hello")
+    first, second = cached_model.predict("hello"), cached_model.predict("hello")
+    assert isinstance(second, LabelScores) and second == first == expected
+    assert second.index.labels == expected.index.labels
+    cached_model.predict("hi")
+    assert cached_model.predict("hi").index is cached_model.predict("hi").index  # the hits share a label table
@@ -0,0 +1,141 @@
+import re
+from argparse import Namespace
+
+import numpy as np
+import pytest
+
+from df_extended_conditions.dataset import Dataset, DatasetItem
+from df_extended_conditions.models.local.classifiers.regex import RegexClassifier, RegexModel
+from df_extended_conditions.models.local.classifiers.regex_prefilter import (
+    AhoCorasick,
+    extract_literals,
+    sre_parse,
+    _get_state,
+)
+from df_extended_conditions.models.local.classifiers.regex_analysis import (
+    AMBIGUOUS_ALTERNATION,
+    NESTED_QUANTIFIERS,
+    analyze_pattern,
+)
+
+SAMPLES = {
+    "refund": [r"refund", r"money back", r"(\w+) \1 refund"],
+    "cancel": [r"cancel (my|the) order", r"(?i)STOP", r"(?P<verb>drop) it"],
+    "greet": [r"^hi\b", r"hello"],
+    "single": [r"exact"],
+}
+
+
+@pytest.fixture
+def dataset():
+    return Dataset(items=[DatasetItem(label=label, samples=samples) for label, samples in SAMPLES.items()])
+
+
+def naive_predict(request: str, flags: int) -> dict:
+    return {
+        label: 1.0 for label, samples in SAMPLES.items() if any(re.search(sample, request, flags) for sample in samples)
+    }
+
+
+@pytest.mark.parametrize("flags", [0, re.IGNORECASE])
+@pytest.mark.parametrize(
+    "request_text",
+    ["I want a Refund", "please please refund", "cancel the order", "stop", "drop it", "hi there", "say hi", "exact"],
+)
+def test_combined_patterns(dataset, request_text, flags):
+    assert RegexModel(dataset)(request_text, flags=flags) == naive_predict(request_text, flags)
+
+
+def test_compilation(dataset):
+    model = RegexModel(dataset)
+    compiled = dict(model.compile())
+    assert len(compiled["refund"]) == 2  # the pattern with a backreference is kept separate
+    assert len(compiled["greet"]) == 1
+    assert model.compile() is model.compile()
+    classifier = RegexClassifier(model, namespace_key="regex")
+    classifier.fit(Dataset(items=[DatasetItem(label="other", samples=["refund"])]))
+    assert classifier.predict("refund") == {"other": 1.0}
+
+
+@pytest.mark.parametrize(
+    ["pattern", "flags", "expected"],
+    [
+        ("cancel my (order|subscription)", 0, [("cancel my ", False)]),
+        ("(?i)ReFund", 0, [("refund", True)]),
+        ("(order|subscription) status", 0, [(" status", False)]),
+        ("(refunds?|money back)", 0, [("refund", False), ("money back", False)]),
+        (r"\d+ (?:usd)+", re.IGNORECASE, [("usd", True)]),
+        ("a+b?", 0, None),
+        ("stra(ß|ss)e", re.IGNORECASE, [("stra", True)]),
+    ],
+)
+def test_literal_extraction(pattern, flags, expected):
+    assert extract_literals(pattern, flags) == expected
+
+
+def test_aho_corasick():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    assert automaton.find("ushers") == {0, 1, 3}
+    assert automaton.find("ahishe") == {0, 1, 2}
+    assert automaton.find("nothing") == set()
+
+
+@pytest.mark.parametrize("flags", [0, re.IGNORECASE])
+def test_prefilter(dataset, flags):
+    model = RegexModel(dataset, prefilter=True)
+    requests = ["I want a Refund", "please please refund", "cancel the order", "stop", "drop it", "hi there"]
+    requests += ["MONEY BACK", "ſtop", "hı", "exact", "nothing here", "Cancel My order"]
+    for request_text in requests:
+        assert model(request_text, flags=flags) == naive_predict(request_text, flags)
+    assert dict(model.compile(flags)).keys() == {"greet"}  # "hi" is too short to be indexed
+
+
+@pytest.mark.parametrize(
+    ["pattern", "expected"],
+    [
+        (r"(\w+\s?)+$", [NESTED_QUANTIFIERS]),
+        (r"(a|ab)*c", [AMBIGUOUS_ALTERNATION]),
+        (r"(?:x*)*", [NESTED_QUANTIFIERS]),
+        (r"(yes|no)+", []),
+        (r"(\w|\d)+", []),  # merged into a single character set
+        (r"(?>a+)+", []),
+        (r"cancel (my|the) order", []),
+    ],
+)
+def test_pattern_analysis(pattern, expected):
+    assert [warning.kind for warning in analyze_pattern(pattern)] == expected
+
+
+def test_parse_state():
+    state = sre_parse.parse("(?i)stop").state
+    assert _get_state(Namespace(state=state)) is state
+    assert _get_state(Namespace(pattern=state)) is state  # Python 3.6
+
+
+def test_profile():
+    model = RegexModel(Dataset(items=[DatasetItem(label="slow", samples=[r"(a+)+$", r"slow"])]))
+    timings = model.profile(["a" * 18 + "!", "slow"], top=1)
+    assert [(timing.label, timing.pattern) for timing in timings] == [("slow", r"(a+)+$")]
+    assert [warning.pattern for warning in model.analyze()] == [r"(a+)+$"]
+
+
+def test_budget():
+    model = RegexModel(Dataset(items=[DatasetItem(label="order", samples=["foo", "bar"])]), budget=0.0)
+    assert len(dict(model.compile())["order"]) == 1
+    assert model("foo bar") == {"order": 1.0}
+    # the alternation has exceeded the budget, so the samples are evaluated separately
+    assert len(dict(model.compile())["order"]) == 2
+    assert model("foo bar") == {"order": 1.0}
+    assert model.quarantined == {"foo"}
+    model.budget = None
+    assert model("foo") == {}
+    assert model("bar") == {"order": 1.0}
+
+
+def test_predict_batch(dataset):
+    classifier = RegexClassifier(dataset, namespace_key="regex")
+    requests = ["I want a Refund", "hi there", "nothing"]
+    assert classifier.predict_batch(requests) == [classifier.predict(request) for request in requests]
+    labels, scores = classifier.predict_batch_array(requests)
+    assert labels == list(SAMPLES)
+    assert scores[0, labels.index("refund")] == 1.0 and np.isnan(scores[2]).all()
@@ -0,0 +1,120 @@
+import pytest
+import numpy as np
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from df_engine.core import Context  # noqa: E402
+from df_engine.core.keywords import GLOBAL, RESPONSE, TRANSITIONS, PRE_TRANSITIONS_PROCESSING  # noqa: E402
+
+from df_extended_conditions.utils import LABEL_KEY, TOKEN_COUNT_KEY  # noqa: E402
+from df_extended_conditions.conditions import has_cls_label  # noqa: E402
+from df_extended_conditions.gating import ScriptGate  # noqa: E402
+from df_extended_conditions.models import HFClassifier, HFMatcher, SharedBackboneModel  # noqa: E402
+
+REQUESTS = ["hello there", "bye", "have a snack please", "see you"]
+
+
+@pytest.fixture
+def models(tiny_hf_model, tiny_dataset):
+    model, tokenizer = tiny_hf_model
+    device = torch.device("cpu")
+    classifier = HFClassifier(model=model, tokenizer=tokenizer, device=device, namespace_key="classifier")
+    matcher = HFMatcher(model=model, tokenizer=tokenizer, device=device, namespace_key="matcher", dataset=tiny_dataset)
+    matcher.embedding_cache = None
+    yield classifier, matcher
+
+
+def test_parity(models):
+    classifier, matcher = models
+    shared = SharedBackboneModel(classifier, matcher)
+    for request in REQUESTS:
+        prediction = shared.predict(request)
+        assert prediction["classifier"] == pytest.approx(classifier.predict(request), abs=1e-5)
+        assert prediction["matcher"] == pytest.approx(matcher.predict(request), abs=1e-5)
+    for request, prediction in zip(REQUESTS, shared.predict_batch(REQUESTS)):
+        assert prediction["classifier"] == pytest.approx(classifier.predict(request), abs=1e-5)
+        assert prediction["matcher"] == pytest.approx(matcher.predict(request), abs=1e-5)
+
+
+def test_single_forward_pass(models):
+    classifier, matcher = models
+    shared = SharedBackboneModel(classifier, matcher)
+    shared.predict(REQUESTS[1])  # embed the reference examples of the matcher
+    calls = []
+    handle = classifier.model.register_forward_hook(lambda *args: calls.append(args))
+    try:
+        ctx = Context()
+        ctx.add_request(REQUESTS[0])
+        ctx = shared(ctx, None)
+    finally:
+        handle.remove()
+    assert len(calls) == 1
+    assert set(ctx.framework_states[LABEL_KEY]) == {"classifier", "matcher"}
+    assert ctx.framework_states[TOKEN_COUNT_KEY]["classifier"] == 4
+
+
+def test_invalid_models(models, tiny_dataset):
+    classifier, matcher = models
+    with pytest.raises(ValueError):
+        SharedBackboneModel(classifier, classifier)
+    truncated_matcher = HFMatcher(
+        model=matcher.model,
+        tokenizer=matcher.tokenizer,
+        device=torch.device("cpu"),
+        namespace_key="matcher",
+        dataset=tiny_dataset,
+        max_length=4,
+    )
+    with pytest.raises(ValueError):
+        SharedBackboneModel(classifier, truncated_matcher)
+
+
+def test_gating(models):
+    classifier, matcher = models
+    shared = SharedBackboneModel(classifier, matcher)
+    assert shared.namespaces == ("classifier", "matcher")
+    script = {
+        GLOBAL: {PRE_TRANSITIONS_PROCESSING: {"annotate": shared}},
+        "root": {
+            "start": {
+                RESPONSE: "start",
+                TRANSITIONS: {("root", "hello"): has_cls_label("hello", namespace="classifier")},
+            },
+            "hello": {RESPONSE: "hello", TRANSITIONS: {("root", "start"): has_cls_label("food")}},
+            "end": {RESPONSE: "end"},
+        },
+    }
+    gate = ScriptGate(script, start_label=("root", "start"))
+    gated_model = gate.wrap_script()[GLOBAL][PRE_TRANSITIONS_PROCESSING]["annotate"]
+    assert gated_model.model is shared
+    ctx = Context()
+    ctx.add_request(REQUESTS[0])
+    assert gate.is_needed(shared, ctx)
+    ctx = gated_model(ctx, None)
+    assert ctx.framework_states[LABEL_KEY]["classifier"] == pytest.approx(classifier.predict(REQUESTS[0]), abs=1e-5)
+    assert ctx.framework_states[LABEL_KEY]["matcher"]
+    ctx.add_label(("root", "hello"))
+    assert gate.is_needed(shared, ctx)  # "food" is predicted by both models
+    ctx.add_label(("root", "end"))
+    ctx = gated_model(ctx, None)
+    assert ctx.framework_states[LABEL_KEY] == {"classifier": {}, "matcher": {}}
+
+
+def test_batch_array(models):
+    classifier, matcher = models
+    for model in (classifier, matcher):
+        labels, scores = model.predict_batch_array(REQUESTS)
+        assert scores.shape == (len(REQUESTS), len(labels))
+        for request, row in zip(REQUESTS, scores):
+            assert dict(zip(labels, row.tolist())) == pytest.approx(model.predict(request), abs=1e-5)
+    shared = SharedBackboneModel(classifier, matcher)
+    arrays = shared.predict_batch_array(REQUESTS)
+    assert set(arrays) == {"classifier", "matcher"}
+    for model in (classifier, matcher):
+        labels, scores = arrays[model.namespace_key]
+        expected_labels, expected_scores = model.predict_batch_array(REQUESTS)
+        assert labels == expected_labels
+        assert np.allclose(scores, expected_scores, atol=1e-5, equal_nan=True)
+    labels, scores = shared.predict_batch_array([])["classifier"]
+    assert scores.shape == (0, len(labels))
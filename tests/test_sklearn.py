@@ -1,16 +1,22 @@
+import time
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 try:
     from sklearn.feature_extraction.text import TfidfVectorizer
     from sklearn.linear_model import LogisticRegression
     from sklearn.tree import DecisionTreeClassifier
+    from sklearn.metrics.pairwise import cosine_similarity
+    from scipy.sparse import issparse
     import numpy as np
 except ImportError:
     pytest.skip(allow_module_level=True)
 
 from df_extended_conditions.models.local.classifiers.sklearn import SklearnClassifier
 from df_extended_conditions.models.local.cosine_matchers.sklearn import SklearnMatcher
-from df_extended_conditions.dataset import Dataset
+from df_extended_conditions.dataset import Dataset, DatasetItem
 
 
 @pytest.fixture(scope="session")
@@ -52,3 +58,93 @@ def test_fit(testing_classifier: SklearnClassifier, testing_model: SklearnMatche
 def test_transform(testing_model: SklearnMatcher):
     result = testing_model.transform("one two three")
     assert isinstance(result, np.ndarray)
+
+
+def test_predict(testing_model: SklearnMatcher, testing_dataset: Dataset):
+    testing_model.fit(testing_dataset)
+    request = "I want to eat"
+    result = testing_model.predict(request)
+    assert set(result.keys()) == set(testing_dataset.items.keys())
+    request_embedding = testing_model.transform(request)
+    for label, dataset_item in testing_dataset.items.items():
+        scores = [
+            cosine_similarity(request_embedding, testing_model.transform(item))[0][0] for item in dataset_item.samples
+        ]
+        assert np.isclose(result[label], max(scores))
+
+
+def test_reference_invalidation(testing_model: SklearnMatcher, testing_dataset: Dataset):
+    testing_model.fit(testing_dataset)
+    testing_model.predict("hello")
+    assert testing_model._references is not None
+    testing_model.dataset = Dataset(items=[DatasetItem(label="new", samples=["hello there"])])
+    assert testing_model._references is None
+    assert set(testing_model.predict("hello").keys()) == {"new"}
+    testing_model.fit(testing_dataset)
+    assert testing_model._references is None
+    testing_model.dataset = testing_dataset
+
+
+def test_concurrent_references(testing_dataset: Dataset):
+    matcher = SklearnMatcher(tokenizer=TfidfVectorizer(), dataset=testing_dataset)
+    matcher.fit(testing_dataset)
+    expected = matcher.predict("hello")
+    matcher.reset_references()
+    calls = []
+    embed_references = matcher._embed_references
+
+    def slow_embed_references(samples):
+        calls.append(samples)
+        time.sleep(0.05)
+        return embed_references(samples)
+
+    matcher._embed_references = slow_embed_references
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(matcher.predict, ["hello"] * 8))
+    assert len(calls) == 1
+    assert all(result == pytest.approx(expected) for result in results)
+    del matcher._embed_references
+    restored = pickle.loads(pickle.dumps(matcher))
+    assert restored.predict("hello") == pytest.approx(expected)
+    restored.reset_references()
+
+
+def test_sparse_references(testing_model: SklearnMatcher, testing_dataset: Dataset):
+    testing_model.fit(testing_dataset)
+    testing_model.predict("hello")
+    assert issparse(testing_model.index.matrix)
+
+
+def test_label_selection(testing_dataset: Dataset):
+    classifier = SklearnClassifier(model=LogisticRegression(), tokenizer=TfidfVectorizer(), top_k=2)
+    classifier.fit(testing_dataset)
+    full_result = SklearnClassifier(model=classifier.model, tokenizer=classifier.tokenizer).predict("hello")
+    result = classifier.predict("hello")
+    assert len(result) == 2
+    assert sorted(result.values()) == sorted(full_result.values())[-2:]
+    classifier.top_k, classifier.min_score = None, 1.1
+    assert classifier.predict("hello") == {}
+    matcher = SklearnMatcher(tokenizer=TfidfVectorizer(), dataset=testing_dataset, top_k=1)
+    matcher.fit(testing_dataset)
+    assert len(matcher.predict("hello")) == 1
+
+
+@pytest.mark.parametrize("top_k,min_score", [(None, None), (2, None), (None, 0.1)])
+def test_predict_batch(testing_dataset: Dataset, top_k, min_score):
+    requests = ["hello", "I want to eat", "bye", "something unknown"]
+    classifier = SklearnClassifier(
+        model=LogisticRegression(), tokenizer=TfidfVectorizer(), top_k=top_k, min_score=min_score
+    )
+    matcher = SklearnMatcher(tokenizer=TfidfVectorizer(), dataset=testing_dataset, top_k=top_k, min_score=min_score)
+    for model in (classifier, matcher):
+        model.fit(testing_dataset)
+        results = model.predict_batch(requests)
+        assert len(results) == len(requests)
+        labels, scores = model.predict_batch_array(requests)
+        assert scores.shape == (len(requests), len(labels))
+        for request, result, row in zip(requests, results, scores):
+            expected = model.predict(request)
+            assert result == pytest.approx(expected)
+            assert {label: score for label, score in zip(labels, row) if not np.isnan(score)} == pytest.approx(expected)
+        assert model.predict_batch([]) == []
+    assert np.allclose(matcher.transform_batch(requests), np.vstack([matcher.transform(r) for r in requests]))